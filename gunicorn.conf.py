@@ -0,0 +1,10 @@
+# Gunicorn configuration (production): gunicorn spot2-challenge.wsgi:application
+# Gunicorn loads this file automatically from the working directory.
+
+
+def post_worker_init(worker):
+    # Builds the in-memory spatial index before serving requests
+    # (only if SPOTS_SPATIAL_SNAPSHOT=1; see spots/snapshot.py)
+    from spots.snapshot import get_snapshot
+
+    get_snapshot()
@@ -24,6 +24,7 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     "django.contrib.gis",  # <-- Add GeoDjango
+    "django.contrib.postgres",  # pg_trgm lookups (trigram_word_similar)
     "rest_framework",  # <-- Add DRF
     "rest_framework_gis",  # <-- Add DRF GIS
     "django_filters",  # <-- Add django-filter
@@ -120,11 +121,70 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 REST_FRAMEWORK = {
     "DEFAULT_FILTER_BACKENDS": ["django_filters.rest_framework.DjangoFilterBackend"],
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",  # For Stage 2
-    # Add pagination settings here for Stage 2 if needed
-    # 'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    # 'PAGE_SIZE': 100,
+    # Keyset (cursor) pagination without COUNT; each view declares its keyset
+    "DEFAULT_PAGINATION_CLASS": "spots.pagination.KeysetPagination",
+    "PAGE_SIZE": 100,
 }
 
+# In-process spatial index for the nearby and within endpoints (spots/snapshot.py).
+# Rebuilt when a loader finishes; the version is checked every CHECK_INTERVAL seconds.
+SPOTS_SPATIAL_SNAPSHOT = os.environ.get("SPOTS_SPATIAL_SNAPSHOT", "0") == "1"
+SPOTS_SNAPSHOT_CHECK_INTERVAL = float(os.environ.get("SPOTS_SNAPSHOT_CHECK_INTERVAL", "1"))
+SPOTS_SNAPSHOT_CELL_SIZE = 0.05  # degrees
+
+# within polygons with more vertices are split with ST_Subdivide for the index
+SPOTS_SUBDIVIDE_MAX_VERTICES = 256
+
+# Rows fetched per server-side cursor round trip in ?stream=1 responses
+SPOTS_STREAM_CHUNK_SIZE = 2000
+
+# Vector tiles (/api/spots/tiles/{z}/{x}/{y}.pbf): attributes of each point and
+# the tile cache, whose key includes the data version
+SPOTS_TILE_ATTRIBUTES = [
+    "spot_sector_id",
+    "spot_type_id",
+    "spot_modality",
+    "spot_price_total_mxn_rent",
+]
+SPOTS_TILE_CACHE = "default"
+SPOTS_TILE_CACHE_TIMEOUT = 24 * 3600
+
+# Clusters (/api/spots/clusters/): cells per side of a map tile (4 = 64 px cells
+# on 256 px tiles) and the maximum number of cells the bbox may cover
+SPOTS_CLUSTER_CELLS_PER_TILE = 4
+SPOTS_CLUSTER_MAX_CELLS = 4096
+
+# Response cache of list, detail, top-rent, average-price-by-sector and
+# price-stats (spots/cache.py). The key includes the data version, read from the
+# database at most every SPOTS_DATA_VERSION_CHECK_INTERVAL seconds; entries of
+# older versions are evicted in LRU order. LocMemCache is per process;
+# spots.cache.LRUFileBasedCache (LOCATION = a directory) is shared by processes.
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "responses": {
+        "BACKEND": os.environ.get(
+            "SPOTS_RESPONSE_CACHE_BACKEND",
+            "django.core.cache.backends.locmem.LocMemCache",
+        ),
+        "LOCATION": os.environ.get("SPOTS_RESPONSE_CACHE_LOCATION", "spots-responses"),
+        "TIMEOUT": 24 * 3600,
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.environ.get("SPOTS_RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+        },
+    },
+}
+SPOTS_RESPONSE_CACHE = "responses"
+SPOTS_DATA_VERSION_CHECK_INTERVAL = float(
+    os.environ.get("SPOTS_DATA_VERSION_CHECK_INTERVAL", "1")
+)
+
+# Price aggregates left stale by admin edits are rebuilt after the edit commits,
+# in a background thread (spots.loading.schedule_price_aggregates_refresh);
+# off = inline, still outside the edit's transaction
+SPOTS_PRICE_AGGREGATES_IN_BACKGROUND = (
+    os.environ.get("SPOTS_PRICE_AGGREGATES_IN_BACKGROUND", "1") == "1"
+)
+
 # GDAL and GEOS library paths (usually not needed with Docker and proper install)
 # GDAL_LIBRARY_PATH = '/usr/lib/libgdal.so' # Example path, adjust if needed
 # GEOS_LIBRARY_PATH = '/usr/lib/libgeos_c.so' # Example path, adjust if needed
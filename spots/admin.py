@@ -1,4 +1,5 @@
 from django.contrib.gis import admin 
+from .loading import refresh_after_edit
 from .models import Spot
 
 @admin.register(Spot)
@@ -30,3 +31,18 @@ class SpotAdmin(admin.ModelAdmin):
     default_lat = 19.4326
     default_lon = -99.1332
     default_zoom = 10
+
+    # The loaders refresh vectors and aggregates in bulk when they finish; here
+    # the edited spot's vector is refreshed with the change and the aggregates
+    # are rebuilt after it commits, outside the request's transaction
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        refresh_after_edit(Spot.objects.filter(pk=obj.pk))
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        refresh_after_edit(Spot.objects.none())
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        refresh_after_edit(Spot.objects.none())
@@ -0,0 +1,83 @@
+from django.db import connections, router, transaction
+
+from .models import PriceAggregate, Spot
+
+# PriceAggregate dimensions: API name -> column; bit i of grouping_set
+# corresponds to the i-th one
+DIMENSIONS = {
+    "sector": "spot_sector_id",
+    "type": "spot_type_id",
+    "municipality": "spot_municipality",
+    "state": "spot_state",
+}
+MEASURES = {
+    "rent": "spot_price_total_mxn_rent",
+    "sale": "spot_price_total_mxn_sale",
+    "rent_sqm": "spot_price_sqm_mxn_rent",
+    "sale_sqm": "spot_price_sqm_mxn_sale",
+}
+STATISTICS = ("count", "mean", "min", "max", "p50", "p90")
+
+
+def grouping_set(dimensions):
+    """grouping_set value of the rows grouped by these dimension names"""
+    return sum(1 << i for i, name in enumerate(DIMENSIONS) if name in dimensions)
+
+
+def refresh_price_aggregates(using=None):
+    """
+    Rebuilds PriceAggregate from the spots with one GROUP BY CUBE query. Runs
+    in a transaction, so readers keep seeing the previous statistics until it
+    commits. Returns the number of rows.
+    """
+    using = using or router.db_for_write(PriceAggregate)
+    quote = connections[using].ops.quote_name
+    dimensions = [quote(column) for column in DIMENSIONS.values()]
+    grouping = " + ".join(
+        f"{1 << i} * (1 - GROUPING({column}))" for i, column in enumerate(dimensions)
+    )
+    # A single percentile_cont per measure computes p50 and p90 with one sort
+    groups = [f"{grouping} AS grouping_set", *dimensions, "count(*) AS spot_count"]
+    targets = ["grouping_set", *DIMENSIONS.values(), "spot_count"]
+    values = ["grouping_set", *dimensions, "spot_count"]
+    for measure, column in MEASURES.items():
+        column = quote(column)
+        groups += [
+            f"count({column}) AS {measure}_count",
+            f"avg({column}) AS {measure}_mean",
+            f"min({column}) AS {measure}_min",
+            f"max({column}) AS {measure}_max",
+            f"percentile_cont(ARRAY[0.5, 0.9]) WITHIN GROUP (ORDER BY {column}) "
+            f"AS {measure}_percentiles",
+        ]
+        targets += [f"{measure}_{statistic}" for statistic in STATISTICS]
+        values += [
+            *(f"{measure}_{statistic}" for statistic in STATISTICS[:4]),
+            f"{measure}_percentiles[1]",
+            f"{measure}_percentiles[2]",
+        ]
+    table = quote(PriceAggregate._meta.db_table)
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table}")
+        cursor.execute(
+            f"INSERT INTO {table} ({', '.join(map(quote, targets))}) "
+            f"SELECT {', '.join(values)} FROM ("
+            f"SELECT {', '.join(groups)} FROM {quote(Spot._meta.db_table)} "
+            f"GROUP BY CUBE ({', '.join(dimensions)})) AS aggregates"
+        )
+        return cursor.rowcount
+
+
+def price_statistics(aggregate):
+    """API representation of a PriceAggregate values() row"""
+    data = {
+        name: aggregate[column]
+        for i, (name, column) in enumerate(DIMENSIONS.items())
+        if aggregate["grouping_set"] & (1 << i)
+    }
+    data["spot_count"] = aggregate["spot_count"]
+    for measure in MEASURES:
+        data[measure] = {
+            statistic: aggregate[f"{measure}_{statistic}"] for statistic in STATISTICS
+        }
+    return data
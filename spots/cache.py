@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+
+from .loading import data_version
+
+_version = None
+_checked_at = 0.0
+_missing = object()
+
+
+def current_data_version():
+    """
+    data_version(), read from the database at most every
+    SPOTS_DATA_VERSION_CHECK_INTERVAL seconds per process.
+    """
+    global _version, _checked_at
+    interval = getattr(settings, "SPOTS_DATA_VERSION_CHECK_INTERVAL", 1.0)
+    if _version is None or time.monotonic() - _checked_at >= interval:
+        _version = data_version()
+        _checked_at = time.monotonic()
+    return _version
+
+
+def response_digest(request, version):
+    """
+    SHA-256 of what a GET response depends on: the data version, the scheme and
+    host (the pagination links are absolute URLs), the path, the query
+    parameters (sorted by name) and the Accept header.
+    """
+    params = sorted((name, request.GET.getlist(name)) for name in request.GET)
+    key = json.dumps(
+        [
+            version,
+            request.scheme,
+            request.get_host(),
+            request.path,
+            params,
+            request.META.get("HTTP_ACCEPT", ""),
+        ]
+    )
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class CachedResponseMixin:
+    """
+    Serves GET responses from the SPOTS_RESPONSE_CACHE cache. Entries are keyed
+    by response_digest(), so a load makes every earlier entry unreachable (the
+    backend evicts them). Every cacheable response carries an ETag derived from
+    the same key: a matching If-None-Match gets a 304 without running the view
+    nor reading the cache. Only 200 responses that are not streamed nor
+    rendered by the browsable API are stored.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method != "GET":
+            return super().dispatch(request, *args, **kwargs)
+        digest = response_digest(request, current_data_version())
+        etag = f'"{digest[:32]}"'
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            not_modified["ETag"] = etag
+            return not_modified
+
+        cache = caches[settings.SPOTS_RESPONSE_CACHE]
+        key = "spots:response:" + digest
+        cached = cache.get(key)
+        if cached is not None:
+            content_type, content = cached
+            response = HttpResponse(content, content_type=content_type)
+        else:
+            response = super().dispatch(request, *args, **kwargs)
+            if not self.cacheable(response):
+                return response
+            cache.set(key, (response["Content-Type"], response.content))
+        response["ETag"] = etag
+        patch_vary_headers(response, ["Accept"])
+        return response
+
+    @staticmethod
+    def cacheable(response):
+        if response.status_code != 200 or response.streaming:
+            return False
+        renderer = getattr(response, "accepted_renderer", None)
+        if renderer is not None:
+            if renderer.format == "api":
+                return False
+            response.render()
+        return True
+
+
+class LRUFileBasedCache(FileBasedCache):
+    """
+    FileBasedCache that evicts the least recently used entries: a hit touches
+    the file's mtime and culling deletes the oldest files first, instead of
+    Django's random sample. Shared by every process using the same directory.
+    (LocMemCache already evicts in LRU order.)
+    """
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _missing, version)
+        if value is _missing:
+            return default
+        try:
+            os.utime(self._key_to_file(key, version))
+        except FileNotFoundError:
+            pass
+        return value
+
+    def _cull(self):
+        filelist = self._list_cache_files()
+        num_entries = len(filelist)
+        if num_entries < self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            return self.clear()
+
+        def last_used(fname):
+            try:
+                return os.path.getmtime(fname)
+            except FileNotFoundError:
+                return 0
+
+        filelist.sort(key=last_used)
+        for fname in filelist[: num_entries // self._cull_frequency]:
+            self._delete(fname)
@@ -0,0 +1,255 @@
+import difflib
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .models import GeocodeCacheEntry, Spot
+
+
+def normalize_location_key(location_str):
+    """
+    Normalizes a "colonia, municipio, estado" string so that trivially different
+    spellings (case, accents, spacing around commas) share one cache entry.
+    """
+    decomposed = unicodedata.normalize("NFKD", location_str or "")
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    parts = [re.sub(r"\s+", " ", part).strip() for part in stripped.lower().split(",")]
+    return ", ".join(part for part in parts if part)
+
+
+class GeocodeCache:
+    """
+    Geocoder result cache backed by GeocodeCacheEntry, with an in-memory memo so
+    each normalized location is resolved at most once per run.
+
+    Results are (latitude, longitude) tuples, or None for negative results.
+    Entries older than their TTL are treated as misses.
+    """
+
+    def __init__(
+        self, ttl=timedelta(days=90), negative_ttl=timedelta(days=7), persistent=True
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.persistent = persistent
+        self.memo = {}
+
+    def get_many(self, keys):
+        """Returns {key: result} for the keys with a fresh entry (one query)."""
+        results = {key: self.memo[key] for key in keys if key in self.memo}
+        missing = [key for key in keys if key not in self.memo]
+        if not missing or not self.persistent:
+            return results
+
+        now = timezone.now()
+        for entry in GeocodeCacheEntry.objects.filter(location_key__in=missing):
+            ttl = self.ttl if entry.found else self.negative_ttl
+            if entry.updated_at < now - ttl:
+                continue
+            result = (entry.latitude, entry.longitude) if entry.found else None
+            self.memo[entry.location_key] = result
+            results[entry.location_key] = result
+        return results
+
+    def set(self, key, query, result):
+        """Stores a geocoder result (None for "not found")."""
+        self.memo[key] = result
+        if not self.persistent:
+            return
+        latitude, longitude = result if result else (None, None)
+        GeocodeCacheEntry.objects.update_or_create(
+            location_key=key,
+            defaults={
+                "query": query,
+                "latitude": latitude,
+                "longitude": longitude,
+                "found": result is not None,
+                "updated_at": timezone.now(),
+            },
+        )
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter: acquire() blocks so that callers
+    make at most `rate` calls per second on average, with bursts of up to
+    `capacity` calls.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated_at) * self.rate
+                )
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+GazetteerLocation = namedtuple(
+    "GazetteerLocation", ["latitude", "longitude", "address", "level"]
+)
+
+
+class GazetteerGeocoder:
+    """
+    Offline geocoder that resolves "colonia, municipio, estado" strings to the
+    centroid of the CSV-sourced spots in that settlement, falling back to the
+    municipality and then the state centroid when the finer level is unknown.
+
+    Names are compared accent- and case-insensitively, with difflib fuzzy
+    matching for near misses. It exposes the same geocode() call as the geopy
+    geocoders, so load_props can use it in place of Nominatim.
+    """
+
+    # No network and no usage policy: callers don't need to throttle it
+    rate_limited = False
+
+    LEVELS = ("state", "municipality", "settlement")
+
+    def __init__(self, centroids, fuzzy_cutoff=0.85):
+        """
+        centroids: iterable of (state, municipality, settlement, latitude_sum,
+        longitude_sum, count) tuples, one per distinct raw name combination.
+        """
+        self.fuzzy_cutoff = fuzzy_cutoff
+        # level -> {key tuple: [latitude_sum, longitude_sum, count]}
+        sums = {level: defaultdict(lambda: [0.0, 0.0, 0]) for level in self.LEVELS}
+
+        for state, municipality, settlement, lat_sum, lng_sum, count in centroids:
+            state = normalize_location_key(state)
+            municipality = normalize_location_key(municipality)
+            settlement = normalize_location_key(settlement)
+            keys = {"state": (state,)}
+            if municipality:
+                keys["municipality"] = (state, municipality)
+                if settlement:
+                    keys["settlement"] = (state, municipality, settlement)
+            for level, key in keys.items():
+                acc = sums[level][key]
+                acc[0] += lat_sum
+                acc[1] += lng_sum
+                acc[2] += count
+
+        # level -> {key tuple: (latitude, longitude)}
+        self.centroids = {
+            level: {key: (lat / n, lng / n) for key, (lat, lng, n) in acc.items()}
+            for level, acc in sums.items()
+        }
+        # Candidate names per parent level, most populated first
+        self.children = defaultdict(list)
+        for level in self.LEVELS:
+            for key in sorted(self.centroids[level], key=lambda k: -sums[level][k][2]):
+                self.children[(level,) + key[:-1]].append(key[-1])
+        # For addresses without a recognizable state: municipality -> states that have it
+        self.municipality_states = defaultdict(list)
+        for state, municipality in sorted(
+            self.centroids["municipality"], key=lambda k: -sums["municipality"][k][2]
+        ):
+            if not self.municipality_states[municipality]:
+                self.children[("any_municipality",)].append(municipality)
+            self.municipality_states[municipality].append(state)
+
+    @classmethod
+    def from_spots(cls, queryset=None, **kwargs):
+        """Builds the gazetteer from the CSV-sourced spots with coordinates."""
+        if queryset is None:
+            queryset = Spot.objects.filter(data_source="csv")
+        rows = (
+            queryset.filter(
+                spot_latitude__isnull=False,
+                spot_longitude__isnull=False,
+                spot_state__isnull=False,
+            )
+            .values("spot_state", "spot_municipality", "spot_settlement")
+            .annotate(
+                lat_sum=Sum("spot_latitude"),
+                lng_sum=Sum("spot_longitude"),
+                count=Count("spot_id"),
+            )
+            .order_by()
+            .values_list(
+                "spot_state",
+                "spot_municipality",
+                "spot_settlement",
+                "lat_sum",
+                "lng_sum",
+                "count",
+            )
+        )
+        return cls(rows.iterator(), **kwargs)
+
+    def __len__(self):
+        return sum(len(level) for level in self.centroids.values())
+
+    def _match(self, name, level, parent=()):
+        """Returns the exact or closest known name under parent, or None."""
+        candidates = self.children.get((level,) + parent, [])
+        if not name or not candidates:
+            return None
+        if name in candidates:
+            return name
+        close = difflib.get_close_matches(name, candidates, n=1, cutoff=self.fuzzy_cutoff)
+        return close[0] if close else None
+
+    def geocode(self, query, **kwargs):
+        """Resolves a location string, or returns None if not even the state is known."""
+        parts = [part for part in normalize_location_key(query).split(", ") if part]
+        if not parts:
+            return None
+        if len(parts) >= 3:
+            settlement, municipality, state = ", ".join(parts[:-2]), parts[-2], parts[-1]
+        elif len(parts) == 2:
+            settlement, municipality, state = parts[0], parts[1], None
+        else:
+            settlement, municipality, state = None, parts[0], None
+
+        state_key = self._match(state, "state")
+        if state_key:
+            candidate_states = [state_key]
+        else:
+            # No recognizable state: look the municipality up in every state
+            candidate_states = self.municipality_states.get(
+                self._match(municipality, "any_municipality"), []
+            )
+
+        for candidate_state in candidate_states:
+            municipality_key = self._match(
+                municipality, "municipality", (candidate_state,)
+            )
+            if not municipality_key:
+                continue
+            settlement_key = self._match(
+                settlement, "settlement", (candidate_state, municipality_key)
+            )
+            if settlement_key:
+                return self._location(
+                    (candidate_state, municipality_key, settlement_key), "settlement"
+                )
+            return self._location((candidate_state, municipality_key), "municipality")
+
+        if state_key:
+            return self._location((state_key,), "state")
+        return None
+
+    def _location(self, key, level):
+        latitude, longitude = self.centroids[level][key]
+        return GazetteerLocation(latitude, longitude, ", ".join(reversed(key)), level)
@@ -0,0 +1,238 @@
+import json
+
+from django.core.exceptions import EmptyResultSet, FieldDoesNotExist
+from django.db import connections
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from .spatial import PointX, PointY
+
+# Same options as JSONRenderer with UNICODE_JSON, COMPACT_JSON and STRICT_JSON
+_encoder = json.JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+
+
+def render_json(data):
+    """Same bytes as rest_framework's JSONRenderer for plain JSON data"""
+    text = _encoder.encode(data)
+    return text.replace("\u2028", "\\u2028").replace("\u2029", "\\u2029").encode()
+
+
+def _round_up(digits):
+    """Adds one unit in the last place to a decimal string ("1.99" -> "2.00")."""
+    chars = list(digits)
+    i = len(chars) - 1
+    while i >= 0 and chars[i] in "9.":
+        if chars[i] == "9":
+            chars[i] = "0"
+        i -= 1
+    if i >= 0 and chars[i] != "-":
+        chars[i] = chr(ord(chars[i]) + 1)
+    else:
+        chars.insert(i + 1, "1")
+    return "".join(chars)
+
+
+def gdal_coordinate(value):
+    """
+    The coordinate as GEOSGeometry.geojson (GDAL's GeoJSON writer) prints it:
+    15 decimals, with the trailing 00000x / 99999x digits treated as
+    round-off and trimmed ("intelliround"). Few values end in such runs, but
+    for those the float differs from the stored one.
+    """
+    if abs(value) > 1e50:
+        return value
+    text = "%.15f" % value
+    n = len(text)
+    if n <= 10:
+        return float(text)
+    dot = text.index(".")
+    before = dot - 1 - (text[0] == "-")
+    if text[n - 6 : n - 1] == "00000":
+        text = text[:-1]
+    elif (
+        dot < n - 8
+        and all(before >= 4 + k or text[n - 3 - k] == "0" for k in range(5))
+        and text[n - 9 : n - 7] == "00"
+    ):
+        text = text[:-8]
+    elif text[n - 6 : n - 1] == "99999":
+        text = _round_up(text[: n - 6])
+    elif (
+        dot < n - 9
+        and all(before >= 4 + k or text[n - 3 - k] == "9" for k in range(5))
+        and text[n - 9 : n - 7] == "99"
+    ):
+        text = _round_up(text[: n - 9])
+    return float(text)
+
+
+class ValuesFeatureSerializer:
+    """
+    Builds the Feature dicts of a GeoFeatureModelSerializer for Point
+    geometries from values_list() rows instead of model instances: no model
+    or GEOS objects, and one converter call per property. The output is the
+    same, field by field and byte by byte once rendered.
+
+    fields / omit keep or drop serializer fields (the geo field included; the
+    id is always there) and only the kept columns are selected. extra columns
+    are read but not rendered, e.g. the sort key of the pagination.
+    """
+
+    def __init__(self, serializer_class, fields=None, omit=None, extra=()):
+        serializer = serializer_class()
+        meta = serializer.Meta
+        self.id_field = meta.id_field
+        self.geo_field = meta.geo_field
+        available = [
+            name
+            for name, field in serializer.fields.items()
+            if name != self.id_field and not field.write_only
+        ]
+        omit = set(omit or ())
+        unknown = (set(fields or ()) | omit) - set(available) - {self.id_field}
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}.")
+        selected = [
+            name
+            for name in available
+            if (fields is None or name in fields) and name not in omit
+        ]
+        self.geometry = self.geo_field in selected
+        self.fields = {name: serializer.fields[name] for name in selected}
+        self.properties = [
+            (name, self._converter(serializer.fields[name]))
+            for name in selected
+            if name != self.geo_field
+        ]
+        # Columns of each row, in the order to_representation reads them
+        self.columns = [self.id_field, *(name for name, _ in self.properties)]
+        self.columns += [name for name in extra if name not in self.columns]
+        if self.geometry:
+            self.columns += ["geometry_x", "geometry_y"]
+
+    @staticmethod
+    def _converter(field):
+        if isinstance(field, serializers.IntegerField):
+            return int
+        if isinstance(field, serializers.FloatField):
+            return float
+        if isinstance(field, serializers.CharField):
+            return str
+        return field.to_representation
+
+    @staticmethod
+    def _json_sql(field, column):
+        """SQL text of the JSON value of a column (functions of migration 0007)"""
+        if isinstance(field, serializers.IntegerField):
+            value = f"{column}::text"
+        elif isinstance(field, serializers.FloatField):
+            value = f"spots_json_float({column})"
+        elif isinstance(field, serializers.CharField):
+            value = f"spots_json_string({column})"
+        elif isinstance(field, serializers.DateField) and getattr(
+            field, "format", api_settings.DATE_FORMAT
+        ) in (None, ISO_8601):
+            value = f"to_json({column})::text"
+        else:
+            raise ValueError(f"{field.field_name} cannot be rendered by the database.")
+        return f"COALESCE({value}, 'null')"
+
+    def rows(self, queryset):
+        """values_list() of the queryset with the columns to_representation reads"""
+        if self.geometry:
+            queryset = queryset.annotate(
+                geometry_x=PointX(self.geo_field), geometry_y=PointY(self.geo_field)
+            )
+        return queryset.values_list(*self.columns, named=True)
+
+    def to_representation(self, row):
+        geometry = None
+        if self.geometry and row[-1] is not None:
+            geometry = {
+                "type": "Point",
+                "coordinates": [gdal_coordinate(row[-2]), gdal_coordinate(row[-1])],
+            }
+        properties = {}
+        for (name, convert), value in zip(self.properties, row[1:]):
+            properties[name] = None if value is None else convert(value)
+        return {
+            "id": int(row[0]),
+            "type": "Feature",
+            "geometry": geometry,
+            "properties": properties,
+        }
+
+    def feature_collection(self, rows):
+        return {
+            "type": "FeatureCollection",
+            "features": [self.to_representation(row) for row in rows],
+        }
+
+    def feature_collection_sql(self, rows, order):
+        """
+        (sql, params) of a query that builds the FeatureCollection of rows (a
+        rows() queryset) in PostgreSQL, ordered by order = [(column, descending)]:
+        one bytea with the same bytes as render_json(feature_collection(rows)).
+        """
+        connection = connections[rows.db]
+        inner, params = rows.query.get_compiler(rows.db).as_sql()
+        model = rows.model
+
+        def column(name):
+            try:
+                name = model._meta.get_field(name).column
+            except FieldDoesNotExist:
+                pass
+            return f"spots.{connection.ops.quote_name(name)}"
+
+        # The fixed parts of the JSON go as parameters, in the order of the %s
+        parts, fragments = [], []
+
+        def add(fragment, value):
+            parts.extend(("%s", value))
+            fragments.append(fragment)
+
+        add('{"id":', f"{column(self.id_field)}::text")
+        if self.geometry:
+            x, y = column("geometry_x"), column("geometry_y")
+            add(
+                ',"type":"Feature","geometry":',
+                f"CASE WHEN {y} IS NULL THEN 'null' ELSE %s || spots_geojson_coordinate({x})"
+                f" || ',' || spots_geojson_coordinate({y}) || %s END",
+            )
+            fragments += ['{"type":"Point","coordinates":[', "]}"]
+        else:
+            add(',"type":"Feature","geometry":', "'null'")
+        prefix = ',"properties":{'
+        for name, _ in self.properties:
+            key = render_json(name).decode()
+            add(f"{prefix}{key}:", self._json_sql(self.fields[name], column(name)))
+            prefix = ","
+        parts.append("%s")
+        fragments.append("}}" if self.properties else prefix + "}}")
+        feature = " || ".join(parts)
+        ordering = ", ".join(
+            f"{column(name)} {'DESC' if descending else 'ASC'}" for name, descending in order
+        )
+        if ordering:
+            ordering = f" ORDER BY {ordering}"
+        sql = (
+            f"SELECT convert_to(%s || COALESCE(string_agg({feature}, ','{ordering}), '')"
+            f" || %s, 'UTF8') FROM ({inner}) AS spots"
+        )
+        return sql, (
+            '{"type":"FeatureCollection","features":[',
+            *fragments,
+            "]}",
+            *params,
+        )
+
+    def assemble(self, rows, order=()):
+        """The rendered FeatureCollection of rows, built by the database"""
+        try:
+            sql, params = self.feature_collection_sql(rows, order)
+        except EmptyResultSet:
+            return render_json(self.feature_collection([]))
+        with connections[rows.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            return bytes(cursor.fetchone()[0])
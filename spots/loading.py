@@ -0,0 +1,212 @@
+import hashlib
+import json
+import os
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from .aggregates import refresh_price_aggregates
+from .models import DataVersion, LoadManifest, Spot
+from .search import spot_search_vector
+
+
+def file_checksum(path, chunk_size=1024 * 1024):
+    """SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_hash(value):
+    """
+    SHA-256 of a JSON-serializable record (dicts are hashed with sorted keys,
+    dates and other values through str()).
+    """
+    encoded = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def start_load(command, path, force=False):
+    """
+    Records the start of a loader run. Returns (manifest, previous): when the
+    same file was already loaded completely and force is False, previous is
+    that earlier manifest and the new one is saved as skipped. A partial load
+    (some rows failed) does not count, so the next run retries the file.
+    """
+    checksum = file_checksum(path)
+    manifest = LoadManifest(
+        command=command,
+        source_path=str(path),
+        file_checksum=checksum,
+        file_size=os.path.getsize(path),
+    )
+    previous = None
+    if not force:
+        previous = (
+            LoadManifest.objects.filter(
+                command=command,
+                file_checksum=checksum,
+                status=LoadManifest.STATUS_COMPLETED,
+            )
+            .order_by("-finished_at")
+            .first()
+        )
+    if previous:
+        manifest.status = LoadManifest.STATUS_SKIPPED
+        manifest.finished_at = manifest.started_at
+    manifest.save()
+    return manifest, previous
+
+
+def finish_load(manifest, status, **counts):
+    """
+    Stores the final status, counts and end time of a loader run and bumps the
+    data version, in one transaction. The search vectors of the written spots
+    are computed in bulk first, and a completed or partial load also rebuilds
+    the price aggregates, so both are current by the time the new data version
+    is visible. Failed loads also bump it: earlier batches may have been
+    committed.
+    """
+    aggregates = status in (LoadManifest.STATUS_COMPLETED, LoadManifest.STATUS_PARTIAL)
+    with transaction.atomic():
+        refresh_search_vectors()
+        if aggregates:
+            refresh_price_aggregates()
+        manifest.status = status
+        manifest.finished_at = timezone.now()
+        for field, value in counts.items():
+            setattr(manifest, field, value)
+        manifest.save()
+        bump_data_version(aggregates=aggregates)
+
+
+def refresh_search_vectors(queryset=None):
+    """
+    Stores Spot.search_vector in a single UPDATE for the spots of queryset, by
+    default those without one: inserted or with new text since the last load
+    (the upserts set it to null). Returns the number of spots updated.
+    """
+    if queryset is None:
+        queryset = Spot.objects.filter(search_vector__isnull=True)
+    return queryset.update(search_vector=spot_search_vector())
+
+
+def refresh_after_edit(queryset):
+    """
+    Keeps the derived data current after spots are edited outside the loaders
+    (the admin). The search vectors of queryset and the data version are
+    updated in the caller's transaction, which leaves the price aggregates
+    stale; they are rebuilt after it commits (see
+    schedule_price_aggregates_refresh()). Pass an empty queryset after
+    deletions.
+    """
+    with transaction.atomic():
+        refresh_search_vectors(queryset)
+        bump_data_version()
+        transaction.on_commit(schedule_price_aggregates_refresh)
+
+
+def price_aggregates_stale():
+    """Whether spots changed since the price aggregates were last rebuilt."""
+    return DataVersion.objects.filter(
+        pk=1, aggregates_version__lt=F("version")
+    ).exists()
+
+
+def refresh_stale_price_aggregates():
+    """
+    Rebuilds the price aggregates while they are stale, each time in one
+    transaction that also bumps the data version so the cached statistics are
+    dropped. When spots change during a rebuild the aggregates stay stale and
+    are rebuilt again. Returns the number of rebuilds.
+    """
+    rebuilds = 0
+    while True:
+        with transaction.atomic():
+            version = (
+                DataVersion.objects.filter(pk=1, aggregates_version__lt=F("version"))
+                .values_list("version", flat=True)
+                .first()
+            )
+            if version is None:
+                return rebuilds
+            refresh_price_aggregates()
+            DataVersion.objects.filter(pk=1).update(
+                aggregates_version=Case(
+                    When(version=version, then=F("version") + 1),
+                    default=Value(version),
+                ),
+                version=F("version") + 1,
+                updated_at=timezone.now(),
+            )
+        rebuilds += 1
+
+
+_refresh_lock = threading.Lock()
+_refresh_running = False
+_refresh_requested = False
+
+
+def schedule_price_aggregates_refresh():
+    """
+    Runs refresh_stale_price_aggregates() in a background thread, so a full
+    rebuild never holds a request or its transaction. One thread per process:
+    requests made while it runs are folded into one more pass. With
+    SPOTS_PRICE_AGGREGATES_IN_BACKGROUND off, the rebuild runs inline.
+    """
+    global _refresh_running, _refresh_requested
+    if not getattr(settings, "SPOTS_PRICE_AGGREGATES_IN_BACKGROUND", True):
+        refresh_stale_price_aggregates()
+        return
+    with _refresh_lock:
+        _refresh_requested = True
+        if _refresh_running:
+            return
+        _refresh_running = True
+    threading.Thread(target=_refresh_in_background, daemon=True).start()
+
+
+def _refresh_in_background():
+    global _refresh_running, _refresh_requested
+    try:
+        while True:
+            with _refresh_lock:
+                if not _refresh_requested:
+                    _refresh_running = False
+                    return
+                _refresh_requested = False
+            refresh_stale_price_aggregates()
+    except BaseException:
+        with _refresh_lock:
+            _refresh_running = False
+        raise
+    finally:
+        connection.close()
+
+
+def bump_data_version(aggregates=False):
+    """
+    Increments the data version counter (creating its row the first time).
+    aggregates=True records that the price aggregates were rebuilt in the same
+    transaction.
+    """
+    changes = {"version": F("version") + 1, "updated_at": timezone.now()}
+    if aggregates:
+        changes["aggregates_version"] = F("version") + 1
+    updated = DataVersion.objects.filter(pk=1).update(**changes)
+    if not updated:
+        DataVersion.objects.create(pk=1, version=1, aggregates_version=int(aggregates))
+
+
+def data_version():
+    """
+    Identifies the current state of the loaded data: the counter bumped by
+    every loader run, 0 before the first one.
+    """
+    version = DataVersion.objects.filter(pk=1).values_list("version", flat=True)
+    return version.first() or 0
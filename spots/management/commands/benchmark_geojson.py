@@ -0,0 +1,129 @@
+import datetime
+import random
+import time
+from collections import namedtuple
+
+from django.contrib.gis.geos import Point
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from spots.geojson import ValuesFeatureSerializer, render_json
+from spots.models import Spot
+from spots.serializers import SpotSerializer
+
+
+def synthetic_spots(count, seed=0):
+    """Unsaved Spots with values like the CSV ones, some of them missing"""
+    rng = random.Random(seed)
+
+    def maybe(value):
+        return None if rng.random() < 0.1 else value
+
+    return [
+        Spot(
+            spot_id=spot_id,
+            spot_sector_id=maybe(rng.choice([9, 11, 15])),
+            spot_type_id=maybe(rng.choice([1, 2, 3])),
+            spot_settlement=maybe(f"Colonia {rng.randint(1, 500)}"),
+            spot_municipality=maybe(rng.choice(["Álvaro Obregón", "Benito Juárez", "Tijuana"])),
+            spot_state=maybe("Ciudad de México"),
+            spot_region=maybe("Centro"),
+            spot_corridor=maybe(f"Corredor {rng.randint(1, 50)}"),
+            spot_address=maybe(f"Calle {rng.randint(1, 999)} #{rng.randint(1, 99)}"),
+            spot_title=maybe(f"Local en renta {spot_id}"),
+            spot_description=maybe("Local comercial con estacionamiento, \"ideal\" para oficina."),
+            location=Point(
+                round(rng.uniform(-118.0, -86.0), rng.randint(4, 15)),
+                round(rng.uniform(14.0, 33.0), rng.randint(4, 15)),
+                srid=4326,
+            ),
+            spot_area_in_sqm=maybe(round(rng.uniform(20, 2000), 2)),
+            spot_price_sqm_mxn_rent=maybe(round(rng.uniform(50, 900), 2)),
+            spot_price_total_mxn_rent=maybe(round(rng.uniform(5000, 500000), 2)),
+            spot_price_sqm_mxn_sale=maybe(round(rng.uniform(5000, 90000), 2)),
+            spot_price_total_mxn_sale=maybe(round(rng.uniform(1e6, 1e8), 2)),
+            spot_maintenance_cost=maybe(round(rng.uniform(0, 20000), 2)),
+            spot_modality=maybe(rng.choice(["Rent", "Sale", "Rent & Sale"])),
+            user_id=maybe(rng.randint(1, 10000)),
+            spot_created_date=maybe(
+                datetime.date(2020, 1, 1) + datetime.timedelta(days=rng.randint(0, 1800))
+            ),
+        )
+        for spot_id in range(1, count + 1)
+    ]
+
+
+def values_rows(features, spots):
+    """The values_list() rows the fast path would read for these spots"""
+    row_class = namedtuple("Row", features.columns)
+    return [
+        row_class(
+            spot.spot_id,
+            *(getattr(spot, name) for name, _ in features.properties),
+            spot.location.x,
+            spot.location.y,
+        )
+        for spot in spots
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Times SpotSerializer against the values() fast path (ValuesFeatureSerializer) "
+        "rendering a FeatureCollection, and checks both produce the same bytes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000, help="Features per run")
+        parser.add_argument("--repeat", type=int, default=3, help="Runs; the best one counts")
+        parser.add_argument(
+            "--database",
+            action="store_true",
+            help="Read the first rows of the Spot table, timing the queries too",
+        )
+
+    def handle(self, *args, **options):
+        count = options["rows"]
+        features = ValuesFeatureSerializer(SpotSerializer)
+        renderer = JSONRenderer()
+
+        if options["database"]:
+            queryset = Spot.objects.order_by("spot_id")[:count]
+            rows = features.rows(Spot.objects.order_by("spot_id"))[:count]
+
+            def slow():
+                return renderer.render(SpotSerializer(list(queryset.all()), many=True).data)
+
+            def fast():
+                return render_json(features.feature_collection(rows.all()))
+
+        else:
+            spots = synthetic_spots(count)
+            rows = values_rows(features, spots)
+
+            def slow():
+                return renderer.render(SpotSerializer(spots, many=True).data)
+
+            def fast():
+                return render_json(features.feature_collection(rows))
+
+        timings = {}
+        for name, run in (("SpotSerializer", slow), ("values() fast path", fast)):
+            best = None
+            for _ in range(options["repeat"]):
+                started = time.perf_counter()
+                output = run()
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            timings[name] = (best, output)
+
+        (slow_time, slow_output), (fast_time, fast_output) = timings.values()
+        if slow_output != fast_output:
+            raise CommandError("The fast path output differs from SpotSerializer's.")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{count} features, {len(fast_output)} bytes, identical output. "
+                f"SpotSerializer: {slow_time:.3f}s, values() fast path: {fast_time:.3f}s "
+                f"({slow_time / fast_time:.1f}x)."
+            )
+        )
@@ -1,62 +1,393 @@
+import collections
+import itertools
 import json
 import os
-import time  # Para añadir un pequeño delay en geocoding
+import time  # For the backoff between geocoding retries
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 from decimal import Decimal, InvalidOperation
 from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
 from django.utils.dateparse import parse_datetime
 from django.contrib.gis.geos import Point
+from django.db import connection, transaction
 from django.db.models import Max  # Para obtener el máximo ID existente
-from spots.models import Spot
+from spots.geocoding import (
+    GazetteerGeocoder,
+    GeocodeCache,
+    TokenBucket,
+    normalize_location_key,
+)
+from spots.loading import content_hash, finish_load, start_load
+from spots.models import LoadManifest, Spot
 from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+from geopy.exc import GeocoderRateLimited, GeocoderTimedOut, GeocoderServiceError
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Size of each read of the incremental parser (in characters)
+READ_CHUNK_SIZE = 64 * 1024
+
+_JSON_WHITESPACE = " \t\n\r"
+
+# Records per batch: one geocoding cache query and one upsert per batch
+DEFAULT_BATCH_SIZE = 500
+
+# Sequence the spot_id of new records come from (migration 0004)
+SPOT_ID_SEQUENCE = "spots_spot_json_id_seq"
+
+# Normalized fields written by the upsert (location is built in SQL)
+UPSERT_FIELDS = [
+    "data_source",
+    "spot_settlement",
+    "spot_municipality",
+    "spot_state",
+    "spot_area_in_sqm",
+    "spot_price_total_mxn_rent",
+    "spot_price_total_mxn_sale",
+    "spot_modality",
+    "spot_title",
+    "spot_created_date",
+    "spot_latitude",
+    "spot_longitude",
+    "content_hash",
+]
+
+# Batches whose geocoding may be in flight while the current one is written
+GEOCODE_PENDING_BATCHES = 2
+
+# Base wait before the first retry; doubled on each attempt
+GEOCODE_BACKOFF_SECONDS = 1
+
+
+def iter_json_array(jsonfile, chunk_size=READ_CHUNK_SIZE):
+    """
+    Yields the elements of a top-level JSON array one at a time, reading the
+    file in chunks so only the current element is kept in memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = jsonfile.read(chunk_size)
+        if not chunk:
+            eof = True
+        # Drop what was already consumed so the buffer does not grow
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in _JSON_WHITESPACE:
+                pos += 1
+            if pos < len(buffer) or eof:
+                return
+            fill()
+
+    skip_whitespace()
+    if pos >= len(buffer) or buffer[pos] != "[":
+        raise json.JSONDecodeError("Expecting '['", buffer, pos)
+    pos += 1
+
+    skip_whitespace()
+    if pos < len(buffer) and buffer[pos] == "]":
+        return
+
+    while True:
+        skip_whitespace()
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+                # A value ending right at the end of the buffer may be truncated
+                if end < len(buffer) or eof:
+                    break
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            fill()
+        pos = end
+        yield item
+
+        skip_whitespace()
+        if pos >= len(buffer):
+            raise json.JSONDecodeError("Unterminated array", buffer, pos)
+        if buffer[pos] == "]":
+            return
+        if buffer[pos] != ",":
+            raise json.JSONDecodeError("Expecting ',' delimiter", buffer, pos)
+        pos += 1
+
+
+def iter_ndjson(jsonfile):
+    """Yields one JSON object per non-empty line (NDJSON / JSON Lines)."""
+    for line in jsonfile:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
 
 class Command(BaseCommand):
     help = "Loads, normalizes, and geocodes spot data from props_list.json into the Spot model"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--json_path",
+            type=str,
+            help="Optional path to the JSON or NDJSON file to load",
+            default=os.path.join(settings.BASE_DIR, "data", "props_list.json"),
+        )
+        parser.add_argument(
+            "--format",
+            type=str,
+            choices=["auto", "json", "ndjson"],
+            default="auto",
+            help=(
+                "Input format: 'json' for a top-level array, 'ndjson' for one object "
+                "per line, 'auto' to detect it from the first character"
+            ),
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Records per geocoding batch and per upsert statement",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Reload the file even if it was already loaded, re-processing unchanged items too",
+        )
+        parser.add_argument(
+            "--geocoder",
+            type=str,
+            choices=["nominatim", "gazetteer"],
+            default="nominatim",
+            help=(
+                "Geocoding backend: 'nominatim' (online, 1 req/s) or 'gazetteer' "
+                "(offline centroids of the CSV-sourced spots)"
+            ),
+        )
+        parser.add_argument(
+            "--geocoder-domain",
+            type=str,
+            default="nominatim.openstreetmap.org",
+            help="Nominatim host, e.g. a self-hosted instance (host[:port])",
+        )
+        parser.add_argument(
+            "--geocoder-scheme",
+            type=str,
+            choices=["http", "https"],
+            default="https",
+            help="Scheme of the Nominatim host ('http' for a local instance without TLS)",
+        )
+        parser.add_argument(
+            "--geocode-rate",
+            type=float,
+            default=1.0,
+            help="Maximum geocoder requests per second (public Nominatim allows 1)",
+        )
+        parser.add_argument(
+            "--geocode-workers",
+            type=int,
+            default=1,
+            help="Concurrent geocoder requests",
+        )
+        parser.add_argument(
+            "--geocode-retries",
+            type=int,
+            default=2,
+            help="Retries with exponential backoff after a geocoder timeout",
+        )
+        parser.add_argument(
+            "--geocode-timeout",
+            type=float,
+            default=10,
+            help="Seconds to wait for each geocoder response",
+        )
+        parser.add_argument(
+            "--geocode-ttl-days",
+            type=int,
+            default=90,
+            help="Days a cached geocoding result stays valid",
+        )
+        parser.add_argument(
+            "--geocode-negative-ttl-days",
+            type=int,
+            default=7,
+            help="Days a cached 'not found' result stays valid",
+        )
+
     def handle(self, *args, **options):
-        file_path = os.path.join(settings.BASE_DIR, "data", "props_list.json")
+        file_path = options["json_path"]
         self.stdout.write(f"Looking for JSON file at: {file_path}")
 
         if not os.path.exists(file_path):
             raise CommandError(f"JSON file not found at {file_path}")
+        if options["geocode_rate"] <= 0 or options["geocode_workers"] <= 0:
+            raise CommandError("--geocode-rate and --geocode-workers must be positive")
+        if options["batch_size"] <= 0:
+            raise CommandError("--batch-size must be a positive integer")
+
+        force = options["force"]
+        manifest, previous = start_load("load_props", file_path, force=force)
+        if previous:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"File unchanged since load #{previous.pk} ({previous.finished_at:%Y-%m-%d %H:%M}). "
+                    f"Skipping. Use --force to reload."
+                )
+            )
+            return
+
+        # --- Preparación para Geocoding y ID ---
+        if options["geocoder"] == "gazetteer":
+            # Local index built from the CSV spots: no network and no usage limit
+            geolocator = GazetteerGeocoder.from_spots()
+            self.stdout.write(f"Built gazetteer with {len(geolocator)} places.")
+        else:
+            geolocator = Nominatim(
+                user_agent="spot_loader_app",  # Necesario para Nominatim
+                domain=options["geocoder_domain"],
+                scheme=options["geocoder_scheme"],
+            )
+        cache = GeocodeCache(
+            ttl=timedelta(days=options["geocode_ttl_days"]),
+            negative_ttl=timedelta(days=options["geocode_negative_ttl_days"]),
+            # Gazetteer centroids must not end up in the Nominatim cache
+            persistent=options["geocoder"] == "nominatim",
+        )
+        lookup_options = {
+            "retries": options["geocode_retries"],
+            "timeout": options["geocode_timeout"],
+            # Only remote backends are throttled (public Nominatim: 1 req/s)
+            "rate_limiter": (
+                TokenBucket(options["geocode_rate"])
+                if getattr(geolocator, "rate_limited", True)
+                else None
+            ),
+        }
+        # New spot_ids come from a sequence, so two concurrent loads cannot
+        # collide. The sequence is moved forward if another load (e.g. the CSV)
+        # inserted higher IDs; it never moves back.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH current_max AS (SELECT MAX(spot_id) AS max_id FROM {connection.ops.quote_name(Spot._meta.db_table)})
+                SELECT setval(%s, max_id) FROM current_max
+                WHERE max_id >= (SELECT last_value FROM {connection.ops.quote_name(SPOT_ID_SEQUENCE)})
+                """,
+                [SPOT_ID_SEQUENCE],
+            )
+            cursor.execute(
+                f"SELECT last_value, is_called FROM {connection.ops.quote_name(SPOT_ID_SEQUENCE)}"
+            )
+            last_value, is_called = cursor.fetchone()
+        current_max_id = Spot.objects.aggregate(max_id=Max("spot_id"))["max_id"] or 0
+        next_spot_id = last_value + 1 if is_called else last_value
+        self.stdout.write(
+            f"Max existing spot_id: {current_max_id}. Starting new IDs from {next_spot_id}."
+        )
+
+        self.item_count = 0
+        self.created_count = 0
+        self.updated_count = 0
+        self.skipped_count = 0
+        self.unchanged_count = 0
+        self.failed_count = 0
+        self.geocode_errors = 0
+        self.geocoder_calls = 0
+        self.cache_hits = 0
 
         try:
             with open(file_path, mode="r", encoding="utf-8") as jsonfile:
-                data = json.load(jsonfile)
+                # Each item goes through the stages without loading the whole document
+                items = self._read_items(jsonfile, options["format"])
+                records = self._normalize(items)
+                if not force:
+                    records = self._skip_unchanged(records, options["batch_size"])
+                executor = ThreadPoolExecutor(max_workers=options["geocode_workers"])
+                try:
+                    records = self._geocode(
+                        records,
+                        geolocator,
+                        cache,
+                        executor,
+                        lookup_options,
+                        options["batch_size"],
+                    )
+                    self._upsert(records, options["batch_size"])
+                finally:
+                    # If the load fails, the queued lookups never reach the geocoder
+                    executor.shutdown(wait=True, cancel_futures=True)
         except json.JSONDecodeError as e:
+            finish_load(manifest, LoadManifest.STATUS_FAILED)
             raise CommandError(f"Error decoding JSON: {e}")
         except Exception as e:
+            finish_load(manifest, LoadManifest.STATUS_FAILED)
             raise CommandError(f"Error reading file: {e}")
 
-        # --- Preparación para Geocoding y ID ---
-        geolocator = Nominatim(user_agent="spot_loader_app")  # Necesario para Nominatim
-        # Encontrar el máximo spot_id existente para generar nuevos IDs
-        max_id_result = Spot.objects.aggregate(max_id=Max("spot_id"))
-        current_max_id = (
-            max_id_result["max_id"] if max_id_result["max_id"] is not None else 0
+        # Items that failed to write or have no coordinates are retried by the
+        # next run of the same file
+        error_count = self.failed_count + self.geocode_errors
+        finish_load(
+            manifest,
+            (
+                LoadManifest.STATUS_PARTIAL
+                if error_count
+                else LoadManifest.STATUS_COMPLETED
+            ),
+            row_count=self.item_count,
+            created_count=self.created_count,
+            updated_count=self.updated_count,
+            unchanged_count=self.unchanged_count,
+            error_count=error_count,
         )
-        next_spot_id = current_max_id + 1
+        style = self.style.WARNING if error_count else self.style.SUCCESS
         self.stdout.write(
-            f"Max existing spot_id: {current_max_id}. Starting new IDs from {next_spot_id}."
+            style(
+                f"Successfully processed {self.item_count} items. "
+                f"Created: {self.created_count}, Updated: {self.updated_count}, "
+                f"Unchanged: {self.unchanged_count}, Skipped: {self.skipped_count}. "
+                f"Failed: {self.failed_count}. "
+                f"Geocoding Errors/Not Found: {self.geocode_errors}. "
+                f"Geocoder calls: {self.geocoder_calls}, Cache hits: {self.cache_hits}."
+            )
         )
 
-        created_count = 0
-        updated_count = 0
-        skipped_count = 0
-        geocode_errors = 0
+    def _read_items(self, jsonfile, file_format):
+        """Yields raw property objects from a JSON array or an NDJSON file."""
+        if file_format == "auto":
+            first_char = ""
+            while True:
+                char = jsonfile.read(1)
+                if not char or not char.isspace():
+                    first_char = char
+                    break
+            jsonfile.seek(0)
+            file_format = "json" if first_char == "[" else "ndjson"
+
+        if file_format == "json":
+            return iter_json_array(jsonfile)
+        return iter_ndjson(jsonfile)
 
-        for idx, item in enumerate(data):
+    def _normalize(self, items):
+        """
+        Normalization stage: yields (idx, public_id, location_str, defaults_data)
+        for every item with a public_id.
+        """
+        for idx, item in enumerate(items):
+            self.item_count += 1
             public_id = item.get("public_id")
             if not public_id:
                 self.stdout.write(
                     self.style.WARNING(f"Skipping item {idx + 1}: Missing public_id")
                 )
-                skipped_count += 1
+                self.skipped_count += 1
                 continue
 
             # Datos base para actualizar o crear
@@ -120,107 +451,256 @@ class Command(BaseCommand):
                 except ValueError:
                     pass
 
-            # --- Geocodificación ---
-            latitude, longitude = None, None
-            location_point = None
-            if location_str:
-                try:
-                    location_geo = geolocator.geocode(
-                        location_str, timeout=10
-                    )  # Intentar geocodificar
-                    if location_geo:
-                        latitude = location_geo.latitude
-                        longitude = location_geo.longitude
-                        location_point = Point(longitude, latitude, srid=4326)
-                        defaults_data["spot_latitude"] = latitude
-                        defaults_data["spot_longitude"] = longitude
-                        defaults_data["location"] = location_point
-                        self.stdout.write(
-                            f"Geocoded '{location_str}' to ({latitude}, {longitude})"
-                        )
-                    else:
-                        self.stdout.write(
-                            self.style.WARNING(
-                                f"Could not geocode address for {public_id}: '{location_str}'"
+            # Hash of the original object: any change in the source alters it
+            defaults_data["content_hash"] = content_hash(item)
+
+            yield idx, public_id, location_str, defaults_data
+
+    def _skip_unchanged(self, records, batch_size):
+        """
+        Delta stage: drops the records whose content hash matches the stored
+        spot (or an identical earlier occurrence in the same batch), so that
+        unchanged items are neither geocoded nor written again. Spots that
+        could not be geocoded are stored without a hash, so they never match.
+        """
+        while True:
+            batch = list(itertools.islice(records, batch_size))
+            if not batch:
+                return
+            known = dict(
+                Spot.objects.filter(
+                    public_id__in={record[1] for record in batch}
+                ).values_list("public_id", "content_hash")
+            )
+            for record in batch:
+                public_id, defaults_data = record[1], record[3]
+                if known.get(public_id) == defaults_data["content_hash"]:
+                    self.unchanged_count += 1
+                    continue
+                known[public_id] = defaults_data["content_hash"]
+                yield record
+
+    def _geocode(
+        self, records, geolocator, cache, executor, lookup_options, batch_size
+    ):
+        """
+        Geocoding stage: adds the coordinates to each record's defaults_data.
+
+        Records are read in batches: the cache is queried once per batch, and
+        each distinct location missing from it is submitted once to the thread
+        pool, where the rate limiter paces the calls. Up to
+        GEOCODE_PENDING_BATCHES batches are in flight, so the lookups for the
+        next batches keep running while the writer consumes the current one.
+        """
+        failed_keys = set()  # Network/service errors: not cached, but not retried either
+        in_flight = {}  # llave normalizada -> Future
+        pending = collections.deque()
+        exhausted = False
+
+        while True:
+            while not exhausted and len(pending) < GEOCODE_PENDING_BATCHES:
+                batch = list(itertools.islice(records, batch_size))
+                if not batch:
+                    exhausted = True
+                    break
+                locations = {
+                    normalize_location_key(r[2]): r[2] for r in batch if r[2]
+                }
+                cached = cache.get_many(
+                    [key for key in locations if key not in in_flight]
+                )
+                for key, location_str in locations.items():
+                    if key in cached or key in in_flight or key in failed_keys:
+                        continue
+                    self.geocoder_calls += 1
+                    in_flight[key] = executor.submit(
+                        self._lookup, geolocator, location_str, **lookup_options
+                    )
+                pending.append(batch)
+
+            if not pending:
+                return
+
+            for idx, public_id, location_str, defaults_data in pending.popleft():
+                if location_str:
+                    key = normalize_location_key(location_str)
+                    if key in in_flight:
+                        try:
+                            result = in_flight.pop(key).result()
+                        except (GeocoderTimedOut, GeocoderServiceError) as e:
+                            self.stdout.write(
+                                self.style.ERROR(f"Geocoding error for {public_id}: {e}")
                             )
+                            self.geocode_errors += 1
+                            failed_keys.add(key)
+                        except Exception as e:
+                            logger.exception(f"Unexpected geocoding error for {public_id}")
+                            self.geocode_errors += 1
+                            failed_keys.add(key)
+                        else:
+                            cache.set(key, location_str, result)
+                            self._apply_geocode(
+                                public_id, location_str, defaults_data, result, False
+                            )
+                    elif key in cache.memo:
+                        self.cache_hits += 1
+                        self._apply_geocode(
+                            public_id, location_str, defaults_data, cache.memo[key], True
                         )
-                        geocode_errors += 1
-                    time.sleep(
-                        1
-                    )  # IMPORTANTE: Respetar los límites de uso de Nominatim (1 req/sec)
-                except (GeocoderTimedOut, GeocoderServiceError) as e:
-                    self.stdout.write(
-                        self.style.ERROR(f"Geocoding error for {public_id}: {e}")
-                    )
-                    geocode_errors += 1
-                    time.sleep(1)  # Esperar antes de reintentar con el siguiente
-                except Exception as e:
-                    logger.exception(f"Unexpected geocoding error for {public_id}")
-                    geocode_errors += 1
-                    time.sleep(1)
+                    else:
+                        self.geocode_errors += 1
+                    if "location" not in defaults_data:
+                        # No coordinates (not found or error): the hash is not
+                        # stored, so the next load geocodes the item again
+                        defaults_data["content_hash"] = None
 
-            # --- Fin Normalización y Geocodificación ---
+                yield idx, public_id, location_str, defaults_data
 
-            # Usar get_or_create basado en public_id
+    @staticmethod
+    def _lookup(geolocator, location_str, rate_limiter=None, retries=0, timeout=10):
+        """
+        Calls the geocoder (runs in the thread pool). Timeouts and rate-limit
+        responses are retried with exponential backoff.
+        Returns (latitude, longitude) or None if not found.
+        """
+        for attempt in range(retries + 1):
+            if rate_limiter:
+                rate_limiter.acquire()
             try:
-                # Datos que se usarán SOLO si se CREA un nuevo objeto
-                create_defaults = defaults_data.copy()
-                create_defaults["spot_id"] = (
-                    next_spot_id  # Asignar el nuevo ID numérico
-                )
+                location_geo = geolocator.geocode(
+                    location_str, timeout=timeout
+                )  # Intentar geocodificar
+            except (GeocoderTimedOut, GeocoderRateLimited) as e:
+                if attempt == retries:
+                    raise
+                delay = GEOCODE_BACKOFF_SECONDS * 2**attempt
+                if isinstance(e, GeocoderRateLimited) and e.retry_after:
+                    delay = max(delay, e.retry_after)
+                time.sleep(delay)
+                continue
+            if location_geo:
+                return location_geo.latitude, location_geo.longitude
+            return None
 
-                obj, created = Spot.objects.get_or_create(
-                    public_id=public_id,
-                    defaults=create_defaults,  # Usar todos los datos (incluido spot_id) al crear
+    def _apply_geocode(self, public_id, location_str, defaults_data, result, from_cache):
+        """Copies a geocoding result into defaults_data and reports it."""
+        suffix = " (cached)" if from_cache else ""
+        if result:
+            latitude, longitude = result
+            defaults_data["spot_latitude"] = latitude
+            defaults_data["spot_longitude"] = longitude
+            defaults_data["location"] = Point(longitude, latitude, srid=4326)
+            self.stdout.write(
+                f"Geocoded '{location_str}' to ({latitude}, {longitude}){suffix}"
+            )
+        else:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Could not geocode address for {public_id}: '{location_str}'{suffix}"
                 )
+            )
+            self.geocode_errors += 1
 
-                if created:
-                    created_count += 1
-                    next_spot_id += 1  # Incrementar solo si se creó uno nuevo
-                    self.stdout.write(
-                        f"Created new spot with ID {obj.spot_id} for public_id {public_id}"
-                    )
-                else:
-                    # Si ya existía, actualízalo con los datos (sin incluir spot_id en la actualización)
-                    updated = False
-                    for key, value in defaults_data.items():
-                        # Actualizar solo si el valor nuevo es diferente del existente (y no es None)
-                        if value is not None and getattr(obj, key) != value:
-                            setattr(obj, key, value)
-                            updated = True
-                    if updated:
-                        obj.save()
-                        updated_count += 1
-                        self.stdout.write(f"Updated spot with public_id {public_id}")
-                    # else:
-                    #     self.stdout.write(f"No changes detected for public_id {public_id}")
-
-            except IntegrityError as e:
-                # Podría ocurrir si hay un problema con la unicidad de public_id u otro constraint
-                self.stderr.write(
-                    self.style.ERROR(
-                        f"Integrity error for item {idx + 1} (ID: {public_id}): {e}"
-                    )
-                )
-                logger.exception(
-                    f"Integrity error processing item {idx + 1} (ID: {public_id}) with data: {item}"
-                )
-                skipped_count += 1
-            except Exception as e:
+    def _upsert(self, records, batch_size):
+        """
+        Upsert stage: writes each batch of records with one INSERT ... ON CONFLICT
+        (public_id) statement. A public_id repeated inside a batch is split into
+        successive statements so that every occurrence is applied in order.
+        """
+        while True:
+            batch = list(itertools.islice(records, batch_size))
+            if not batch:
+                return
+            generations = []
+            occurrences = collections.Counter()
+            for record in batch:
+                generation = occurrences[record[1]]
+                occurrences[record[1]] += 1
+                if generation == len(generations):
+                    generations.append([])
+                generations[generation].append(record)
+            for generation in generations:
+                self._upsert_batch(generation)
+
+    def _upsert_batch(self, records):
+        """
+        Upserts records with distinct public_ids in a single statement. New rows
+        take their spot_id from SPOT_ID_SEQUENCE; existing rows are only
+        rewritten when a non-null incoming value differs from the stored one,
+        and null values never overwrite stored data.
+        """
+        quote = connection.ops.quote_name
+        table = quote(Spot._meta.db_table)
+        columns = ["public_id"] + UPSERT_FIELDS
+        row_placeholder = "(" + ", ".join(["%s"] * len(columns)) + ")"
+        casted = ", ".join(
+            f"CAST(v.{quote(c)} AS {Spot._meta.get_field(c).db_type(connection)})"
+            for c in columns
+        )
+        updates = ", ".join(
+            f"{quote(c)} = COALESCE(EXCLUDED.{quote(c)}, t.{quote(c)})"
+            for c in UPSERT_FIELDS + ["location"]
+        )
+        # The text may have changed: finish_load recomputes the search vector
+        updates += ", search_vector = NULL"
+        # location is derived from latitude/longitude, so comparing those is enough
+        changed = " OR ".join(
+            f"(EXCLUDED.{quote(c)} IS NOT NULL AND EXCLUDED.{quote(c)} IS DISTINCT FROM t.{quote(c)})"
+            for c in UPSERT_FIELDS
+        )
+        sql = f"""
+            INSERT INTO {table} AS t (spot_id, {", ".join(map(quote, columns))}, location)
+            SELECT
+                nextval(%s),
+                {casted},
+                CASE
+                    WHEN v.spot_latitude IS NOT NULL AND v.spot_longitude IS NOT NULL
+                    THEN ST_SetSRID(ST_MakePoint(
+                        CAST(v.spot_longitude AS double precision),
+                        CAST(v.spot_latitude AS double precision)
+                    ), 4326)
+                END
+            FROM (VALUES {", ".join([row_placeholder] * len(records))})
+                AS v ({", ".join(map(quote, columns))})
+            ON CONFLICT (public_id) DO UPDATE SET {updates}
+            WHERE {changed}
+            RETURNING t.spot_id, t.public_id, (t.xmax = 0) AS inserted
+        """
+        params = [SPOT_ID_SEQUENCE]
+        for idx, public_id, location_str, defaults_data in records:
+            params.append(public_id)
+            params.extend(defaults_data.get(c) for c in UPSERT_FIELDS)
+
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                written = {
+                    public_id: (spot_id, inserted)
+                    for spot_id, public_id, inserted in cursor.fetchall()
+                }
+        except Exception as e:
+            for idx, public_id, location_str, defaults_data in records:
                 self.stderr.write(
                     self.style.ERROR(
                         f"Error processing item {idx + 1} (ID: {public_id}): {e}"
                     )
                 )
-                logger.exception(
-                    f"Error processing item {idx + 1} (ID: {public_id}) with data: {item}"
-                )
-                skipped_count += 1
-
-        self.stdout.write(
-            self.style.SUCCESS(
-                f"Successfully processed {idx + 1} items. "
-                f"Created: {created_count}, Updated: {updated_count}, Skipped: {skipped_count}. "
-                f"Geocoding Errors/Not Found: {geocode_errors}."
+            logger.exception(
+                f"Error upserting items {records[0][0] + 1}-{records[-1][0] + 1}"
             )
-        )
+            self.failed_count += len(records)
+            return
+
+        for idx, public_id, location_str, defaults_data in records:
+            if public_id not in written:
+                self.unchanged_count += 1
+                continue
+            spot_id, inserted = written[public_id]
+            if inserted:
+                self.created_count += 1
+                self.stdout.write(
+                    f"Created new spot with ID {spot_id} for public_id {public_id}"
+                )
+            else:
+                self.updated_count += 1
+                self.stdout.write(f"Updated spot with public_id {public_id}")
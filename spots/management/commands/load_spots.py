@@ -1,15 +1,176 @@
 import csv
+import itertools
+import multiprocessing
 import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from decimal import Decimal, InvalidOperation
-from django.core.management.base import BaseCommand
+from io import StringIO
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.gis.geos import Point
 from django.conf import settings
+from django.db import connection, connections, transaction
 from django.utils.dateparse import parse_date
-from spots.models import Spot
+from spots.loading import content_hash, finish_load, start_load
+from spots.models import LoadManifest, Spot
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Type converters for the CSV columns, keyed by model field
+FIELDS_MAP = {
+    "spot_sector_id": int,
+    "spot_type_id": int,
+    "spot_settlement": str,
+    "spot_municipality": str,
+    "spot_state": str,
+    "spot_region": str,
+    "spot_corridor": str,
+    "spot_area_in_sqm": float,
+    "spot_price_sqm_mxn_rent": float,
+    "spot_price_total_mxn_rent": float,
+    "spot_price_sqm_mxn_sale": float,
+    "spot_price_total_mxn_sale": float,
+    "spot_modality": str,
+    "user_id": int,
+    "spot_created_date": parse_date,
+}
+
+# Model fields whose CSV column has a different name
+SOURCE_FIELD_MAP = {
+    "user_id": "uuiid"
+}
+
+# (model_field, csv_field, converter) table, built once instead of once per row
+COLUMN_CONVERTERS = [
+    (model_field, SOURCE_FIELD_MAP.get(model_field, model_field), converter)
+    for model_field, converter in FIELDS_MAP.items()
+]
+
+# Converted columns that make up a row's content hash
+HASHED_COLUMNS = [
+    "spot_sector_id",
+    "spot_type_id",
+    "spot_settlement",
+    "spot_municipality",
+    "spot_state",
+    "spot_region",
+    "spot_corridor",
+    "spot_latitude",
+    "spot_longitude",
+    "spot_area_in_sqm",
+    "spot_price_sqm_mxn_rent",
+    "spot_price_total_mxn_rent",
+    "spot_price_sqm_mxn_sale",
+    "spot_price_total_mxn_sale",
+    "spot_modality",
+    "user_id",
+    "spot_created_date",
+]
+
+# Columns overwritten when a spot_id already exists (location is handled separately)
+UPSERT_COLUMNS = HASHED_COLUMNS + ["content_hash"]
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Rows are spooled in memory up to this size before spilling to a temp file
+COPY_SPOOL_MAX_SIZE = 16 * 1024 * 1024
+
+# Bytes read at a time when counting the rows that precede each range
+ROW_COUNT_CHUNK_SIZE = 1024 * 1024
+
+
+def split_byte_ranges(file_path, parts):
+    """
+    Splits the data rows of a CSV file (everything after the header line) into
+    up to `parts` byte ranges that start and end on line boundaries.
+    Returns a list of (start, end, rows_before) tuples, where rows_before is the
+    number of data rows that precede the range, used to report row numbers.
+    Assumes that quoted values do not contain newlines.
+    """
+    size = os.path.getsize(file_path)
+    with open(file_path, "rb") as f:
+        f.readline()  # Header
+        data_start = f.tell()
+        boundaries = [data_start]
+        for part in range(1, parts):
+            target = data_start + (size - data_start) * part // parts
+            if target <= boundaries[-1]:
+                continue
+            # Finish the line holding the previous byte: leaves f at the start of a row
+            f.seek(target - 1)
+            f.readline()
+            if f.tell() >= size:
+                break
+            if f.tell() > boundaries[-1]:
+                boundaries.append(f.tell())
+        boundaries.append(size)
+
+        ranges = []
+        rows_before = 0
+        for start, end in zip(boundaries, boundaries[1:]):
+            if start >= end:
+                continue
+            ranges.append((start, end, rows_before))
+            f.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                chunk = f.read(min(ROW_COUNT_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                rows_before += chunk.count(b"\n")
+                remaining -= len(chunk)
+    return ranges
+
+
+def _read_lines(binary_file, end):
+    """Yields the decoded lines of binary_file from its position up to byte end."""
+    position = binary_file.tell()
+    while position < end:
+        line = binary_file.readline()
+        if not line:
+            return
+        position += len(line)
+        yield line.decode("utf-8")
+
+
+def _init_worker():
+    # Workers are forked (this module imports the models, so it would not start
+    # under "spawn"): they inherit the configured Django, but each one opens
+    # its own connection
+    connections.close_all()
+
+
+def _load_range(task):
+    """
+    Process pool entry point: parses, converts and writes one byte range of the
+    CSV over the worker's own database connection.
+    Returns (count, created, updated, unchanged, invalid, errors, stdout, stderr).
+    """
+    file_path, start, end, rows_before, fieldnames, mode, batch_size, force = task
+    out, err = StringIO(), StringIO()
+    command = Command(stdout=out, stderr=err)
+    command.invalid_count = 0
+    command.error_count = 0
+    try:
+        with open(file_path, "rb") as f:
+            f.seek(start)
+            reader = csv.DictReader(_read_lines(f, end), fieldnames=fieldnames)
+            if mode == "copy":
+                counts = command._load_copy(reader, force, row_offset=rows_before)
+            else:
+                counts = command._load_orm(
+                    reader, batch_size, force, row_offset=rows_before
+                )
+    finally:
+        connection.close()
+    return counts + (
+        command.invalid_count,
+        command.error_count,
+        out.getvalue(),
+        err.getvalue(),
+    )
+
 
 class Command(BaseCommand):
     help = "Loads spot data from lk_spots.csv into the Spot model"
@@ -21,15 +182,66 @@ class Command(BaseCommand):
             help='Optional path to the CSV file to load',
             default=os.path.join(settings.BASE_DIR, 'data', 'lk_spots.csv') # Default path
         )
+        parser.add_argument(
+            '--mode',
+            type=str,
+            choices=['orm', 'copy'],
+            default='orm',
+            help=(
+                "Load strategy: 'orm' upserts the rows in chunks with bulk_create, "
+                "'copy' streams them into a staging table with PostgreSQL COPY and "
+                "merges them in one statement"
+            ),
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help="Reload the file even if it was already loaded, rewriting unchanged rows too",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=(
+                "Rows per chunk in --mode=orm. Bigger chunks mean fewer round trips, "
+                "smaller ones shorter transactions and locks"
+            ),
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help=(
+                "Processes that parse and write the CSV in parallel, each one a "
+                "newline-aligned byte range over its own database connection. "
+                "Requires that quoted values contain no newlines"
+            ),
+        )
 
     def handle(self, *args, **options):
         file_path = options["csv_path"]
         self.stdout.write(f"Looking for CSV file at: {file_path}")
 
+        if options["batch_size"] <= 0:
+            raise CommandError("--batch-size must be a positive integer")
+        if options["workers"] <= 0:
+            raise CommandError("--workers must be a positive integer")
+
         if not os.path.exists(file_path):
             self.stderr.write(self.style.ERROR(f"CSV file not found at {file_path}"))
             return
 
+        force = options["force"]
+        manifest, previous = start_load("load_spots", file_path, force=force)
+        if previous:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"File unchanged since load #{previous.pk} ({previous.finished_at:%Y-%m-%d %H:%M}). "
+                    f"Skipping. Use --force to reload."
+                )
+            )
+            return
+
         # Define expected headers based on the CSV file [cite: 144]
         expected_headers = [
             "spot_id",
@@ -53,10 +265,6 @@ class Command(BaseCommand):
             # Note: spot_address, spot_title, spot_description, spot_maintenance_cost are not in the CSV header provided [cite: 144]
         ]
 
-        count = 0
-        created_count = 0
-        updated_count = 0
-
         try:
             with open(file_path, mode="r", encoding="utf-8") as csvfile:
                 reader = csv.DictReader(csvfile)
@@ -72,118 +280,345 @@ class Command(BaseCommand):
                             f"CSV header mismatch. Missing: {missing}. Extra found: {extra}. Check CSV file and expected_headers."
                         )
                     )
+                    finish_load(manifest, LoadManifest.STATUS_FAILED)
                     return
 
-                for row in reader:
-                    count += 1
-                    spot_id = row.get("spot_id")
-                    lat_str = row.get("spot_latitude")
-                    lon_str = row.get("spot_longitude")
-
-                    if not spot_id:
-                        self.stdout.write(
-                            self.style.WARNING(f"Skipping row {count}: Missing spot_id")
-                        )
-                        continue
-
-                    spot_data = {}
-                    location = None
-
-                    # Handle PointField creation [cite: 131]
-                    if lat_str and lon_str:
-                        try:
-                            latitude = float(lat_str)
-                            longitude = float(lon_str)
-                            location = Point(
-                                longitude, latitude, srid=4326
-                            ) 
-                            spot_data["spot_latitude"] = (
-                                latitude 
-                            )
-                            spot_data["spot_longitude"] = longitude
-                        except (ValueError, TypeError) as e:
-                            self.stdout.write(
-                                self.style.WARNING(
-                                    f"Skipping row {count} (ID: {spot_id}): Invalid coordinates '{lat_str}', '{lon_str}'. Error: {e}"
-                                )
-                            )
-                            location = None  
-
-                    spot_data["location"] = location
-
-                    fields_map = {
-                        "spot_sector_id": int,
-                        "spot_type_id": int,
-                        "spot_settlement": str,
-                        "spot_municipality": str,
-                        "spot_state": str,
-                        "spot_region": str,
-                        "spot_corridor": str,
-                        "spot_area_in_sqm": float,
-                        "spot_price_sqm_mxn_rent": float,
-                        "spot_price_total_mxn_rent": float,
-                        "spot_price_sqm_mxn_sale": float,
-                        "spot_price_total_mxn_sale": float,
-                        "spot_modality": str,
-                        "user_id": int,  
-                        "spot_created_date": parse_date,
-                    }
-
-                    source_field_map = {
-                        "user_id": "uuiid"
-                    }  
-
-                    for model_field, converter in fields_map.items():
-                        csv_field_name = source_field_map.get(model_field, model_field)
-                        value = row.get(csv_field_name, "").strip()
-                        if value:
-                            try:
-                                spot_data[model_field] = converter(value)
-                            except (ValueError, TypeError, InvalidOperation) as e:
-                                self.stdout.write(
-                                    self.style.WARNING(
-                                        f"Row {count} (ID: {spot_id}): Invalid value '{value}' for {model_field}. Setting to None. Error: {e}"
-                                    )
-                                )
-                                spot_data[model_field] = None
-                        else:
-                            spot_data[model_field] = None  
-
-                    try:
-                        spot_id_int = int(spot_id)
-                        obj, created = Spot.objects.update_or_create(
-                            spot_id=spot_id_int, defaults=spot_data
-                        )
-                        if created:
-                            created_count += 1
-                        else:
-                            updated_count += 1
-                    except ValueError:
-                        self.stdout.write(
-                            self.style.WARNING(
-                                f"Skipping row {count}: Invalid spot_id '{spot_id}'"
-                            )
-                        )
-                    except Exception as e:
-                        self.stderr.write(
-                            self.style.ERROR(
-                                f"Error processing row {count} (ID: {spot_id}): {e}"
-                            )
-                        )
-                        logger.exception(
-                            f"Error processing row {count} (ID: {spot_id}) with data: {row}"
-                        )
+                self.invalid_count = 0
+                self.error_count = 0
+                if options["workers"] > 1:
+                    counts = self._load_parallel(
+                        file_path, reader.fieldnames, options, force
+                    )
+                elif options["mode"] == "copy":
+                    counts = self._load_copy(reader, force)
+                else:
+                    counts = self._load_orm(reader, options["batch_size"], force)
+                count, created_count, updated_count, unchanged_count = counts
 
         except FileNotFoundError:
             self.stderr.write(self.style.ERROR(f"File not found at {file_path}"))
+            finish_load(manifest, LoadManifest.STATUS_FAILED)
             return
         except Exception as e:
             self.stderr.write(self.style.ERROR(f"An unexpected error occurred: {e}"))
             logger.exception("An unexpected error occurred during CSV processing.")
+            finish_load(manifest, LoadManifest.STATUS_FAILED)
             return
 
+        # Rows that failed to write are retried by the next run of the same file
+        finish_load(
+            manifest,
+            (
+                LoadManifest.STATUS_PARTIAL
+                if self.error_count
+                else LoadManifest.STATUS_COMPLETED
+            ),
+            row_count=count,
+            created_count=created_count,
+            updated_count=updated_count,
+            unchanged_count=unchanged_count,
+            error_count=self.error_count,
+        )
+        style = self.style.WARNING if self.error_count else self.style.SUCCESS
         self.stdout.write(
-            self.style.SUCCESS(
-                f"Successfully processed {count} rows. Created: {created_count}, Updated: {updated_count}."
+            style(
+                f"Successfully processed {count} rows. Created: {created_count}, Updated: {updated_count}, "
+                f"Unchanged: {unchanged_count}. Invalid: {self.invalid_count}. Errors: {self.error_count}. "
+                f"Load manifest #{manifest.pk} in {manifest.duration.total_seconds():.2f}s."
             )
         )
+
+    def _convert_row(self, row, count):
+        """
+        Converts a raw CSV row into (spot_id, spot_data).
+        Returns (None, None) when the row has to be skipped.
+        """
+        spot_id = row.get("spot_id")
+        lat_str = row.get("spot_latitude")
+        lon_str = row.get("spot_longitude")
+
+        if not spot_id:
+            self.stdout.write(
+                self.style.WARNING(f"Skipping row {count}: Missing spot_id")
+            )
+            self.invalid_count += 1
+            return None, None
+
+        spot_data = {}
+        location = None
+
+        # Handle PointField creation [cite: 131]
+        if lat_str and lon_str:
+            try:
+                latitude = float(lat_str)
+                longitude = float(lon_str)
+                location = Point(
+                    longitude, latitude, srid=4326
+                )
+                spot_data["spot_latitude"] = (
+                    latitude
+                )
+                spot_data["spot_longitude"] = longitude
+            except (ValueError, TypeError) as e:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"Skipping row {count} (ID: {spot_id}): Invalid coordinates '{lat_str}', '{lon_str}'. Error: {e}"
+                    )
+                )
+                location = None
+
+        spot_data["location"] = location
+
+        for model_field, csv_field_name, converter in COLUMN_CONVERTERS:
+            value = row.get(csv_field_name, "").strip()
+            if value:
+                try:
+                    spot_data[model_field] = converter(value)
+                except (ValueError, TypeError, InvalidOperation) as e:
+                    self.stdout.write(
+                        self.style.WARNING(
+                            f"Row {count} (ID: {spot_id}): Invalid value '{value}' for {model_field}. Setting to None. Error: {e}"
+                        )
+                    )
+                    spot_data[model_field] = None
+            else:
+                spot_data[model_field] = None
+
+        # location is derived from latitude/longitude, already part of the hash
+        spot_data["content_hash"] = content_hash(
+            [spot_data.get(c) for c in HASHED_COLUMNS]
+        )
+
+        try:
+            spot_id_int = int(spot_id)
+        except ValueError:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Skipping row {count}: Invalid spot_id '{spot_id}'"
+                )
+            )
+            self.invalid_count += 1
+            return None, None
+
+        return spot_id_int, spot_data
+
+    def _load_parallel(self, file_path, fieldnames, options, force):
+        """
+        Splits the file into one byte range per worker and loads the ranges in a
+        process pool. Each worker reports its own counts and output, which are
+        aggregated here in file order. A spot_id repeated in different ranges
+        is written by whichever worker gets there last.
+        """
+        ranges = split_byte_ranges(file_path, options["workers"])
+        tasks = [
+            (
+                file_path,
+                start,
+                end,
+                rows_before,
+                fieldnames,
+                options["mode"],
+                options["batch_size"],
+                force,
+            )
+            for start, end, rows_before in ranges
+        ]
+        self.stdout.write(
+            f"Loading {len(tasks)} byte ranges with {options['workers']} workers."
+        )
+
+        # Child processes must not inherit the parent's open connection
+        connections.close_all()
+        totals = [0, 0, 0, 0]
+        with ProcessPoolExecutor(
+            max_workers=options["workers"],
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_init_worker,
+        ) as executor:
+            for result in executor.map(_load_range, tasks):
+                *counts, invalid_count, error_count, out, err = result
+                self.stdout.write(out, ending="")
+                self.stderr.write(err, ending="")
+                totals = [total + value for total, value in zip(totals, counts)]
+                self.invalid_count += invalid_count
+                self.error_count += error_count
+        return tuple(totals)
+
+    def _load_orm(self, reader, batch_size, force=False, row_offset=0):
+        """
+        Streams the CSV in chunks of batch_size rows and upserts each chunk with
+        bulk_create(update_conflicts=True) inside its own transaction, so memory
+        stays flat regardless of the file size. Only spots whose content hash
+        changed are written unless force is set. A chunk that fails is reported,
+        counted in error_count and skipped. row_offset is the number of rows
+        before the first one of reader, used in the messages.
+        """
+        count = 0
+        created_count = 0
+        updated_count = 0
+        unchanged_count = 0
+
+        while True:
+            rows = list(itertools.islice(reader, batch_size))
+            if not rows:
+                break
+            first_row = row_offset + count + 1
+
+            spots = {}
+            for row in rows:
+                count += 1
+                spot_id_int, spot_data = self._convert_row(row, row_offset + count)
+                if spot_id_int is None:
+                    continue
+                spots.setdefault(spot_id_int, []).append(spot_data)
+
+            if not spots:
+                continue
+
+            try:
+                with transaction.atomic():
+                    existing = dict(
+                        Spot.objects.filter(spot_id__in=spots.keys()).values_list(
+                            "spot_id", "content_hash"
+                        )
+                    )
+                    # The last occurrence of a spot_id in the chunk wins. Rows go
+                    # in spot_id order so concurrent workers lock them in the
+                    # same order and cannot deadlock.
+                    changed = [
+                        Spot(spot_id=spot_id, data_source="csv", **versions[-1])
+                        for spot_id, versions in sorted(spots.items())
+                        if force
+                        or spot_id not in existing
+                        or existing[spot_id] != versions[-1]["content_hash"]
+                    ]
+                    if changed:
+                        Spot.objects.bulk_create(
+                            changed,
+                            update_conflicts=True,
+                            unique_fields=["spot_id"],
+                            update_fields=UPSERT_COLUMNS + ["location"],
+                        )
+            except Exception as e:
+                self.stderr.write(
+                    self.style.ERROR(
+                        f"Error processing rows {first_row}-{row_offset + count}: {e}"
+                    )
+                )
+                logger.exception(
+                    f"Error processing rows {first_row}-{row_offset + count}"
+                )
+                self.error_count += sum(map(len, spots.values()))
+                continue
+
+            # Repeated spot_ids count as updates, like update_or_create; a spot
+            # whose last version matches the stored hash is left unchanged
+            # (unless force rewrote it).
+            for spot_id, versions in spots.items():
+                if spot_id not in existing:
+                    created_count += 1
+                    updated_count += len(versions) - 1
+                elif not force and existing[spot_id] == versions[-1]["content_hash"]:
+                    unchanged_count += len(versions)
+                else:
+                    updated_count += len(versions)
+
+        return count, created_count, updated_count, unchanged_count
+
+    def _load_copy(self, reader, force=False, row_offset=0):
+        """
+        Streams the converted rows into a temporary staging table with COPY and
+        merges them into the Spot table with a single INSERT ... ON CONFLICT.
+        When a spot_id appears more than once the last row in the file wins, and
+        the repeated rows are counted as updates, like the row-by-row mode does.
+        Rows whose content hash matches the stored one are left untouched
+        unless force is set. row_offset works as in _load_orm.
+        """
+        count = 0
+        staged_count = 0
+        table = connection.ops.quote_name(Spot._meta.db_table)
+        staging = connection.ops.quote_name("spots_spot_staging")
+        columns = ", ".join(connection.ops.quote_name(c) for c in UPSERT_COLUMNS)
+
+        with tempfile.SpooledTemporaryFile(
+            max_size=COPY_SPOOL_MAX_SIZE, mode="w+", newline="", encoding="utf-8"
+        ) as buffer:
+            writer = csv.writer(buffer)
+            for row in reader:
+                count += 1
+                spot_id_int, spot_data = self._convert_row(row, row_offset + count)
+                if spot_id_int is None:
+                    continue
+                # Invalid coordinates leave both values NULL so no location is built
+                if spot_data["location"] is None:
+                    spot_data["spot_latitude"] = None
+                    spot_data["spot_longitude"] = None
+                writer.writerow(
+                    [staged_count, spot_id_int]
+                    + [spot_data.get(c) for c in UPSERT_COLUMNS]
+                )
+                staged_count += 1
+            buffer.seek(0)
+
+            column_types = ", ".join(
+                f"{connection.ops.quote_name(c)} {Spot._meta.get_field(c).db_type(connection)}"
+                for c in UPSERT_COLUMNS
+            )
+            updates = ", ".join(
+                f"{c} = EXCLUDED.{c}"
+                for c in map(connection.ops.quote_name, UPSERT_COLUMNS + ["location"])
+            )
+
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(
+                    f"CREATE TEMPORARY TABLE {staging} "
+                    f"(row_num bigint, spot_id integer, {column_types}) ON COMMIT DROP"
+                )
+                cursor.copy_expert(
+                    f"COPY {staging} (row_num, spot_id, {columns}) FROM STDIN WITH (FORMAT csv)",
+                    buffer,
+                )
+                # Same accounting as the ORM mode, from the last staged row of
+                # each spot_id and the stored hash
+                cursor.execute(
+                    f"""
+                    WITH latest AS (
+                        SELECT DISTINCT ON (spot_id)
+                            spot_id,
+                            content_hash,
+                            COUNT(*) OVER (PARTITION BY spot_id) AS versions
+                        FROM {staging}
+                        ORDER BY spot_id, row_num DESC
+                    )
+                    SELECT
+                        COUNT(*) FILTER (WHERE t.spot_id IS NULL),
+                        COALESCE(SUM(l.versions) FILTER (
+                            WHERE NOT %s AND t.content_hash = l.content_hash
+                        ), 0)
+                    FROM latest l
+                    LEFT JOIN {table} t ON t.spot_id = l.spot_id
+                    """,
+                    [force],
+                )
+                created_count, unchanged_count = cursor.fetchone()
+                cursor.execute(
+                    f"""
+                    INSERT INTO {table} AS t (spot_id, {columns}, location, data_source)
+                    SELECT DISTINCT ON (spot_id)
+                        spot_id,
+                        {columns},
+                        CASE
+                            WHEN spot_latitude IS NOT NULL AND spot_longitude IS NOT NULL
+                            THEN ST_SetSRID(ST_MakePoint(spot_longitude, spot_latitude), 4326)
+                        END,
+                        %s
+                    FROM {staging}
+                    ORDER BY spot_id, row_num DESC
+                    ON CONFLICT (spot_id) DO UPDATE SET {updates}
+                    WHERE %s OR t.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+                    """,
+                    ["csv", force],
+                )
+
+        updated_count = staged_count - created_count - unchanged_count
+        return count, created_count, updated_count, unchanged_count
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-16 10:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spots', '0002_spot_data_source_spot_public_id_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodeCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location_key', models.TextField(unique=True, verbose_name='Normalized location')),
+                ('query', models.TextField(verbose_name='Original location string')),
+                ('latitude', models.FloatField(blank=True, null=True)),
+                ('longitude', models.FloatField(blank=True, null=True)),
+                ('found', models.BooleanField(default=True, help_text='False for negative results (the geocoder found nothing)')),
+                ('updated_at', models.DateTimeField(verbose_name='Looked up at')),
+            ],
+            options={
+                'verbose_name': 'Geocode cache entry',
+                'verbose_name_plural': 'Geocode cache entries',
+            },
+        ),
+    ]
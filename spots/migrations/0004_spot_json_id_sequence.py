@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-16 11:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Sequence used by load_props to allocate spot_id for new JSON-sourced spots,
+    so concurrent loaders never hand out the same ID.
+    """
+
+    dependencies = [
+        ('spots', '0003_geocodecacheentry'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                "CREATE SEQUENCE IF NOT EXISTS spots_spot_json_id_seq",
+                "SELECT setval('spots_spot_json_id_seq', COALESCE(MAX(spot_id), 0) + 1, false) FROM spots_spot",
+            ],
+            reverse_sql="DROP SEQUENCE IF EXISTS spots_spot_json_id_seq",
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:53
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spots', '0004_spot_json_id_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='spot',
+            name='content_hash',
+            field=models.CharField(blank=True, help_text='SHA-256 of the source record, used to skip unchanged rows on reload', max_length=64, null=True),
+        ),
+        migrations.CreateModel(
+            name='LoadManifest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('command', models.CharField(max_length=50, verbose_name='Loader command')),
+                ('source_path', models.TextField(verbose_name='Source file')),
+                ('file_checksum', models.CharField(max_length=64, verbose_name='File SHA-256')),
+                ('file_size', models.BigIntegerField(verbose_name='File size (bytes)')),
+                ('status', models.CharField(choices=[('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed'), ('skipped', 'Skipped (file unchanged)')], default='running', max_length=10)),
+                ('row_count', models.IntegerField(default=0)),
+                ('created_count', models.IntegerField(default=0)),
+                ('updated_count', models.IntegerField(default=0)),
+                ('unchanged_count', models.IntegerField(default=0)),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Load manifest',
+                'verbose_name_plural': 'Load manifests',
+                'ordering': ['-started_at'],
+                'indexes': [models.Index(fields=['command', 'file_checksum', 'status'], name='spots_loadm_command_e19851_idx')],
+            },
+        ),
+    ]
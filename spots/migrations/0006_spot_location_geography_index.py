@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:58
+
+import django.contrib.gis.db.models.fields
+import django.contrib.postgres.indexes
+import django.db.models.functions.comparison
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spots', '0005_spot_content_hash_loadmanifest'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='spot',
+            index=django.contrib.postgres.indexes.GistIndex(django.db.models.functions.comparison.Cast('location', output_field=django.contrib.gis.db.models.fields.PointField(geography=True, srid=4326)), name='spots_location_geog_gist'),
+        ),
+    ]
@@ -0,0 +1,229 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:40
+
+from django.db import migrations
+
+# Python's JSON format (float repr, strings with ensure_ascii=False and
+# \u2028/\u2029 escaped like JSONRenderer) and GDAL's coordinate format, to
+# build in PostgreSQL the same bytes as the API. Requires
+# extra_float_digits = 1 (PostgreSQL 12+, pinned in 0013): float8 as text is
+# the shortest decimal, the same digits as repr().
+# From 1e16 on, float8out's digits are not always the shortest
+# (2.0442471344170792e+16 versus 2.044247134417079e+16 from repr()): the
+# shortest decimal that maps back to the same float8 is searched for, the
+# closest one if there are two.
+JSON_LARGE_FLOAT = r"""
+CREATE OR REPLACE FUNCTION spots_json_large_float(x double precision)
+RETURNS text LANGUAGE plpgsql IMMUTABLE STRICT PARALLEL SAFE AS $$
+DECLARE
+    bits bigint;
+    exact numeric;
+    n integer;
+    scale numeric;
+    low numeric;
+    high numeric;
+    best numeric;
+    digits text;
+BEGIN
+    IF x IN ('Infinity', '-Infinity', 'NaN') THEN
+        RETURN x::text;
+    END IF;
+    bits := ('x' || encode(float8send(x), 'hex'))::bit(64)::bigint;
+    exact := ((bits & 4503599627370495) + 4503599627370496)::numeric
+        * trunc(power(2::numeric, ((bits >> 52) & 2047)::integer - 1075));
+    n := length(exact::text);
+    FOR p IN 1..17 LOOP
+        scale := trunc(power(10::numeric, n - p));
+        low := div(exact, scale) * scale;
+        high := CASE WHEN low = exact THEN low ELSE low + scale END;
+        best := NULL;
+        IF low::double precision = abs(x) THEN
+            best := low;
+        END IF;
+        -- near DBL_MAX rounding up is no longer a float8
+        IF high < 1.8e308 THEN
+            IF high::double precision = abs(x) AND (
+                best IS NULL OR high - exact < exact - low
+                OR (high - exact = exact - low AND mod(div(high, scale), 2) = 0)
+            ) THEN
+                best := high;
+            END IF;
+        END IF;
+        EXIT WHEN best IS NOT NULL;
+    END LOOP;
+    digits := rtrim(best::text, '0');
+    RETURN CASE WHEN x < 0 THEN '-' ELSE '' END
+        || left(digits, 1)
+        || CASE WHEN length(digits) > 1 THEN '.' || substr(digits, 2) ELSE '' END
+        || 'e+' || (length(best::text) - 1)::text;
+END
+$$
+"""
+
+JSON_FLOAT = r"""
+CREATE OR REPLACE FUNCTION spots_json_float(x double precision)
+RETURNS text LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT CASE
+        WHEN abs(x) >= 1e16 THEN spots_json_large_float(x)
+        -- repr() only switches to exponent notation from 1e16; PostgreSQL from 1e15
+        WHEN right(x::text, 4) = 'e+15' THEN
+            CASE WHEN x < 0 THEN '-' ELSE '' END
+            || CASE
+                WHEN length(translate(split_part(x::text, 'e', 1), '-.', '')) <= 16
+                THEN rpad(translate(split_part(x::text, 'e', 1), '-.', ''), 16, '0') || '.0'
+                ELSE left(translate(split_part(x::text, 'e', 1), '-.', ''), 16)
+                    || '.' || substr(translate(split_part(x::text, 'e', 1), '-.', ''), 17)
+            END
+        WHEN strpos(x::text, '.') = 0 AND strpos(x::text, 'e') = 0 THEN x::text || '.0'
+        ELSE x::text
+    END
+$$
+"""
+
+JSON_STRING = r"""
+CREATE OR REPLACE FUNCTION spots_json_string(s text)
+RETURNS text LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT replace(replace(to_json(s)::text, chr(8232), '\u2028'), chr(8233), '\u2029')
+$$
+"""
+
+# spots.geojson.gdal_coordinate: exact "%.15f" (the integer 10^15 * |x| rounded
+# half to even, from the binary mantissa and exponent) and the 00000x/99999x trim.
+GDAL_COORDINATE = r"""
+CREATE OR REPLACE FUNCTION spots_gdal_coordinate(x double precision)
+RETURNS double precision LANGUAGE plpgsql IMMUTABLE STRICT PARALLEL SAFE AS $$
+DECLARE
+    bits bigint;
+    biased integer;
+    mantissa numeric;
+    shift integer;
+    scaled numeric;
+    divisor numeric;
+    digits numeric;
+    remainder numeric;
+    t text;
+    n integer;
+    dot integer;
+    before integer;
+    i integer;
+    round_up boolean := false;
+BEGIN
+    IF x = 0 OR abs(x) > 1e50 THEN
+        RETURN x;
+    END IF;
+    bits := ('x' || encode(float8send(x), 'hex'))::bit(64)::bigint;
+    biased := ((bits >> 52) & 2047)::integer;
+    mantissa := (bits & 4503599627370495)::numeric;
+    IF biased = 0 THEN
+        shift := 1074;
+    ELSE
+        mantissa := mantissa + 4503599627370496;
+        shift := 1075 - biased;
+    END IF;
+    IF shift <= 0 THEN
+        digits := trunc(mantissa * power(2::numeric, -shift)) * 1000000000000000;
+    ELSE
+        scaled := mantissa * 1000000000000000;
+        divisor := trunc(power(2::numeric, shift));
+        digits := div(scaled, divisor);
+        remainder := scaled - digits * divisor;
+        IF 2 * remainder > divisor OR (2 * remainder = divisor AND mod(digits, 2) = 1) THEN
+            digits := digits + 1;
+        END IF;
+    END IF;
+    t := div(digits, 1000000000000000)::text || '.'
+        || lpad(mod(digits, 1000000000000000)::bigint::text, 15, '0');
+    IF x < 0 THEN
+        t := '-' || t;
+    END IF;
+
+    n := length(t);
+    IF n <= 10 THEN
+        RETURN t::double precision;
+    END IF;
+    dot := strpos(t, '.') - 1;
+    before := dot - 1 - (CASE WHEN left(t, 1) = '-' THEN 1 ELSE 0 END);
+    IF substr(t, n - 5, 5) = '00000' THEN
+        t := left(t, n - 1);
+    ELSIF dot < n - 8
+        AND (before >= 4 OR substr(t, n - 2, 1) = '0')
+        AND (before >= 5 OR substr(t, n - 3, 1) = '0')
+        AND (before >= 6 OR substr(t, n - 4, 1) = '0')
+        AND (before >= 7 OR substr(t, n - 5, 1) = '0')
+        AND (before >= 8 OR substr(t, n - 6, 1) = '0')
+        AND substr(t, n - 8, 2) = '00' THEN
+        t := left(t, n - 8);
+    ELSIF substr(t, n - 5, 5) = '99999' THEN
+        t := left(t, n - 6);
+        round_up := true;
+    ELSIF dot < n - 9
+        AND (before >= 4 OR substr(t, n - 2, 1) = '9')
+        AND (before >= 5 OR substr(t, n - 3, 1) = '9')
+        AND (before >= 6 OR substr(t, n - 4, 1) = '9')
+        AND (before >= 7 OR substr(t, n - 5, 1) = '9')
+        AND (before >= 8 OR substr(t, n - 6, 1) = '9')
+        AND substr(t, n - 8, 2) = '99' THEN
+        t := left(t, n - 9);
+        round_up := true;
+    END IF;
+    IF round_up THEN
+        i := length(t);
+        WHILE i > 0 AND substr(t, i, 1) IN ('9', '.') LOOP
+            IF substr(t, i, 1) = '9' THEN
+                t := overlay(t PLACING '0' FROM i FOR 1);
+            END IF;
+            i := i - 1;
+        END LOOP;
+        IF i > 0 AND substr(t, i, 1) <> '-' THEN
+            t := overlay(t PLACING chr(ascii(substr(t, i, 1)) + 1) FROM i FOR 1);
+        ELSE
+            t := overlay(t PLACING '1' FROM i + 1 FOR 0);
+        END IF;
+    END IF;
+    RETURN t::double precision;
+END
+$$
+"""
+
+# Coordinate as written by the API. Values with up to 12 decimals and
+# |x| < 10^4 are not changed by GDAL's trim: the plpgsql function is skipped.
+GEOJSON_COORDINATE = r"""
+CREATE OR REPLACE FUNCTION spots_geojson_coordinate(x double precision)
+RETURNS text LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT CASE
+        WHEN abs(x) < 1e4 AND strpos(x::text, 'e') = 0
+            AND length(split_part(x::text, '.', 2)) <= 12
+        THEN spots_json_float(x)
+        ELSE spots_json_float(spots_gdal_coordinate(x))
+    END
+$$
+"""
+
+
+class Migration(migrations.Migration):
+    """
+    SQL functions used by the ?assemble=db mode to build GeoJSON in
+    PostgreSQL with the same bytes as the Python serializers.
+    """
+
+    dependencies = [
+        ('spots', '0006_spot_location_geography_index'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                JSON_LARGE_FLOAT,
+                JSON_FLOAT,
+                JSON_STRING,
+                GDAL_COORDINATE,
+                GEOJSON_COORDINATE,
+            ],
+            reverse_sql=[
+                "DROP FUNCTION IF EXISTS spots_geojson_coordinate(double precision)",
+                "DROP FUNCTION IF EXISTS spots_gdal_coordinate(double precision)",
+                "DROP FUNCTION IF EXISTS spots_json_string(text)",
+                "DROP FUNCTION IF EXISTS spots_json_float(double precision)",
+                "DROP FUNCTION IF EXISTS spots_json_large_float(double precision)",
+            ],
+        ),
+    ]
@@ -0,0 +1,111 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:05
+
+from django.db import migrations, models
+
+# Statistics of the existing spots: the loaders only refresh them at the end.
+# Frozen copy of spots.aggregates.refresh_price_aggregates() as of this
+# migration; grouping_set bit i is set when the i-th dimension is grouped by.
+FILL_PRICE_AGGREGATES = """
+INSERT INTO spots_priceaggregate (
+    grouping_set, spot_sector_id, spot_type_id, spot_municipality, spot_state,
+    spot_count, rent_count, rent_mean, rent_min, rent_max, rent_p50, rent_p90,
+    sale_count, sale_mean, sale_min, sale_max, sale_p50, sale_p90,
+    rent_sqm_count, rent_sqm_mean, rent_sqm_min, rent_sqm_max, rent_sqm_p50,
+    rent_sqm_p90, sale_sqm_count, sale_sqm_mean, sale_sqm_min, sale_sqm_max,
+    sale_sqm_p50, sale_sqm_p90
+)
+SELECT
+    grouping_set, spot_sector_id, spot_type_id, spot_municipality, spot_state,
+    spot_count, rent_count, rent_mean, rent_min, rent_max,
+    rent_percentiles[1], rent_percentiles[2], sale_count, sale_mean, sale_min,
+    sale_max, sale_percentiles[1], sale_percentiles[2], rent_sqm_count,
+    rent_sqm_mean, rent_sqm_min, rent_sqm_max, rent_sqm_percentiles[1],
+    rent_sqm_percentiles[2], sale_sqm_count, sale_sqm_mean, sale_sqm_min,
+    sale_sqm_max, sale_sqm_percentiles[1], sale_sqm_percentiles[2]
+FROM (
+    SELECT
+        1 * (1 - GROUPING(spot_sector_id)) + 2 * (1 - GROUPING(spot_type_id))
+            + 4 * (1 - GROUPING(spot_municipality))
+            + 8 * (1 - GROUPING(spot_state)) AS grouping_set,
+        spot_sector_id, spot_type_id, spot_municipality, spot_state,
+        count(*) AS spot_count,
+        count(spot_price_total_mxn_rent) AS rent_count,
+        avg(spot_price_total_mxn_rent) AS rent_mean,
+        min(spot_price_total_mxn_rent) AS rent_min,
+        max(spot_price_total_mxn_rent) AS rent_max,
+        percentile_cont(ARRAY[0.5, 0.9]) WITHIN GROUP (ORDER BY spot_price_total_mxn_rent)
+            AS rent_percentiles,
+        count(spot_price_total_mxn_sale) AS sale_count,
+        avg(spot_price_total_mxn_sale) AS sale_mean,
+        min(spot_price_total_mxn_sale) AS sale_min,
+        max(spot_price_total_mxn_sale) AS sale_max,
+        percentile_cont(ARRAY[0.5, 0.9]) WITHIN GROUP (ORDER BY spot_price_total_mxn_sale)
+            AS sale_percentiles,
+        count(spot_price_sqm_mxn_rent) AS rent_sqm_count,
+        avg(spot_price_sqm_mxn_rent) AS rent_sqm_mean,
+        min(spot_price_sqm_mxn_rent) AS rent_sqm_min,
+        max(spot_price_sqm_mxn_rent) AS rent_sqm_max,
+        percentile_cont(ARRAY[0.5, 0.9]) WITHIN GROUP (ORDER BY spot_price_sqm_mxn_rent)
+            AS rent_sqm_percentiles,
+        count(spot_price_sqm_mxn_sale) AS sale_sqm_count,
+        avg(spot_price_sqm_mxn_sale) AS sale_sqm_mean,
+        min(spot_price_sqm_mxn_sale) AS sale_sqm_min,
+        max(spot_price_sqm_mxn_sale) AS sale_sqm_max,
+        percentile_cont(ARRAY[0.5, 0.9]) WITHIN GROUP (ORDER BY spot_price_sqm_mxn_sale)
+            AS sale_sqm_percentiles
+    FROM spots_spot
+    GROUP BY CUBE (spot_sector_id, spot_type_id, spot_municipality, spot_state)
+) AS aggregates
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spots', '0007_geojson_sql_functions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grouping_set', models.PositiveSmallIntegerField()),
+                ('spot_sector_id', models.IntegerField(blank=True, null=True)),
+                ('spot_type_id', models.IntegerField(blank=True, null=True)),
+                ('spot_municipality', models.CharField(blank=True, max_length=255, null=True)),
+                ('spot_state', models.CharField(blank=True, max_length=255, null=True)),
+                ('spot_count', models.IntegerField(default=0)),
+                ('rent_count', models.IntegerField(default=0)),
+                ('rent_mean', models.FloatField(blank=True, null=True)),
+                ('rent_min', models.FloatField(blank=True, null=True)),
+                ('rent_max', models.FloatField(blank=True, null=True)),
+                ('rent_p50', models.FloatField(blank=True, null=True)),
+                ('rent_p90', models.FloatField(blank=True, null=True)),
+                ('sale_count', models.IntegerField(default=0)),
+                ('sale_mean', models.FloatField(blank=True, null=True)),
+                ('sale_min', models.FloatField(blank=True, null=True)),
+                ('sale_max', models.FloatField(blank=True, null=True)),
+                ('sale_p50', models.FloatField(blank=True, null=True)),
+                ('sale_p90', models.FloatField(blank=True, null=True)),
+                ('rent_sqm_count', models.IntegerField(default=0)),
+                ('rent_sqm_mean', models.FloatField(blank=True, null=True)),
+                ('rent_sqm_min', models.FloatField(blank=True, null=True)),
+                ('rent_sqm_max', models.FloatField(blank=True, null=True)),
+                ('rent_sqm_p50', models.FloatField(blank=True, null=True)),
+                ('rent_sqm_p90', models.FloatField(blank=True, null=True)),
+                ('sale_sqm_count', models.IntegerField(default=0)),
+                ('sale_sqm_mean', models.FloatField(blank=True, null=True)),
+                ('sale_sqm_min', models.FloatField(blank=True, null=True)),
+                ('sale_sqm_max', models.FloatField(blank=True, null=True)),
+                ('sale_sqm_p50', models.FloatField(blank=True, null=True)),
+                ('sale_sqm_p90', models.FloatField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Price aggregate',
+                'verbose_name_plural': 'Price aggregates',
+                'indexes': [models.Index(fields=['grouping_set', 'spot_sector_id', 'spot_type_id', 'spot_municipality', 'spot_state'], name='spots_price_aggregate_lookup')],
+            },
+        ),
+        migrations.RunSQL(FILL_PRICE_AGGREGATES, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spots', '0008_priceaggregate'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='spot',
+            index=models.Index(condition=models.Q(('spot_price_total_mxn_rent__isnull', False)), fields=['-spot_price_total_mxn_rent', 'spot_id'], name='spots_top_rent'),
+        ),
+    ]
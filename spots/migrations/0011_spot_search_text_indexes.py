@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:20
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.operations
+import spots.search
+from django.db import migrations
+
+# unaccent() is STABLE (it depends on the dictionary), so it cannot be used in
+# an index: the wrapper pins the dictionary and is declared IMMUTABLE.
+SEARCH_TEXT = """
+CREATE OR REPLACE FUNCTION spots_search_text(t text)
+RETURNS text LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE AS $$
+    SELECT lower(public.unaccent('public.unaccent'::regdictionary, t))
+$$
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spots', '0010_dataversion'),
+    ]
+
+    operations = [
+        django.contrib.postgres.operations.UnaccentExtension(),
+        django.contrib.postgres.operations.TrigramExtension(),
+        migrations.RunSQL(
+            sql=SEARCH_TEXT,
+            reverse_sql="DROP FUNCTION IF EXISTS spots_search_text(text)",
+        ),
+        migrations.AddIndex(
+            model_name='spot',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(spots.search.SearchText('spot_municipality'), name='gin_trgm_ops'), name='spots_municipality_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='spot',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(spots.search.SearchText('spot_settlement'), name='gin_trgm_ops'), name='spots_settlement_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='spot',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(spots.search.SearchText('spot_state'), name='gin_trgm_ops'), name='spots_state_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='spot',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(spots.search.SearchText('spot_corridor'), name='gin_trgm_ops'), name='spots_corridor_trgm'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:50
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Vectors of the existing spots, before the index is built. Frozen copy of
+# spots.search.spot_search_vector() as of this migration.
+FILL_SEARCH_VECTORS = """
+UPDATE spots_spot SET search_vector =
+    setweight(to_tsvector('spanish'::regconfig,
+        COALESCE(spots_search_text(spot_title), '')), 'A')
+    || setweight(to_tsvector('spanish'::regconfig,
+        COALESCE(spots_search_text(spot_description), '')), 'B')
+    || setweight(to_tsvector('spanish'::regconfig,
+        COALESCE(spots_search_text(spot_address), '')), 'C')
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spots', '0011_spot_search_text_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='spot',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, help_text='Weighted tsvector of title, description and address (spots.search); null until the loaders refresh it', null=True),
+        ),
+        migrations.RunSQL(FILL_SEARCH_VECTORS, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='spot',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='spots_search_vector_gin'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:35
+
+from django.db import migrations
+
+# The functions of 0007 convert float8 to text, which depends on
+# extra_float_digits: it is pinned to 1 (the shortest decimal, like repr()) so
+# that ?assemble=db builds the same bytes even if the session changes it.
+FUNCTIONS = [
+    "spots_json_large_float(double precision)",
+    "spots_json_float(double precision)",
+    "spots_geojson_coordinate(double precision)",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spots', '0012_spot_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                f"ALTER FUNCTION {function} SET extra_float_digits = 1"
+                for function in FUNCTIONS
+            ],
+            reverse_sql=[
+                f"ALTER FUNCTION {function} RESET extra_float_digits"
+                for function in FUNCTIONS
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spots', '0013_pin_geojson_sql_functions_float_digits'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loadmanifest',
+            name='error_count',
+            field=models.IntegerField(default=0, help_text='Rows that could not be written or geocoded'),
+        ),
+        migrations.AlterField(
+            model_name='loadmanifest',
+            name='status',
+            field=models.CharField(choices=[('running', 'Running'), ('completed', 'Completed'), ('partial', 'Completed with errors'), ('failed', 'Failed'), ('skipped', 'Skipped (file unchanged)')], default='running', max_length=10),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spots', '0014_loadmanifest_partial_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataversion',
+            name='aggregates_version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        # Until now every change rebuilt the aggregates in its own transaction
+        migrations.RunSQL(
+            "UPDATE spots_dataversion SET aggregates_version = version",
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -1,5 +1,11 @@
 from django.contrib.gis.db import models as gis_models
+from django.contrib.postgres.indexes import GinIndex, GistIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.utils import timezone
+
+from .search import SearchText
+from .spatial import geography
 
 
 class Spot(models.Model):
@@ -85,6 +91,12 @@ class Spot(models.Model):
 
     data_source = models.CharField(max_length=10, default='csv', help_text="Source of the data (e.g., 'csv', 'json')")
     public_id = models.CharField(max_length=50, null=True, blank=True, unique=True, help_text="Public ID from external source (e.g., EB-PV4135)")
+    content_hash = models.CharField(max_length=64, null=True, blank=True, help_text="SHA-256 of the source record, used to skip unchanged rows on reload")
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        help_text="Weighted tsvector of title, description and address (spots.search); null until the loaders refresh it",
+    )
 
     def __str__(self):
         return f"Spot {self.spot_id} ({self.spot_municipality})"
@@ -95,4 +107,186 @@ class Spot(models.Model):
         ordering = ["spot_id"] 
         indexes = [
             gis_models.Index(fields=["location"]),
+            # Distances in meters (ST_DWithin) and KNN ordering (<->) for nearby
+            GistIndex(geography("location"), name="spots_location_geog_gist"),
+            # top-rent ranking: only spots with rent, in keyset order
+            models.Index(
+                fields=["-spot_price_total_mxn_rent", "spot_id"],
+                name="spots_top_rent",
+                condition=models.Q(spot_price_total_mxn_rent__isnull=False),
+            ),
+            # Accent-insensitive text filters (SpotFilter): LIKE '%x%' and pg_trgm's %>
+            GinIndex(
+                OpClass(SearchText("spot_municipality"), name="gin_trgm_ops"),
+                name="spots_municipality_trgm",
+            ),
+            GinIndex(
+                OpClass(SearchText("spot_settlement"), name="gin_trgm_ops"),
+                name="spots_settlement_trgm",
+            ),
+            GinIndex(
+                OpClass(SearchText("spot_state"), name="gin_trgm_ops"),
+                name="spots_state_trgm",
+            ),
+            GinIndex(
+                OpClass(SearchText("spot_corridor"), name="gin_trgm_ops"),
+                name="spots_corridor_trgm",
+            ),
+            # Full-text search (?q=): search_vector @@ tsquery
+            GinIndex(fields=["search_vector"], name="spots_search_vector_gin"),
+        ]
+
+
+class GeocodeCacheEntry(models.Model):
+    """Persistent cache of geocoder lookups, keyed by the normalized location string"""
+
+    location_key = models.TextField(unique=True, verbose_name="Normalized location")
+    query = models.TextField(verbose_name="Original location string")
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    found = models.BooleanField(
+        default=True, help_text="False for negative results (the geocoder found nothing)"
+    )
+    updated_at = models.DateTimeField(verbose_name="Looked up at")
+
+    def __str__(self):
+        return f"{self.query} ({'found' if self.found else 'not found'})"
+
+    class Meta:
+        verbose_name = "Geocode cache entry"
+        verbose_name_plural = "Geocode cache entries"
+
+
+class LoadManifest(models.Model):
+    """One run of a loader command over a source file"""
+
+    STATUS_RUNNING = "running"
+    STATUS_COMPLETED = "completed"
+    STATUS_PARTIAL = "partial"
+    STATUS_FAILED = "failed"
+    STATUS_SKIPPED = "skipped"
+    STATUS_CHOICES = [
+        (STATUS_RUNNING, "Running"),
+        (STATUS_COMPLETED, "Completed"),
+        (STATUS_PARTIAL, "Completed with errors"),
+        (STATUS_FAILED, "Failed"),
+        (STATUS_SKIPPED, "Skipped (file unchanged)"),
+    ]
+
+    command = models.CharField(max_length=50, verbose_name="Loader command")
+    source_path = models.TextField(verbose_name="Source file")
+    file_checksum = models.CharField(max_length=64, verbose_name="File SHA-256")
+    file_size = models.BigIntegerField(verbose_name="File size (bytes)")
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=STATUS_RUNNING
+    )
+    row_count = models.IntegerField(default=0)
+    created_count = models.IntegerField(default=0)
+    updated_count = models.IntegerField(default=0)
+    unchanged_count = models.IntegerField(default=0)
+    error_count = models.IntegerField(
+        default=0, help_text="Rows that could not be written or geocoded"
+    )
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.command} {self.source_path} ({self.status})"
+
+    @property
+    def duration(self):
+        if self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    class Meta:
+        verbose_name = "Load manifest"
+        verbose_name_plural = "Load manifests"
+        ordering = ["-started_at"]
+        indexes = [
+            models.Index(fields=["command", "file_checksum", "status"]),
+        ]
+
+
+class DataVersion(models.Model):
+    """
+    Counter of changes to the spot data: a single row, bumped by every loader
+    run in the transaction that records it. Caches key their entries by it.
+    aggregates_version is the version the price aggregates were rebuilt at;
+    they are stale while it is behind (after edits in the admin).
+    """
+
+    version = models.PositiveBigIntegerField(default=0)
+    aggregates_version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Data version {self.version}"
+
+    class Meta:
+        verbose_name = "Data version"
+        verbose_name_plural = "Data versions"
+
+
+class PriceAggregate(models.Model):
+    """
+    Price statistics of the spots for every combination of sector, type,
+    municipality and state (GROUP BY CUBE), rebuilt when a load finishes and
+    after edits in the admin (see DataVersion.aggregates_version).
+    grouping_set has one bit per dimension the row is grouped by (see
+    spots.aggregates.DIMENSIONS); the other dimensions are totals and null.
+    """
+
+    grouping_set = models.PositiveSmallIntegerField()
+    spot_sector_id = models.IntegerField(null=True, blank=True)
+    spot_type_id = models.IntegerField(null=True, blank=True)
+    spot_municipality = models.CharField(max_length=255, null=True, blank=True)
+    spot_state = models.CharField(max_length=255, null=True, blank=True)
+    spot_count = models.IntegerField(default=0)
+    # Total rent (MXN): spots with a price, mean, min, max, median, 90th percentile
+    rent_count = models.IntegerField(default=0)
+    rent_mean = models.FloatField(null=True, blank=True)
+    rent_min = models.FloatField(null=True, blank=True)
+    rent_max = models.FloatField(null=True, blank=True)
+    rent_p50 = models.FloatField(null=True, blank=True)
+    rent_p90 = models.FloatField(null=True, blank=True)
+    # Total sale (MXN)
+    sale_count = models.IntegerField(default=0)
+    sale_mean = models.FloatField(null=True, blank=True)
+    sale_min = models.FloatField(null=True, blank=True)
+    sale_max = models.FloatField(null=True, blank=True)
+    sale_p50 = models.FloatField(null=True, blank=True)
+    sale_p90 = models.FloatField(null=True, blank=True)
+    # Rent per sqm (MXN)
+    rent_sqm_count = models.IntegerField(default=0)
+    rent_sqm_mean = models.FloatField(null=True, blank=True)
+    rent_sqm_min = models.FloatField(null=True, blank=True)
+    rent_sqm_max = models.FloatField(null=True, blank=True)
+    rent_sqm_p50 = models.FloatField(null=True, blank=True)
+    rent_sqm_p90 = models.FloatField(null=True, blank=True)
+    # Sale per sqm (MXN)
+    sale_sqm_count = models.IntegerField(default=0)
+    sale_sqm_mean = models.FloatField(null=True, blank=True)
+    sale_sqm_min = models.FloatField(null=True, blank=True)
+    sale_sqm_max = models.FloatField(null=True, blank=True)
+    sale_sqm_p50 = models.FloatField(null=True, blank=True)
+    sale_sqm_p90 = models.FloatField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Prices of {self.spot_count} spots (grouping set {self.grouping_set})"
+
+    class Meta:
+        verbose_name = "Price aggregate"
+        verbose_name_plural = "Price aggregates"
+        indexes = [
+            models.Index(
+                fields=[
+                    "grouping_set",
+                    "spot_sector_id",
+                    "spot_type_id",
+                    "spot_municipality",
+                    "spot_state",
+                ],
+                name="spots_price_aggregate_lookup",
+            ),
         ]
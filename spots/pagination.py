@@ -0,0 +1,181 @@
+import base64
+import bisect
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import ParseError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+def encode_cursor(position):
+    """Opaque cursor token for a keyset position (a JSON-serializable list)."""
+    raw = json.dumps(position, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    """Inverse of encode_cursor. Raises ValueError for a malformed token."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        position = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor.")
+    if not isinstance(position, list):
+        raise ValueError("Invalid cursor.")
+    return position
+
+
+def page_url(request, position):
+    """URL of the page that starts after position, or None at the end."""
+    if position is None:
+        return None
+    url = request.build_absolute_uri()
+    return replace_query_param(url, "cursor", encode_cursor(position))
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset pagination for GeoJSON lists. Each page continues after the sort key
+    of the last row served (WHERE key > cursor), so a deep page costs the same
+    as the first one, and no COUNT(*) is run.
+
+    The view declares its sort key as `keyset = [(attribute, descending), ...]`,
+    ending in a unique, non-null attribute, and orders its queryset by it. An
+    optional `view.max_results` caps the total number of rows over all pages
+    (k nearest, top-rent limit). The response is the FeatureCollection with a
+    `next` URL, null on the last page.
+    """
+
+    page_size = api_settings.PAGE_SIZE or 100
+    max_page_size = 1000
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(
+                request.query_params.get(self.page_size_query_param, self.page_size)
+            )
+        except ValueError:
+            page_size = 0
+        if not 0 < page_size <= self.max_page_size:
+            raise ParseError(f"page_size must be between 1 and {self.max_page_size}.")
+        return page_size
+
+    def get_position(self, request):
+        """(sort key after which the page starts, rows served so far)"""
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, 0
+        try:
+            position = decode_cursor(token)
+        except ValueError as e:
+            raise ParseError(str(e))
+        # The last element counts the rows already served (for max_results)
+        if len(position) != len(self.keyset) + 1 or not isinstance(position[-1], int):
+            raise ParseError("Invalid cursor.")
+        return position[:-1], position[-1]
+
+    def start_page(self, request, view):
+        self.request = request
+        self.keyset = view.keyset
+        self.next_position = None
+        page_size = self.get_page_size(request)
+        after, self.served = self.get_position(request)
+        self.max_results = getattr(view, "max_results", None)
+        self.limit = page_size
+        if self.max_results is not None:
+            self.limit = max(0, min(page_size, self.max_results - self.served))
+        return after
+
+    def after(self, key):
+        """
+        Q for rows that sort after key: (a > x) OR (a = x AND b > y) ... A null
+        value only matches nulls: the view sorts them last with a flag before it.
+        """
+        condition = Q()
+        equal = {}
+        for (attribute, descending), value in zip(self.keyset, key):
+            if value is None:
+                equal[f"{attribute}__isnull"] = True
+                continue
+            lookup = f"{attribute}__lt" if descending else f"{attribute}__gt"
+            condition |= Q(**equal, **{lookup: value})
+            equal[attribute] = value
+        return condition
+
+    def finish_page(self, rows, key):
+        """Trims the extra row fetched to know whether a next page exists."""
+        page = rows[: self.limit]
+        served = self.served + len(page)
+        has_more = len(rows) > self.limit
+        if has_more and (self.max_results is None or served < self.max_results):
+            self.next_position = [*key(page[-1]), served]
+        return page
+
+    def paginate_queryset(self, queryset, request, view=None):
+        after = self.start_page(request, view)
+        if after is not None:
+            try:
+                queryset = queryset.filter(self.after(after))
+            except (TypeError, ValueError):
+                raise ParseError("Invalid cursor.")
+        rows = list(queryset[: self.limit + 1]) if self.limit else []
+        return self.finish_page(
+            rows, lambda row: [getattr(row, attribute) for attribute, _ in self.keyset]
+        )
+
+    def paginate_sorted(self, keys, request, view=None):
+        """
+        Same paging over sort keys already computed in memory, in keyset order
+        (spatial snapshot). Returns the range of indices of the page.
+        """
+        after = self.start_page(request, view)
+        try:
+            start = bisect.bisect_right(keys, tuple(after)) if after is not None else 0
+        except TypeError:
+            raise ParseError("Invalid cursor.")
+        stop = min(len(keys), start + self.limit + 1)
+        return self.finish_page(range(start, stop), lambda i: keys[i])
+
+    def get_paginated_response(self, data):
+        # Additional FeatureCollection member (allowed by GeoJSON)
+        data["next"] = page_url(self.request, self.next_position)
+        return Response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            **schema,
+            "properties": {
+                **schema.get("properties", {}),
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Opaque cursor of the next page.",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "description": f"Results per page (max {self.max_page_size}).",
+                "schema": {"type": "integer"},
+            },
+        ]
+
+
+class WithinPagination(KeysetPagination):
+    """Larger pages for polygon/bbox exports"""
+
+    page_size = 1000
+    max_page_size = 10000
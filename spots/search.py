@@ -0,0 +1,53 @@
+import unicodedata
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db.models import F, FloatField, Func, TextField, Value
+from django.db.models.functions import Cast
+
+# PostgreSQL text search configuration (Spanish stemming)
+SEARCH_CONFIG = "spanish"
+
+
+class SearchText(Func):
+    """
+    spots_search_text(text) of migration 0011: lower(unaccent(text)). It is
+    IMMUTABLE, so the trigram GIN indexes are built on it.
+    """
+
+    function = "spots_search_text"
+    output_field = TextField()
+
+
+def search_text(value):
+    """SearchText in Python: lowercase without accents ("Álvaro" -> "alvaro")."""
+    decomposed = unicodedata.normalize("NFKD", value)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def spot_search_vector():
+    """
+    Weighted tsvector stored in Spot.search_vector: title (A), description (B)
+    and address (C), normalized with SearchText.
+    """
+    return (
+        SearchVector(SearchText("spot_title"), config=SEARCH_CONFIG, weight="A")
+        + SearchVector(SearchText("spot_description"), config=SEARCH_CONFIG, weight="B")
+        + SearchVector(SearchText("spot_address"), config=SEARCH_CONFIG, weight="C")
+    )
+
+
+def spot_search_query(value):
+    """websearch_to_tsquery of a ?q= value, normalized like the vector."""
+    return SearchQuery(
+        SearchText(Value(value)), config=SEARCH_CONFIG, search_type="websearch"
+    )
+
+
+def spot_search_rank(value):
+    """
+    ts_rank of the spots for a ?q= value, as double precision: the real that
+    ts_rank returns would not survive the round trip through a cursor.
+    """
+    return Cast(
+        SearchRank(F("search_vector"), spot_search_query(value)), FloatField()
+    )
@@ -36,6 +36,24 @@ class SpotSerializer(GeoFeatureModelSerializer):
         read_only_fields = ("location",) 
 
 
+class SpotDistanceSerializer(SpotSerializer):
+    """Spot feature with its distance in metres to the query point"""
+
+    distance = serializers.FloatField(read_only=True)
+
+    class Meta(SpotSerializer.Meta):
+        fields = SpotSerializer.Meta.fields + ("distance",)
+
+
+class SpotSearchSerializer(SpotSerializer):
+    """Spot feature with its full-text search rank for ?q="""
+
+    search_rank = serializers.FloatField(read_only=True)
+
+    class Meta(SpotSerializer.Meta):
+        fields = SpotSerializer.Meta.fields + ("search_rank",)
+
+
 class AvgPriceSerializer(serializers.Serializer):
     """Serializer for the average price aggregated data"""
 
@@ -0,0 +1,420 @@
+import math
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db.models import FloatField, Func
+
+from .loading import data_version
+from .search import search_text
+from .models import Spot
+
+# Sphere PostGIS uses with use_spheroid=false: radius (2a + b) / 3 of WGS84,
+# with the same constants as liblwgeom
+WGS84_A = 6378137.0
+WGS84_B = WGS84_A - WGS84_A / 298.257223563
+SPHERE_RADIUS = (2.0 * WGS84_A + WGS84_B) / 3.0
+
+# Grid cell size, in degrees
+DEFAULT_CELL_SIZE = 0.05
+
+# Slack of the vectorized prefilter; the final decision uses the exact formula
+PREFILTER_TOLERANCE = 1e-9
+
+# SpotFilter filters the snapshot can evaluate
+SUPPORTED_FILTERS = {"sector", "type", "municipality"}
+
+
+def sphere_distance(lng1, lat1, lng2, lat2):
+    """
+    Distance in metres on the PostGIS sphere, with the same operations as
+    sphere_distance() in liblwgeom (what ST_Distance(geography, geography,
+    false) and the geography <-> operator compute). Scalar version, evaluated
+    with the C library like PostGIS.
+    """
+    lat_s = lat1 * math.pi / 180.0
+    lat_e = lat2 * math.pi / 180.0
+    d_lon = lng2 * math.pi / 180.0 - lng1 * math.pi / 180.0
+    cos_d_lon = math.cos(d_lon)
+    cos_lat_e = math.cos(lat_e)
+    sin_lat_e = math.sin(lat_e)
+    cos_lat_s = math.cos(lat_s)
+    sin_lat_s = math.sin(lat_s)
+    a1 = cos_lat_e * math.sin(d_lon)
+    a2 = cos_lat_s * sin_lat_e - sin_lat_s * cos_lat_e * cos_d_lon
+    a = math.sqrt(a1 * a1 + a2 * a2)
+    b = sin_lat_s * sin_lat_e + cos_lat_s * cos_lat_e * cos_d_lon
+    return SPHERE_RADIUS * math.atan2(a, b)
+
+
+def reported_distance(distance):
+    """ST_Distance(geography) rounds its result to 1e-8 m (PostGIS #2168)."""
+    return math.floor(distance * 1e8 + 0.5) / 1e8
+
+
+def _sphere_distances(lng, lat, lng_array, lat_array):
+    """Vectorized sphere_distance, used only as a prefilter."""
+    lat_s = lat * np.pi / 180.0
+    lat_e = lat_array * np.pi / 180.0
+    d_lon = lng_array * np.pi / 180.0 - lng * np.pi / 180.0
+    cos_d_lon = np.cos(d_lon)
+    cos_lat_e = np.cos(lat_e)
+    sin_lat_e = np.sin(lat_e)
+    a = np.hypot(
+        cos_lat_e * np.sin(d_lon),
+        np.cos(lat_s) * sin_lat_e - np.sin(lat_s) * cos_lat_e * cos_d_lon,
+    )
+    b = np.sin(lat_s) * sin_lat_e + np.cos(lat_s) * cos_lat_e * cos_d_lon
+    return SPHERE_RADIUS * np.arctan2(a, b)
+
+
+def _points_in_ring(x, y, ring):
+    """
+    Winding-number test of the points (x, y) against a closed ring, as in
+    PostGIS' point-in-polygon shortcut for ST_Within. Returns (inside,
+    on_boundary) boolean arrays.
+    """
+    winding = np.zeros(len(x), dtype=np.int64)
+    on_boundary = np.zeros(len(x), dtype=bool)
+    for (x1, y1), (x2, y2) in zip(ring[:-1], ring[1:]):
+        side = (x - x1) * (y2 - y1) - (x2 - x1) * (y - y1)
+        on_boundary |= (
+            (side == 0)
+            & (((x >= x1) & (x <= x2)) | ((x >= x2) & (x <= x1)))
+            & (((y >= y1) & (y <= y2)) | ((y >= y2) & (y <= y1)))
+        )
+        winding += (side < 0) & (y1 <= y) & (y < y2)
+        winding -= (side > 0) & (y2 <= y) & (y < y1)
+    return winding != 0, on_boundary
+
+
+def _float_down(values):
+    """Largest float32 not above each value, like next_float_down() in PostGIS."""
+    rounded = values.astype(np.float32)
+    return np.where(
+        rounded.astype(np.float64) > values,
+        np.nextafter(rounded, np.float32(-np.inf)),
+        rounded,
+    ).astype(np.float64)
+
+
+def _float_up(values):
+    """Smallest float32 not below each value, like next_float_up() in PostGIS."""
+    rounded = values.astype(np.float32)
+    return np.where(
+        rounded.astype(np.float64) < values,
+        np.nextafter(rounded, np.float32(np.inf)),
+        rounded,
+    ).astype(np.float64)
+
+
+class SpotSnapshot:
+    """
+    Immutable in-memory index over the located spots: their coordinates in
+    NumPy arrays bucketed by a lon/lat grid, plus the columns SpotFilter filters
+    on. Radius, k-nearest and polygon queries use the same arithmetic as
+    PostGIS, so they return the same spot_ids, order and distances as the SQL
+    path; the rows themselves are then fetched by primary key.
+    """
+
+    def __init__(
+        self,
+        version,
+        spot_ids,
+        lng,
+        lat,
+        sector=None,
+        type_id=None,
+        municipality=None,
+        cell_size=DEFAULT_CELL_SIZE,
+    ):
+        self.version = version
+        self.cell_size = cell_size
+        self._rows = int(math.ceil(180.0 / cell_size)) + 1
+
+        spot_ids = np.asarray(spot_ids, dtype=np.int64)
+        lng = np.asarray(lng, dtype=np.float64)
+        lat = np.asarray(lat, dtype=np.float64)
+        size = len(spot_ids)
+        columns = {
+            "sector": sector if sector is not None else [None] * size,
+            "type": type_id if type_id is not None else [None] * size,
+        }
+        # NULLs become NaN, which never equals a filtered value
+        columns = {
+            name: np.array(
+                [np.nan if v is None else v for v in values], dtype=np.float64
+            )
+            for name, values in columns.items()
+        }
+        # Like SearchTextFilter: lowercase, accent-insensitive substring
+        columns["municipality"] = np.array(
+            [search_text(v) if v else None for v in (municipality or [None] * size)],
+            dtype=object,
+        )
+
+        # Sorted by cell (and spot_id): each grid column is a contiguous range
+        # of the arrays, found with searchsorted
+        cells = self._cell(lng, lat)
+        order = np.lexsort((spot_ids, cells))
+        self._cells = cells[order]
+        self.spot_ids = spot_ids[order]
+        self.lng = lng[order]
+        self.lat = lat[order]
+        self._columns = {name: values[order] for name, values in columns.items()}
+        # Out-of-range coordinates fall outside the grid: always candidates
+        self._outside = np.flatnonzero(
+            (self.lng < -180) | (self.lng > 180) | (self.lat < -90) | (self.lat > 90)
+            | np.isnan(self.lng) | np.isnan(self.lat)
+        )
+        for array in (self._cells, self.spot_ids, self.lng, self.lat, *self._columns.values()):
+            array.setflags(write=False)
+
+    @classmethod
+    def build(cls, version=None, cell_size=DEFAULT_CELL_SIZE):
+        """Loads the located spots from the database."""
+        rows = (
+            Spot.objects.filter(location__isnull=False)
+            .annotate(
+                x=Func("location", function="ST_X", output_field=FloatField()),
+                y=Func("location", function="ST_Y", output_field=FloatField()),
+            )
+            .values_list(
+                "spot_id", "x", "y", "spot_sector_id", "spot_type_id", "spot_municipality"
+            )
+            .order_by()
+        )
+        spot_ids, lng, lat, sector, type_id, municipality = [], [], [], [], [], []
+        for row in rows.iterator(chunk_size=10000):
+            for column, value in zip(
+                (spot_ids, lng, lat, sector, type_id, municipality), row
+            ):
+                column.append(value)
+        return cls(
+            version, spot_ids, lng, lat, sector, type_id, municipality, cell_size
+        )
+
+    def __len__(self):
+        return len(self.spot_ids)
+
+    def _cell(self, lng, lat):
+        col = np.floor((np.asarray(lng) + 180.0) / self.cell_size).astype(np.int64)
+        row = np.floor((np.asarray(lat) + 90.0) / self.cell_size).astype(np.int64)
+        return col * self._rows + row
+
+    def _box_candidates(self, min_lng, min_lat, max_lng, max_lat):
+        """Indices of the points in the grid cells that overlap the box."""
+        min_lng, max_lng = max(min_lng, -180.0), min(max_lng, 180.0)
+        min_lat, max_lat = max(min_lat, -90.0), min(max_lat, 90.0)
+        if min_lng > max_lng or min_lat > max_lat:
+            return np.empty(0, dtype=np.int64)
+        col0, row0 = (int(v) for v in divmod(int(self._cell(min_lng, min_lat)), self._rows))
+        col1, row1 = (int(v) for v in divmod(int(self._cell(max_lng, max_lat)), self._rows))
+        columns = np.arange(col0, col1 + 1, dtype=np.int64) * self._rows
+        starts = np.searchsorted(self._cells, columns + row0, side="left")
+        ends = np.searchsorted(self._cells, columns + row1, side="right")
+        ranges = [np.arange(s, e) for s, e in zip(starts, ends) if e > s]
+        if not ranges:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(ranges)
+
+    def _candidates(self, boxes):
+        found = [self._box_candidates(*box) for box in boxes] + [self._outside]
+        return np.unique(np.concatenate(found))
+
+    def _radius_boxes(self, lng, lat, radius):
+        """Lon/lat boxes that cover the spherical cap of the given radius."""
+        angle = radius / SPHERE_RADIUS * (1 + PREFILTER_TOLERANCE) + PREFILTER_TOLERANCE
+        d_lat = math.degrees(angle)
+        if angle >= math.pi / 2 or abs(lat) + d_lat >= 90.0:
+            return [(-180.0, lat - d_lat, 180.0, lat + d_lat)]
+        ratio = math.sin(angle) / math.cos(math.radians(lat))
+        if ratio >= 1:
+            return [(-180.0, lat - d_lat, 180.0, lat + d_lat)]
+        d_lng = math.degrees(math.asin(ratio)) * (1 + PREFILTER_TOLERANCE) + PREFILTER_TOLERANCE
+        boxes = [(lng - d_lng, lat - d_lat, lng + d_lng, lat + d_lat)]
+        # Spans that cross the antimeridian
+        if lng - d_lng < -180.0:
+            boxes.append((lng - d_lng + 360.0, lat - d_lat, 180.0, lat + d_lat))
+        if lng + d_lng > 180.0:
+            boxes.append((-180.0, lat - d_lat, lng + d_lng - 360.0, lat + d_lat))
+        return boxes
+
+    def _filter(self, indices, filters):
+        """Applies the SpotFilter values (sector, type, municipality)."""
+        for name, value in (filters or {}).items():
+            if value is None or value == "":
+                continue
+            if name == "municipality":
+                needle = search_text(str(value))
+                column = self._columns["municipality"][indices]
+                keep = np.fromiter(
+                    (bool(v) and needle in v for v in column), dtype=bool, count=len(indices)
+                )
+            else:
+                # Like IntegerField.get_prep_value: int() of the filter value
+                keep = self._columns[name][indices] == int(value)
+            indices = indices[keep]
+        return indices
+
+    def _within_radius(self, lng, lat, radius, filters):
+        """(indices, distances) of the spots with ST_DWithin(..., radius, false)."""
+        indices = self._filter(self._candidates(self._radius_boxes(lng, lat, radius)), filters)
+        if not len(indices):
+            return indices, []
+        approx = _sphere_distances(lng, lat, self.lng[indices], self.lat[indices])
+        indices = indices[approx <= radius * (1 + PREFILTER_TOLERANCE) + PREFILTER_TOLERANCE]
+        exact = [
+            sphere_distance(lng, lat, float(self.lng[i]), float(self.lat[i]))
+            for i in indices
+        ]
+        keep = [d <= radius for d in exact]
+        return indices[np.array(keep, dtype=bool)], [d for d, k in zip(exact, keep) if k]
+
+    def _ranked(self, indices, distances, limit=None):
+        """[(spot_id, distance)] ordered like ORDER BY location <-> point, spot_id."""
+        ranked = sorted(zip(distances, (int(self.spot_ids[i]) for i in indices)))
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [(spot_id, reported_distance(d)) for d, spot_id in ranked]
+
+    def radius(self, lng, lat, radius, filters=None):
+        """Spots within radius metres of the point, nearest first."""
+        indices, distances = self._within_radius(lng, lat, radius, filters)
+        return self._ranked(indices, distances)
+
+    def nearest(self, lng, lat, k, max_distance=None, filters=None):
+        """The k nearest spots, optionally no farther than max_distance metres."""
+        # Initial radius on the order of one cell; doubled until there are k spots
+        search = self.cell_size * math.pi / 180.0 * SPHERE_RADIUS
+        limit = math.pi * SPHERE_RADIUS
+        if max_distance is not None:
+            limit = min(limit, max_distance)
+        while True:
+            search = min(search, limit)
+            indices, distances = self._within_radius(lng, lat, search, filters)
+            if len(indices) >= k or search >= limit:
+                return self._ranked(indices, distances, k)
+            search *= 2
+
+    def within(self, geometry=None, bbox=None, filters=None):
+        """
+        spot_ids strictly inside a Polygon or MultiPolygon (ST_Within) and/or
+        inside a (min_lng, min_lat, max_lng, max_lat) box (location @ envelope),
+        ascending.
+        """
+        boxes = []
+        if geometry is not None:
+            boxes.append(geometry.extent)
+        if bbox is not None:
+            # Points accepted by @ fall inside the box rounded outwards
+            boxes.append(
+                (*_float_down(np.array(bbox[:2])), *_float_up(np.array(bbox[2:])))
+            )
+        min_lng, min_lat = max(b[0] for b in boxes), max(b[1] for b in boxes)
+        max_lng, max_lat = min(b[2] for b in boxes), min(b[3] for b in boxes)
+        indices = self._filter(
+            self._candidates([(min_lng, min_lat, max_lng, max_lat)]), filters
+        )
+        if bbox is not None:
+            indices = indices[self._in_box(indices, bbox)]
+        if geometry is not None:
+            indices = indices[self._in_geometry(indices, geometry)]
+        return sorted(int(spot_id) for spot_id in self.spot_ids[indices])
+
+    def _in_box(self, indices, bbox):
+        """
+        The @ operator compares float4 boxes rounded outwards (box2df), for
+        the points as well as for the envelope.
+        """
+        x, y = self.lng[indices], self.lat[indices]
+        min_lng, min_lat = _float_down(np.array(bbox[:2]))
+        max_lng, max_lat = _float_up(np.array(bbox[2:]))
+        return (
+            (min_lng <= _float_down(x)) & (_float_up(x) <= max_lng)
+            & (min_lat <= _float_down(y)) & (_float_up(y) <= max_lat)
+        )
+
+    def _in_geometry(self, indices, geometry):
+        polygons = [geometry] if geometry.geom_type == "Polygon" else list(geometry)
+        x, y = self.lng[indices], self.lat[indices]
+        undecided = np.ones(len(indices), dtype=bool)
+        inside = np.zeros(len(indices), dtype=bool)
+        # Like PostGIS: the first polygon that decides (interior or boundary) wins
+        for polygon in polygons:
+            rings = [np.asarray(ring.coords, dtype=np.float64) for ring in polygon]
+            in_outer, on_outer = _points_in_ring(x, y, rings[0])
+            undecided &= ~on_outer
+            candidate = undecided & in_outer
+            for hole in rings[1:]:
+                in_hole, on_hole = _points_in_ring(x, y, hole)
+                undecided &= ~(candidate & on_hole)
+                candidate &= ~(in_hole | on_hole)
+            inside |= candidate
+            undecided &= ~candidate
+        return inside
+
+
+def fetch_spots(rows, spot_ids, distances=None):
+    """
+    Reads the rows for snapshot results by primary key from rows (a named
+    values_list() of Spot with a distance column when distances are given),
+    keeping their order and filling in each distance. Spots deleted since the
+    snapshot was built are left out.
+    """
+    found = {row.spot_id: row for row in rows.filter(spot_id__in=spot_ids)}
+    result = []
+    for position, spot_id in enumerate(spot_ids):
+        row = found.get(spot_id)
+        if row is None:
+            continue
+        if distances is not None:
+            row = row._replace(distance=distances[position])
+        result.append(row)
+    return result
+
+
+_lock = threading.Lock()
+_snapshot = None
+_checked_at = 0.0
+
+
+def get_snapshot():
+    """
+    The current snapshot, or None when SPOTS_SPATIAL_SNAPSHOT is off. The data
+    version is checked at most every SPOTS_SNAPSHOT_CHECK_INTERVAL seconds; when
+    it changed, one thread rebuilds the snapshot while the others keep serving
+    the previous one, which is then replaced in a single assignment.
+    """
+    global _snapshot, _checked_at
+    if not getattr(settings, "SPOTS_SPATIAL_SNAPSHOT", False):
+        return None
+    snapshot = _snapshot
+    interval = getattr(settings, "SPOTS_SNAPSHOT_CHECK_INTERVAL", 1.0)
+    if snapshot is not None and time.monotonic() - _checked_at < interval:
+        return snapshot
+
+    version = data_version()
+    if snapshot is None or snapshot.version != version:
+        if not _lock.acquire(blocking=snapshot is None):
+            return snapshot
+        try:
+            if _snapshot is None or _snapshot.version != version:
+                _snapshot = SpotSnapshot.build(
+                    version,
+                    getattr(settings, "SPOTS_SNAPSHOT_CELL_SIZE", DEFAULT_CELL_SIZE),
+                )
+            snapshot = _snapshot
+        finally:
+            _lock.release()
+    _checked_at = time.monotonic()
+    return snapshot
+
+
+def clear_snapshot():
+    """Drops the current snapshot; the next get_snapshot() rebuilds it."""
+    global _snapshot, _checked_at
+    with _lock:
+        _snapshot = None
+        _checked_at = 0.0
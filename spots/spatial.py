@@ -0,0 +1,169 @@
+import json
+import math
+
+from django.contrib.gis.db.models import GeometryField, PointField
+from django.contrib.gis.geos import MultiPolygon, Polygon
+from django.db.models import BinaryField, BooleanField, FloatField, Func, Value
+from django.db.models.functions import Cast
+
+
+def geography(expression="location"):
+    """
+    Casts a geometry(Point, 4326) expression to geography, so distances and
+    radii are in metres. The GiST index on Spot is built over this same
+    expression, which lets PostgreSQL use it for ST_DWithin and <->.
+    """
+    return Cast(expression, output_field=PointField(geography=True, srid=4326))
+
+
+def geography_value(point):
+    """A Point parameter sent as geography."""
+    return Value(point, output_field=PointField(geography=True, srid=4326))
+
+
+class DWithin(Func):
+    """
+    ST_DWithin(geography, geography, metres) on the sphere: index-assisted
+    radius test with the same metric as SphereDistance and <->.
+    """
+
+    function = "ST_DWithin"
+    template = "%(function)s(%(expressions)s, false)"
+    output_field = BooleanField()
+
+
+class SphereDistance(Func):
+    """
+    ST_Distance between two geographies in metres, computed on the sphere like
+    the <-> operator so that the reported distance follows the KNN order.
+    """
+
+    function = "ST_Distance"
+    template = "%(function)s(%(expressions)s, false)"
+    output_field = FloatField()
+
+
+class KNNDistance(Func):
+    """geography <-> geography: KNN ordering operator served by the GiST index"""
+
+    arg_joiner = " <-> "
+    template = "(%(expressions)s)"
+    output_field = FloatField()
+
+
+class PointX(Func):
+    """ST_X: longitude stored in a geometry(Point, 4326)"""
+
+    function = "ST_X"
+    output_field = FloatField()
+
+
+class PointY(Func):
+    """ST_Y: latitude stored in a geometry(Point, 4326)"""
+
+    function = "ST_Y"
+    output_field = FloatField()
+
+
+class BBoxOverlaps(Func):
+    """geometry && geometry: bounding boxes intersect (GiST index filter)"""
+
+    arg_joiner = " && "
+    template = "(%(expressions)s)"
+    output_field = BooleanField()
+
+
+class TileEnvelope(Func):
+    """
+    ST_TileEnvelope: Web Mercator bounds of tile z/x/y, widened on every side
+    by margin (a fraction of the tile size).
+    """
+
+    function = "ST_TileEnvelope"
+    template = "%(function)s(%(expressions)s, margin => %(margin)s)"
+    output_field = GeometryField(srid=3857)
+
+    def __init__(self, z, x, y, margin=0.0):
+        super().__init__(Value(z), Value(x), Value(y), margin=float(margin))
+
+
+class AsMVTGeom(Func):
+    """
+    ST_AsMVTGeom: geometry in tile coordinates (0..extent), clipped to bounds
+    plus buffer. Only meant as input of ST_AsMVT in SQL, so it is not declared
+    a GeometryField, which would be selected as ::bytea.
+    """
+
+    function = "ST_AsMVTGeom"
+    output_field = BinaryField()
+
+    def __init__(self, expression, bounds, extent, buffer):
+        super().__init__(expression, bounds, Value(extent), Value(buffer))
+
+
+class OverlapsSubdivided(Func):
+    """
+    EXISTS over the pieces of ST_Subdivide(polygon, max_vertices) whose
+    bounding box overlaps the location. Each small piece probes the GiST index
+    with a tight box instead of the box of the whole polygon; the exact test is
+    still ST_Within against the original polygon.
+    """
+
+    output_field = BooleanField()
+
+    def __init__(self, location, polygon, max_vertices):
+        super().__init__(
+            location,
+            Value(polygon, output_field=GeometryField(srid=4326)),
+            Value(max_vertices),
+        )
+
+    def as_sql(self, compiler, connection, **extra_context):
+        (location, location_params), (polygon, polygon_params), (
+            max_vertices,
+            max_vertices_params,
+        ) = (compiler.compile(expression) for expression in self.get_source_expressions())
+        sql = (
+            f"EXISTS (SELECT 1 FROM ST_Subdivide({polygon}, {max_vertices}) AS piece(geom) "
+            f"WHERE piece.geom && {location})"
+        )
+        return sql, (*polygon_params, *max_vertices_params, *location_params)
+
+
+class UnsupportedGeometry(ValueError):
+    pass
+
+
+def geometry_from_geojson(data):
+    """
+    Builds a Polygon or MultiPolygon (SRID 4326) straight from a GeoJSON
+    object, without serializing it back to a string for GEOS. Other geometry
+    types raise UnsupportedGeometry.
+    """
+    if isinstance(data, str):
+        data = json.loads(data)
+    geom_type = data.get("type")
+    coordinates = data.get("coordinates")
+    if geom_type == "Polygon":
+        return Polygon(*coordinates, srid=4326)
+    if geom_type == "MultiPolygon":
+        return MultiPolygon(*(Polygon(*rings) for rings in coordinates), srid=4326)
+    raise UnsupportedGeometry(f"Unsupported geometry type {geom_type!r}.")
+
+
+def parse_bbox(value):
+    """
+    (min_lng, min_lat, max_lng, max_lat) from a "min_lng,min_lat,max_lng,max_lat"
+    string or a list of four numbers. Raises ValueError when invalid.
+    """
+    if isinstance(value, str):
+        value = value.split(",")
+    try:
+        bbox = tuple(float(v) for v in value)
+    except TypeError:
+        raise ValueError("bbox must be a list of four numbers.")
+    if len(bbox) != 4 or not all(map(math.isfinite, bbox)):
+        raise ValueError("bbox must have four finite numbers.")
+    if bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+        raise ValueError("bbox must be min_lng,min_lat,max_lng,max_lat.")
+    return bbox
@@ -0,0 +1,52 @@
+from django.http import HttpResponse, StreamingHttpResponse
+
+from .geojson import render_json
+
+
+def wants_stream(request):
+    """True for ?stream=1 / ?stream=true"""
+    return request.query_params.get("stream", "").lower() in ("1", "true")
+
+
+def wants_database_assembly(request):
+    """True for ?assemble=db: PostgreSQL renders the whole FeatureCollection"""
+    return request.query_params.get("assemble", "").lower() == "db"
+
+
+def feature_collection_chunks(features, buffer_size=64 * 1024):
+    """
+    Yields a GeoJSON FeatureCollection as bytes, rendering one feature dict at
+    a time with the same JSON encoding as the API responses. Features are
+    grouped in pieces of about buffer_size bytes, so memory stays flat however
+    many rows the iterable produces.
+    """
+    buffer = [b'{"type":"FeatureCollection","features":[']
+    size = 0
+    separator = b""
+    for feature in features:
+        feature = render_json(feature)
+        buffer += (separator, feature)
+        separator = b","
+        size += len(feature) + 1
+        if size >= buffer_size:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+    buffer.append(b"]}")
+    yield b"".join(buffer)
+
+
+def snapshot_rows(queryset, spot_ids, chunk_size):
+    """Rows of queryset for a sorted list of snapshot ids, chunk_size primary keys at a time."""
+    for start in range(0, len(spot_ids), chunk_size):
+        yield from queryset.filter(spot_id__in=spot_ids[start : start + chunk_size])
+
+
+def streaming_response(features):
+    return StreamingHttpResponse(
+        feature_collection_chunks(features), content_type="application/json"
+    )
+
+
+def assembled_response(features, rows, order):
+    """The FeatureCollection of rows as rendered by the database, passed through as is"""
+    return HttpResponse(features.assemble(rows, order), content_type="application/json")
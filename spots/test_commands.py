@@ -4,16 +4,29 @@ import os
 import csv
 import json
 import shutil  # <--- Importado para manejo de archivos
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
 from io import StringIO
 from unittest.mock import patch, MagicMock
 from django.core.management import call_command, CommandError
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
 from django.conf import settings
 from django.contrib.gis.geos import Point
+from django.db.models import QuerySet
 from django.db.utils import (
+    DatabaseError,
     IntegrityError,
 )  # Import needed for try-except in load_props test
-from .models import Spot
+from datetime import timedelta
+from django.utils import timezone
+from .models import GeocodeCacheEntry, LoadManifest, PriceAggregate, Spot
+from .loading import data_version
+from .search import spot_search_query
+from .geocoding import GazetteerGeocoder, TokenBucket, normalize_location_key
+from .management.commands.load_props import iter_json_array
+from .management.commands.load_spots import split_byte_ranges
 import logging  # Import logging
 
 # Deshabilitar logging durante las pruebas si es muy verboso (opcional)
@@ -24,6 +37,28 @@ TEST_DATA_DIR = os.path.join(settings.BASE_DIR, "test_data")
 os.makedirs(TEST_DATA_DIR, exist_ok=True)
 
 
+LOAD_SPOTS_HEADER = [
+    "spot_id",
+    "spot_sector_id",
+    "spot_type_id",
+    "spot_settlement",
+    "spot_municipality",
+    "spot_state",
+    "spot_region",
+    "spot_corridor",
+    "spot_latitude",
+    "spot_longitude",
+    "spot_area_in_sqm",
+    "spot_price_sqm_mxn_rent",
+    "spot_price_total_mxn_rent",
+    "spot_price_sqm_mxn_sale",
+    "spot_price_total_mxn_sale",
+    "spot_modality",
+    "uuiid",
+    "spot_created_date",
+]
+
+
 class LoadSpotsCommandTest(TestCase):
     def setUp(self):
         # Crear un archivo CSV temporal para la prueba
@@ -31,28 +66,7 @@ class LoadSpotsCommandTest(TestCase):
         with open(self.csv_path, "w", newline="", encoding="utf-8") as f:
             writer = csv.writer(f)
             # Escribir encabezado
-            writer.writerow(
-                [
-                    "spot_id",
-                    "spot_sector_id",
-                    "spot_type_id",
-                    "spot_settlement",
-                    "spot_municipality",
-                    "spot_state",
-                    "spot_region",
-                    "spot_corridor",
-                    "spot_latitude",
-                    "spot_longitude",
-                    "spot_area_in_sqm",
-                    "spot_price_sqm_mxn_rent",
-                    "spot_price_total_mxn_rent",
-                    "spot_price_sqm_mxn_sale",
-                    "spot_price_total_mxn_sale",
-                    "spot_modality",
-                    "uuiid",
-                    "spot_created_date",
-                ]
-            )
+            writer.writerow(LOAD_SPOTS_HEADER)
             # Escribir datos de prueba
             writer.writerow(
                 [
@@ -205,6 +219,231 @@ class LoadSpotsCommandTest(TestCase):
                     self.backup_file_path, self.original_file_path
                 )  # Usar move para restaurar
 
+    def test_load_spots_command_batch_size(self):
+        # Con lotes de 1 fila el duplicado 901 cae en otro lote; con 3 cae en el mismo
+        for batch_size in (1, 3):
+            Spot.objects.all().delete()
+            out = StringIO()
+            call_command(
+                "load_spots",
+                csv_path=self.csv_path,
+                batch_size=batch_size,
+                force=True,
+                stdout=out,
+            )
+
+            output = out.getvalue()
+            self.assertIn("Successfully processed 3 rows.", output)
+            self.assertIn("Created: 2", output)
+            self.assertIn("Updated: 1", output)
+            self.assertEqual(Spot.objects.count(), 2)
+            spot = Spot.objects.get(spot_id=901)
+            self.assertEqual(spot.spot_municipality, "Updated Mpio")
+            self.assertAlmostEqual(spot.location.y, 19.55)
+
+    def test_load_spots_command_copy_mode(self):
+        out = StringIO()
+        call_command("load_spots", csv_path=self.csv_path, mode="copy", stdout=out)
+
+        output = out.getvalue()
+        self.assertIn("Skipping row 2 (ID: 902): Invalid coordinates", output)
+        # Mismos conteos que el modo fila por fila
+        self.assertIn("Successfully processed 3 rows.", output)
+        self.assertIn("Created: 2", output)
+        self.assertIn("Updated: 1", output)
+
+        self.assertEqual(Spot.objects.count(), 2)
+        spot = Spot.objects.get(spot_id=901)
+        self.assertEqual(spot.spot_municipality, "Updated Mpio")  # Gana la última fila
+        self.assertEqual(spot.spot_area_in_sqm, 130.0)
+        self.assertAlmostEqual(spot.location.x, -99.55)
+        self.assertAlmostEqual(spot.location.y, 19.55)
+        self.assertEqual(spot.data_source, "csv")
+
+        spot_902 = Spot.objects.get(spot_id=902)
+        self.assertIsNone(spot_902.location)
+        self.assertIsNone(spot_902.spot_price_sqm_mxn_rent)
+        self.assertEqual(spot_902.spot_price_total_mxn_sale, 200000.0)
+
+    def test_load_spots_refreshes_price_aggregates(self):
+        call_command("load_spots", csv_path=self.csv_path, stdout=StringIO())
+
+        # Todos los spots (grouping_set 0) y por sector (bit 0)
+        total = PriceAggregate.objects.get(grouping_set=0)
+        self.assertEqual(total.spot_count, 2)
+        self.assertEqual(total.rent_count, 1)
+        self.assertEqual(total.rent_mean, 14300.0)
+        self.assertEqual(total.sale_max, 200000.0)
+        sector = PriceAggregate.objects.get(grouping_set=1, spot_sector_id=11)
+        self.assertEqual(sector.spot_count, 1)
+        self.assertEqual(sector.rent_count, 0)
+        self.assertIsNone(sector.rent_p50)
+        # 16 combinaciones de dimensiones, una fila por grupo
+        self.assertEqual(
+            PriceAggregate.objects.values("grouping_set").distinct().count(), 16
+        )
+        # La carga también incrementa la versión de los datos (cachés)
+        self.assertEqual(data_version(), 1)
+
+    def test_load_spots_skips_unchanged_file_and_rows(self):
+        for mode in ("orm", "copy"):
+            Spot.objects.all().delete()
+            LoadManifest.objects.all().delete()
+            call_command("load_spots", csv_path=self.csv_path, mode=mode, stdout=StringIO())
+
+            # Mismo archivo: se omite sin leerlo
+            out = StringIO()
+            call_command("load_spots", csv_path=self.csv_path, mode=mode, stdout=out)
+            self.assertIn("File unchanged since load", out.getvalue())
+            self.assertEqual(
+                list(LoadManifest.objects.values_list("status", flat=True)),
+                [LoadManifest.STATUS_SKIPPED, LoadManifest.STATUS_COMPLETED],
+            )
+
+            # Sólo cambia el spot 902: 901 queda intacto
+            Spot.objects.filter(spot_id=901).update(spot_title="Sin tocar")
+            with open(self.csv_path, "a", newline="", encoding="utf-8") as f:
+                csv.writer(f).writerow(
+                    ["902", "11", "", "", "Test Mpio 2", "Test State 2", "", "",
+                     "19.6", "-99.6", "", "", "", "200", "210000", "Sale", "5002", ""]
+                )
+            out = StringIO()
+            call_command("load_spots", csv_path=self.csv_path, mode=mode, stdout=out)
+            output = out.getvalue()
+            # 902 se repite en el archivo: sus dos filas cuentan como actualizaciones
+            self.assertIn("Created: 0, Updated: 2, Unchanged: 2.", output)
+            self.assertEqual(Spot.objects.get(spot_id=901).spot_title, "Sin tocar")
+            spot_902 = Spot.objects.get(spot_id=902)
+            self.assertEqual(spot_902.spot_price_total_mxn_sale, 210000.0)
+            self.assertAlmostEqual(spot_902.location.y, 19.6)
+
+            manifest = LoadManifest.objects.first()
+            self.assertEqual(manifest.status, LoadManifest.STATUS_COMPLETED)
+            self.assertEqual(manifest.row_count, 4)
+            self.assertEqual(manifest.updated_count, 2)
+            self.assertEqual(manifest.unchanged_count, 2)
+
+            # Con --force se reescriben todos: cuentan como actualizaciones
+            out = StringIO()
+            call_command(
+                "load_spots", csv_path=self.csv_path, mode=mode, force=True, stdout=out
+            )
+            self.assertIn("Created: 0, Updated: 4, Unchanged: 0.", out.getvalue())
+            self.assertEqual(LoadManifest.objects.first().updated_count, 4)
+            self.setUp()  # Restaura el CSV original para el siguiente modo
+
+    def test_load_spots_retries_failed_chunks(self):
+        original_bulk_create = QuerySet.bulk_create
+        calls = []
+
+        def flaky_bulk_create(queryset, objs, *args, **kwargs):
+            calls.append(objs)
+            if len(calls) == 1:
+                raise DatabaseError("connection lost")
+            return original_bulk_create(queryset, objs, *args, **kwargs)
+
+        # El único lote falla: la carga queda parcial y no cuenta como hecha
+        with patch.object(QuerySet, "bulk_create", flaky_bulk_create):
+            out, err = StringIO(), StringIO()
+            call_command(
+                "load_spots", csv_path=self.csv_path, stdout=out, stderr=err
+            )
+            self.assertIn("Error processing rows 1-3: connection lost", err.getvalue())
+            self.assertIn("Errors: 3.", out.getvalue())
+            self.assertFalse(Spot.objects.exists())
+            manifest = LoadManifest.objects.first()
+            self.assertEqual(manifest.status, LoadManifest.STATUS_PARTIAL)
+            self.assertEqual(manifest.error_count, 3)
+
+            # El mismo archivo se vuelve a cargar y esta vez se escriben las filas
+            out = StringIO()
+            call_command("load_spots", csv_path=self.csv_path, stdout=out)
+        self.assertNotIn("File unchanged since load", out.getvalue())
+        self.assertIn("Created: 2, Updated: 1, Unchanged: 0.", out.getvalue())
+        self.assertEqual(Spot.objects.count(), 2)
+        self.assertEqual(LoadManifest.objects.first().status, LoadManifest.STATUS_COMPLETED)
+
+
+class LoadSpotsParallelTest(TransactionTestCase):
+    # Los workers escriben con sus propias conexiones, fuera de la transacción de TestCase
+    def setUp(self):
+        self.csv_path = os.path.join(TEST_DATA_DIR, "test_lk_spots_parallel.csv")
+        with open(self.csv_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(LOAD_SPOTS_HEADER)
+            for spot_id in range(1000, 1040):
+                writer.writerow(
+                    [spot_id, "9", "1", "Col", f"Mpio {spot_id}", "State", "", "",
+                     "19.5", "-99.5", "100", "", str(spot_id * 10), "", "", "Rent", "", ""]
+                )
+            writer.writerow(
+                ["abc", "9", "1", "", "", "", "", "", "", "", "", "", "", "", "", "", "", ""]
+            )
+
+    def tearDown(self):
+        if os.path.exists(self.csv_path):
+            os.remove(self.csv_path)
+
+    def test_load_spots_workers(self):
+        for mode in ("orm", "copy"):
+            Spot.objects.all().delete()
+            out = StringIO()
+            call_command(
+                "load_spots",
+                csv_path=self.csv_path,
+                mode=mode,
+                workers=4,
+                batch_size=7,
+                force=True,
+                stdout=out,
+            )
+            output = out.getvalue()
+            self.assertIn("Loading 4 byte ranges with 4 workers.", output)
+            self.assertIn("Successfully processed 41 rows.", output)
+            self.assertIn("Created: 40, Updated: 0, Unchanged: 0. Invalid: 1.", output)
+            # Los números de fila siguen siendo los del archivo completo
+            self.assertIn("Skipping row 41: Invalid spot_id 'abc'", output)
+            self.assertEqual(Spot.objects.count(), 40)
+            self.assertEqual(
+                Spot.objects.get(spot_id=1039).spot_price_total_mxn_rent, 10390.0
+            )
+
+
+class SplitByteRangesTest(SimpleTestCase):
+    def setUp(self):
+        self.csv_path = os.path.join(TEST_DATA_DIR, "test_split_ranges.csv")
+        self.lines = [b"spot_id,name\n"] + [
+            b"%d,%s\n" % (i, b"x" * (i % 7)) for i in range(1, 101)
+        ]
+        with open(self.csv_path, "wb") as f:
+            f.writelines(self.lines)
+
+    def tearDown(self):
+        os.remove(self.csv_path)
+
+    def test_ranges_cover_rows_on_line_boundaries(self):
+        ranges = split_byte_ranges(self.csv_path, 6)
+        self.assertEqual(len(ranges), 6)
+        self.assertEqual(ranges[0][0], len(self.lines[0]))
+        self.assertEqual(ranges[-1][1], os.path.getsize(self.csv_path))
+        with open(self.csv_path, "rb") as f:
+            data = f.read()
+        rows = []
+        for (start, end, rows_before), following in zip(ranges, ranges[1:] + [None]):
+            if following:
+                self.assertEqual(end, following[0])
+            self.assertEqual(data[start - 1 : start], b"\n")
+            self.assertEqual(rows_before, len(rows))
+            rows.extend(data[start:end].splitlines(keepends=True))
+        self.assertEqual(rows, self.lines[1:])
+
+    def test_more_parts_than_rows(self):
+        with open(self.csv_path, "wb") as f:
+            f.writelines(self.lines[:3])
+        ranges = split_byte_ranges(self.csv_path, 8)
+        self.assertEqual([r[2] for r in ranges], list(range(len(ranges))))
+        self.assertLessEqual(len(ranges), 2)
+
 
 class LoadPropsCommandTest(TestCase):
     def setUp(self):
@@ -344,3 +583,383 @@ class LoadPropsCommandTest(TestCase):
                 # Asegurar que el directorio destino existe antes de mover de vuelta
                 os.makedirs(os.path.dirname(self.original_file_path), exist_ok=True)
                 shutil.move(self.backup_file_path, self.original_file_path)
+
+    @patch("spots.management.commands.load_props.Nominatim")
+    def test_load_props_command_ndjson(self, MockNominatim):
+        mock_location = MagicMock()
+        mock_location.latitude = 19.9
+        mock_location.longitude = -99.9
+        MockNominatim.return_value.geocode.side_effect = [
+            mock_location,
+            mock_location,
+            None,
+        ]
+
+        # Un objeto por línea en lugar de un arreglo JSON
+        ndjson_path = os.path.join(TEST_DATA_DIR, "test_props_list.ndjson")
+        with open(ndjson_path, "w", encoding="utf-8") as f:
+            for item in self.test_data:
+                f.write(json.dumps(item) + "\n")
+
+        try:
+            out = StringIO()
+            call_command("load_props", json_path=ndjson_path, stdout=out)
+
+            output = out.getvalue()
+            self.assertIn("Successfully processed 4 items.", output)
+            self.assertIn("Created: 2", output)
+            self.assertIn("Updated: 1", output)
+            self.assertIn("Skipped: 1", output)
+            self.assertEqual(Spot.objects.count(), 3)
+            self.assertEqual(
+                Spot.objects.get(public_id="EB-TEST01").spot_settlement,
+                "Col Test 1 Updated",
+            )
+        finally:
+            if os.path.exists(ndjson_path):
+                os.remove(ndjson_path)
+
+
+    @patch("spots.management.commands.load_props.Nominatim")
+    def test_load_props_geocode_cache(self, MockNominatim):
+        mock_location = MagicMock()
+        mock_location.latitude = 19.9
+        mock_location.longitude = -99.9
+        mock_geocode = MockNominatim.return_value.geocode
+        mock_geocode.side_effect = [mock_location, mock_location, None]
+
+        call_command(
+            "load_props", json_path=self.json_path, geocode_rate=1000, stdout=StringIO()
+        )
+        self.assertEqual(mock_geocode.call_count, 3)
+        self.assertEqual(GeocodeCacheEntry.objects.count(), 3)
+        self.assertFalse(
+            GeocodeCacheEntry.objects.get(location_key="invalid address string").found
+        )
+
+        # Segunda corrida forzada sobre el mismo archivo: todo sale del caché
+        # (incluido el negativo)
+        out = StringIO()
+        call_command("load_props", json_path=self.json_path, force=True, stdout=out)
+        output = out.getvalue()
+        self.assertEqual(mock_geocode.call_count, 3)
+        self.assertIn("Geocoder calls: 0, Cache hits: 3.", output)
+        self.assertIn("Geocoding Errors/Not Found: 1", output)
+        self.assertAlmostEqual(Spot.objects.get(public_id="EB-TEST01").location.y, 19.9)
+
+    @patch("spots.management.commands.load_props.Nominatim")
+    def test_load_props_geocode_cache_ttl(self, MockNominatim):
+        GeocodeCacheEntry.objects.create(
+            location_key="invalid address string",
+            query="Invalid Address String",
+            found=False,
+            updated_at=timezone.now() - timedelta(days=30),
+        )
+        mock_geocode = MockNominatim.return_value.geocode
+        mock_geocode.return_value = None
+
+        call_command(
+            "load_props",
+            json_path=self.json_path,
+            geocode_rate=1000,
+            geocode_negative_ttl_days=7,
+            stdout=StringIO(),
+        )
+        # La entrada negativa expiró, así que se vuelve a consultar
+        self.assertEqual(mock_geocode.call_count, 3)
+
+
+    @patch("spots.management.commands.load_props.Nominatim")
+    def test_load_props_gazetteer_geocoder(self, MockNominatim):
+        # Spots del CSV con los que se construye el gazetteer
+        Spot.objects.create(
+            spot_id=601,
+            spot_settlement="Col Test 1",
+            spot_municipality="Mpio Test 1",
+            spot_state="State Test 1",
+            spot_latitude=19.0,
+            spot_longitude=-99.0,
+        )
+        Spot.objects.create(
+            spot_id=602,
+            spot_settlement="Otra Colonia",
+            spot_municipality="Mpio Test 1",
+            spot_state="State Test 1",
+            spot_latitude=19.2,
+            spot_longitude=-99.2,
+        )
+
+        out = StringIO()
+        call_command(
+            "load_props", json_path=self.json_path, geocoder="gazetteer", stdout=out
+        )
+
+        MockNominatim.return_value.geocode.assert_not_called()
+        self.assertIn("Geocoding Errors/Not Found: 1", out.getvalue())
+        self.assertFalse(GeocodeCacheEntry.objects.exists())
+        # "Col Test 1 Updated" no existe: cae al centroide del municipio
+        spot = Spot.objects.get(public_id="EB-TEST01")
+        self.assertAlmostEqual(spot.location.y, 19.1)
+        self.assertAlmostEqual(spot.location.x, -99.1)
+        self.assertIsNone(Spot.objects.get(public_id="EB-TEST02").location)
+
+
+    def test_load_props_concurrent_geocoding_stub_server(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StubGeocoderHandler)
+        server.queries = []
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            out = StringIO()
+            call_command(
+                "load_props",
+                json_path=self.json_path,
+                geocoder_domain=f"127.0.0.1:{server.server_port}",
+                geocoder_scheme="http",
+                geocode_workers=4,
+                geocode_rate=100,
+                geocode_timeout=0.2,
+                stdout=out,
+            )
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        output = out.getvalue()
+        self.assertIn("Created: 2", output)
+        self.assertIn("Geocoder calls: 3", output)
+        self.assertIn("Geocoding Errors/Not Found: 1", output)
+        # La primera petición de EB-TEST01 excede el timeout y se reintenta
+        self.assertEqual(
+            server.queries.count("Col Test 1, Mpio Test 1, State Test 1"), 2
+        )
+        spot = Spot.objects.get(public_id="EB-TEST01")
+        self.assertAlmostEqual(spot.location.y, 19.5)
+        self.assertAlmostEqual(spot.location.x, -99.5)
+        self.assertIsNone(Spot.objects.get(public_id="EB-TEST02").location)
+
+
+    @patch("spots.management.commands.load_props.Nominatim")
+    def test_load_props_upsert_is_idempotent_and_uses_sequence(self, MockNominatim):
+        MockNominatim.return_value.geocode.return_value = None
+        # Sin public_id repetidos, para que una segunda corrida no tenga nada que aplicar
+        with open(self.json_path, "w", encoding="utf-8") as f:
+            json.dump(self.test_data[1:], f)
+        call_command(
+            "load_props", json_path=self.json_path, geocode_rate=1000, stdout=StringIO()
+        )
+
+        # Segunda corrida forzada sin cambios: no se escribe ninguna fila
+        out = StringIO()
+        call_command(
+            "load_props",
+            json_path=self.json_path,
+            geocode_rate=1000,
+            force=True,
+            stdout=out,
+        )
+        self.assertIn("Created: 0, Updated: 0, Unchanged: 2", out.getvalue())
+
+        # Un spot del CSV con ID mayor adelanta la secuencia
+        Spot.objects.create(spot_id=900, data_source="csv")
+        new_item_path = os.path.join(TEST_DATA_DIR, "test_props_new.json")
+        with open(new_item_path, "w", encoding="utf-8") as f:
+            json.dump([{"public_id": "EB-TEST03", "location": ""}], f)
+        try:
+            out = StringIO()
+            call_command("load_props", json_path=new_item_path, stdout=out)
+        finally:
+            os.remove(new_item_path)
+        self.assertIn("Created new spot with ID 901 for public_id EB-TEST03", out.getvalue())
+        self.assertEqual(Spot.objects.get(public_id="EB-TEST03").spot_id, 901)
+
+
+    @patch("spots.management.commands.load_props.Nominatim")
+    def test_load_props_skips_unchanged_file_and_items(self, MockNominatim):
+        mock_geocode = MockNominatim.return_value.geocode
+        mock_geocode.return_value = MagicMock(latitude=19.9, longitude=-99.9)
+        call_command(
+            "load_props", json_path=self.json_path, geocode_rate=1000, stdout=StringIO()
+        )
+        self.assertEqual(mock_geocode.call_count, 3)
+
+        out = StringIO()
+        call_command("load_props", json_path=self.json_path, stdout=out)
+        self.assertIn("File unchanged since load", out.getvalue())
+        self.assertEqual(mock_geocode.call_count, 3)
+
+        # Sólo cambia EB-TEST02: EB-TEST01 no se geocodifica ni se escribe de nuevo
+        self.test_data[2]["operations"][0]["amount"] = 900000
+        with open(self.json_path, "w", encoding="utf-8") as f:
+            json.dump(self.test_data[1:], f)
+        out = StringIO()
+        call_command(
+            "load_props", json_path=self.json_path, geocode_rate=1000, stdout=out
+        )
+        output = out.getvalue()
+        self.assertIn("Created: 0, Updated: 1, Unchanged: 1, Skipped: 1.", output)
+        self.assertEqual(mock_geocode.call_count, 3)  # La ubicación sale del caché
+        self.assertEqual(
+            Spot.objects.get(public_id="EB-TEST02").spot_price_total_mxn_sale, 900000.0
+        )
+        manifest = LoadManifest.objects.first()
+        self.assertEqual(manifest.command, "load_props")
+        self.assertEqual(manifest.status, LoadManifest.STATUS_COMPLETED)
+        self.assertEqual(manifest.updated_count, 1)
+        self.assertEqual(manifest.unchanged_count, 1)
+
+
+    @patch("spots.management.commands.load_props.Nominatim")
+    def test_load_props_retries_not_found_items(self, MockNominatim):
+        mock_geocode = MockNominatim.return_value.geocode
+        mock_geocode.return_value = None
+        call_command(
+            "load_props", json_path=self.json_path, geocode_rate=1000, stdout=StringIO()
+        )
+        self.assertEqual(mock_geocode.call_count, 3)
+        # Sin coordenadas no se guarda el hash y la carga queda parcial
+        self.assertIsNone(Spot.objects.get(public_id="EB-TEST02").content_hash)
+        manifest = LoadManifest.objects.first()
+        self.assertEqual(manifest.status, LoadManifest.STATUS_PARTIAL)
+        self.assertEqual(manifest.error_count, 3)
+
+        # Mismo archivo, con el negativo de EB-TEST02 ya expirado
+        GeocodeCacheEntry.objects.filter(
+            location_key="invalid address string"
+        ).update(updated_at=timezone.now() - timedelta(days=30))
+        out = StringIO()
+        call_command(
+            "load_props",
+            json_path=self.json_path,
+            geocode_rate=1000,
+            geocode_negative_ttl_days=7,
+            stdout=out,
+        )
+        self.assertNotIn("File unchanged since load", out.getvalue())
+        # EB-TEST02 no cambió en la fuente, pero se vuelve a geocodificar
+        self.assertEqual(mock_geocode.call_count, 4)
+        self.assertEqual(
+            mock_geocode.call_args_list[-1].args, ("Invalid Address String",)
+        )
+
+    @patch("spots.management.commands.load_props.Nominatim")
+    def test_load_props_refreshes_search_vectors(self, MockNominatim):
+        MockNominatim.return_value.geocode.return_value = None
+        self.test_data[0]["title"] = "Oficina en Polanco"
+        self.test_data[1]["title"] = "Bodega en Vallejo"  # Misma public_id: gana ésta
+        with open(self.json_path, "w", encoding="utf-8") as f:
+            json.dump(self.test_data, f)
+        call_command(
+            "load_props", json_path=self.json_path, geocode_rate=1000, stdout=StringIO()
+        )
+
+        # Todos los vectores se calculan al terminar, también el del spot 500
+        self.assertFalse(Spot.objects.filter(search_vector__isnull=True).exists())
+        matches = Spot.objects.filter(search_vector=spot_search_query("bodega"))
+        self.assertEqual(list(matches.values_list("public_id", flat=True)), ["EB-TEST01"])
+        self.assertFalse(
+            Spot.objects.filter(search_vector=spot_search_query("oficina")).exists()
+        )
+
+
+class StubGeocoderHandler(BaseHTTPRequestHandler):
+    """Minimal Nominatim /search stub: 'Invalid...' queries are not found."""
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query).get("q", [""])[0]
+        self.server.queries.append(query)
+        if query == "Col Test 1, Mpio Test 1, State Test 1":
+            if self.server.queries.count(query) == 1:
+                time.sleep(0.5)  # Forzar un GeocoderTimedOut en el primer intento
+        places = []
+        if not query.startswith("Invalid"):
+            places = [{"lat": "19.5", "lon": "-99.5", "display_name": query}]
+        body = json.dumps(places).encode("utf-8")
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # El cliente ya abandonó la petición por timeout
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TokenBucketTest(SimpleTestCase):
+    def test_paces_acquisitions(self):
+        bucket = TokenBucket(rate=50)
+        start = time.monotonic()
+        for _ in range(6):
+            bucket.acquire()
+        # La primera es inmediata; las otras 5 esperan 1/50 s cada una
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+
+class GazetteerGeocoderTest(SimpleTestCase):
+    def setUp(self):
+        self.gazetteer = GazetteerGeocoder(
+            [
+                ("Ciudad de México", "Álvaro Obregón", "San Ángel", 19.34, -99.19, 1),
+                ("Ciudad de México", "Álvaro Obregón", "Tizapán", 38.66, -198.40, 2),
+                ("Ciudad de México", "Coyoacán", "Del Carmen", 19.35, -99.16, 1),
+                ("Jalisco", "Zapopan", None, 20.72, -103.39, 1),
+            ]
+        )
+
+    def test_accent_and_case_insensitive(self):
+        location = self.gazetteer.geocode("san angel, alvaro obregon, CIUDAD DE MEXICO")
+        self.assertEqual(location.level, "settlement")
+        self.assertAlmostEqual(location.latitude, 19.34)
+
+    def test_fuzzy_match(self):
+        location = self.gazetteer.geocode("Tizapan, Alvaro Obregón, Cd de Mexico")
+        self.assertEqual(location.level, "settlement")
+        self.assertAlmostEqual(location.latitude, 19.33)
+
+    def test_falls_back_to_coarser_levels(self):
+        location = self.gazetteer.geocode("Desconocida, Álvaro Obregón, Ciudad de México")
+        self.assertEqual(location.level, "municipality")
+        self.assertAlmostEqual(location.latitude, (19.34 + 38.66) / 3)
+
+        location = self.gazetteer.geocode("Desconocida, Desconocido, Jalisco")
+        self.assertEqual(location.level, "state")
+        self.assertAlmostEqual(location.longitude, -103.39)
+
+        # Sin estado: el municipio se busca en todos los estados
+        self.assertEqual(self.gazetteer.geocode("Zapopan").level, "municipality")
+        self.assertIsNone(self.gazetteer.geocode("Nada, Nowhere, Atlantis"))
+
+
+class BenchmarkGeoJSONCommandTest(SimpleTestCase):
+    def test_reports_identical_output(self):
+        out = StringIO()
+        call_command("benchmark_geojson", rows=200, repeat=1, stdout=out)
+        self.assertIn("200 features", out.getvalue())
+        self.assertIn("identical output", out.getvalue())
+
+
+class GeocodingHelpersTest(SimpleTestCase):
+    def test_normalize_location_key(self):
+        self.assertEqual(
+            normalize_location_key("  Álvaro   Obregón ,Ciudad de México,CDMX "),
+            "alvaro obregon, ciudad de mexico, cdmx",
+        )
+        self.assertEqual(normalize_location_key(""), "")
+
+class IterJsonArrayTest(SimpleTestCase):
+    def test_yields_items_across_chunk_boundaries(self):
+        data = [{"public_id": f"EB-{i}", "location": "a, [b], {c}"} for i in range(20)]
+        text = json.dumps(data, indent=2)
+        for chunk_size in (1, 7, 4096):
+            items = list(iter_json_array(StringIO(text), chunk_size=chunk_size))
+            self.assertEqual(items, data)
+
+    def test_empty_array(self):
+        self.assertEqual(list(iter_json_array(StringIO(" [ ] "))), [])
+
+    def test_truncated_array_raises(self):
+        with self.assertRaises(json.JSONDecodeError):
+            list(iter_json_array(StringIO('[{"public_id": "EB-1"},'), chunk_size=4))
@@ -1,11 +1,36 @@
 # spots/tests.py
 
 import json
+import random
+import tempfile
+import time
+from unittest.mock import patch
+from django.conf import settings
 from django.urls import reverse
+from django.test import RequestFactory, SimpleTestCase, override_settings
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase
-from django.contrib.gis.geos import Point, Polygon
+from django.contrib.gis.geos import MultiPolygon, Point, Polygon
+from django.core.cache import caches
+from django.db import connection
+from django.contrib.gis import admin
+from .admin import SpotAdmin
+from .aggregates import refresh_price_aggregates
+from .cache import LRUFileBasedCache, response_digest
+from .loading import (
+    bump_data_version,
+    price_aggregates_stale,
+    refresh_search_vectors,
+    refresh_stale_price_aggregates,
+)
 from .models import Spot
+from .geojson import ValuesFeatureSerializer, gdal_coordinate, render_json
+from .management.commands.benchmark_geojson import synthetic_spots, values_rows
+from .search import search_text
+from .serializers import SpotSerializer
+from .snapshot import SpotSnapshot, clear_snapshot, sphere_distance
+from .streaming import feature_collection_chunks
 from django.db.models import Avg  # Para verificar el promedio
 
 
@@ -58,29 +83,45 @@ class SpotAPITests(APITestCase):
             spot_type_id=1,
             spot_created_date="2024-04-01",
         )
+        refresh_price_aggregates()
+
+    def setUp(self):
+        caches[settings.SPOTS_RESPONSE_CACHE].clear()
 
     # --- Pruebas de Listado, Filtrado, Ordenamiento y Paginación ---
 
     def test_list_spots_paginated(self):
-        """Verifica el listado y la paginación por defecto."""
+        """Verifica el listado y la paginación por cursor (sin COUNT)."""
         url = reverse("spot-list")
         response = self.client.get(url, format="json")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        # Asumiendo PAGE_SIZE=25 (o lo que configures), todos deberían estar en la primera página
-        self.assertEqual(response.data["count"], 4)
-        self.assertEqual(len(response.data["results"]), 4)
-        self.assertIn("next", response.data)  # Verifica claves de paginación
-        self.assertIn("previous", response.data)
+        # PAGE_SIZE=100: todos caben en la primera página
+        self.assertEqual(len(response.data["features"]), 4)
+        self.assertIsNone(response.data["next"])
+        self.assertNotIn("count", response.data)
+
+    def test_list_spots_cursor_pages(self):
+        """Verifica que las páginas sigan el orden por spot_id sin repetir."""
+        spot_ids = []
+        next_url = reverse("spot-list") + "?page_size=3"
+        while next_url:
+            response = self.client.get(next_url, format="json")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            spot_ids += [f["properties"]["spot_id"] for f in response.data["features"]]
+            next_url = response.data["next"]
+        self.assertEqual(spot_ids, [101, 102, 103, 104])
+
+        for query in ("?cursor=not-a-cursor", "?page_size=0", "?page_size=5000"):
+            response = self.client.get(reverse("spot-list") + query, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
     def test_filter_by_sector(self):
         """Verifica el filtrado por sector_id."""
         url = reverse("spot-list") + "?sector=9"
         response = self.client.get(url, format="json")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data["count"], 2)
         spot_ids = {
-            spot["properties"]["spot_id"]
-            for spot in response.data["results"]["features"]
+            spot["properties"]["spot_id"] for spot in response.data["features"]
         }
         self.assertEqual(spot_ids, {101, 103})
 
@@ -89,22 +130,78 @@ class SpotAPITests(APITestCase):
         url = reverse("spot-list") + "?municipality=test a"  # Minúsculas
         response = self.client.get(url, format="json")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data["count"], 2)
         spot_ids = {
-            spot["properties"]["spot_id"]
-            for spot in response.data["results"]["features"]
+            spot["properties"]["spot_id"] for spot in response.data["features"]
         }
         self.assertEqual(spot_ids, {101, 103})
 
+    def test_filter_text_without_accents(self):
+        """Verifica los filtros de texto sin acentos, por subcadena y difusos."""
+        Spot.objects.filter(spot_id=101).update(
+            spot_municipality="Álvaro Obregón", spot_settlement="Tizapán San Ángel"
+        )
+        Spot.objects.filter(spot_id=102).update(spot_corridor="Paseo de la Reforma")
+        cases = [
+            ("?municipality=alvaro obregon", {101}),
+            ("?municipality=OBREGÓN", {101}),
+            ("?settlement=san angel&state=state x", {101}),
+            ("?corridor=reforma", {102}),
+            ("?municipality=test_%25", set()),  # % y _ son literales
+            ("?municipality_fuzzy=alvaro obregn", {101}),
+            ("?state_fuzzy=stat z", {104}),
+        ]
+        for query, expected in cases:
+            response = self.client.get(reverse("spot-list") + query, format="json")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            spot_ids = {f["properties"]["spot_id"] for f in response.data["features"]}
+            self.assertEqual(spot_ids, expected, query)
+
+    def test_full_text_search(self):
+        """Verifica la búsqueda ?q= ordenada por relevancia y combinada con filtros."""
+        Spot.objects.filter(spot_id=101).update(spot_title="Oficina en Reforma")
+        Spot.objects.filter(spot_id=102).update(
+            spot_description="Oficina amplia con estacionamiento"
+        )
+        Spot.objects.filter(spot_id=103).update(spot_address="Av. Insurgentes Sur 1602")
+        refresh_search_vectors(Spot.objects.all())
+
+        url = reverse("spot-list")
+        response = self.client.get(url + "?q=oficina", format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        features = response.data["features"]
+        # El título pesa más que la descripción
+        self.assertEqual([f["properties"]["spot_id"] for f in features], [101, 102])
+        ranks = [f["properties"]["search_rank"] for f in features]
+        self.assertGreater(ranks[0], ranks[1])
+
+        # Sin acentos ni mayúsculas, con filtros y por páginas
+        response = self.client.get(url + "?q=OFÍCINA&sector=11", format="json")
+        self.assertEqual([f["id"] for f in response.data["features"]], [102])
+        response = self.client.get(url + "?q=oficina&page_size=1", format="json")
+        self.assertEqual([f["id"] for f in response.data["features"]], [101])
+        response = self.client.get(response.data["next"], format="json")
+        self.assertEqual([f["id"] for f in response.data["features"]], [102])
+        self.assertIsNone(response.data["next"])
+        expected = self.client.get(url + "?q=oficina&stream=1").streaming_content
+        response = self.client.get(url + "?q=oficina&assemble=db")
+        self.assertEqual(response.content, b"".join(expected))
+
+        # Búsqueda de frases de websearch_to_tsquery y filtro en nearby
+        response = self.client.get(url + '?q="insurgentes sur"', format="json")
+        self.assertEqual([f["id"] for f in response.data["features"]], [103])
+        response = self.client.get(
+            reverse("spot-nearby") + "?lat=19.2&lng=-99.2&radius=50000&q=oficina",
+            format="json",
+        )
+        self.assertEqual([f["id"] for f in response.data["features"]], [102, 101])
+
     def test_filter_combined(self):
         """Verifica el filtrado combinado."""
         url = reverse("spot-list") + "?sector=9&type=1"
         response = self.client.get(url, format="json")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data["count"], 1)
-        self.assertEqual(
-            response.data["results"]["features"][0]["properties"]["spot_id"], 101
-        )
+        self.assertEqual(len(response.data["features"]), 1)
+        self.assertEqual(response.data["features"][0]["properties"]["spot_id"], 101)
 
     def test_ordering_by_rent_desc(self):
         """Verifica el ordenamiento descendente por precio de renta."""
@@ -115,7 +212,7 @@ class SpotAPITests(APITestCase):
         # aquí verificamos los que tienen precio
         ids_ordered = [
             spot["properties"]["spot_id"]
-            for spot in response.data["results"]["features"]
+            for spot in response.data["features"]
         ]
         # Esperamos 102 (25k), 101 (15k), 103 (10k), posiblemente 104 (None) al final
         self.assertListEqual(ids_ordered[:3], [102, 101, 103])
@@ -127,10 +224,30 @@ class SpotAPITests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         ids_ordered = [
             spot["properties"]["spot_id"]
-            for spot in response.data["results"]["features"]
+            for spot in response.data["features"]
         ]
         self.assertListEqual(ids_ordered, [103, 101, 102, 104])  # 50, 100, 200, 300
 
+    def test_ordering_cursor_pages(self):
+        """Verifica la paginación por cursor con ordering, con los NULL al final."""
+        Spot.objects.create(spot_id=105, location=Point(-99.4, 19.4, srid=4326))
+        for ordering, expected in (
+            ("-spot_price_total_mxn_rent", [102, 101, 103, 104, 105]),
+            ("spot_price_total_mxn_rent", [103, 101, 102, 104, 105]),
+            ("-spot_id", [105, 104, 103, 102, 101]),
+        ):
+            spot_ids = []
+            next_url = reverse("spot-list") + f"?ordering={ordering}&page_size=1"
+            while next_url:
+                response = self.client.get(next_url, format="json")
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                spot_ids += [f["id"] for f in response.data["features"]]
+                next_url = response.data["next"]
+            self.assertEqual(spot_ids, expected, ordering)
+
+        response = self.client.get(reverse("spot-list") + "?ordering=spot_title")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     # --- Pruebas de Endpoints Específicos ---
 
     def test_spot_detail_found(self):
@@ -178,6 +295,74 @@ class SpotAPITests(APITestCase):
         self.assertIn(101, spot_ids)
         self.assertIn(103, spot_ids)
 
+    def test_nearby_spots_ordered_by_real_distance(self):
+        """Verifica que nearby ordene por distancia y la reporte en metros."""
+        url = reverse("spot-nearby")
+        response = self.client.get(
+            url + "?lng=-99.12&lat=19.12&radius=50000", format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        features = response.data["features"]
+        self.assertEqual(
+            [f["properties"]["spot_id"] for f in features], [101, 103, 102, 104]
+        )
+        distances = [f["properties"]["distance"] for f in features]
+        self.assertEqual(distances, sorted(distances))
+        # spot1 (-99.1, 19.1) está a ~3.06 km del punto
+        self.assertAlmostEqual(distances[0], 3060, delta=30)
+        self.assertLess(distances[-1], 50000)
+
+    def test_nearby_k_nearest(self):
+        """Verifica el modo k vecinos más cercanos, sin radio."""
+        url = reverse("spot-nearby")
+        response = self.client.get(url + "?lng=-99.12&lat=19.12&k=2", format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        features = response.data["features"]
+        self.assertEqual([f["properties"]["spot_id"] for f in features], [101, 103])
+        self.assertAlmostEqual(features[1]["properties"]["distance"], 4589, delta=45)
+
+    def test_nearby_k_nearest_with_cap_and_filters(self):
+        """El tope de distancia y los filtros de SpotFilter aplican antes del límite k."""
+        url = reverse("spot-nearby")
+        response = self.client.get(
+            url + "?lng=-99.12&lat=19.12&k=3&sector=11", format="json"
+        )
+        self.assertEqual(
+            [f["properties"]["spot_id"] for f in response.data["features"]], [102, 104]
+        )
+        response = self.client.get(
+            url + "?lng=-99.12&lat=19.12&k=3&sector=11&radius=20000", format="json"
+        )
+        self.assertEqual(
+            [f["properties"]["spot_id"] for f in response.data["features"]], [102]
+        )
+
+    def test_nearby_pages_follow_distance(self):
+        """Verifica que las páginas de nearby sigan (distancia, spot_id) y respeten k."""
+        url = reverse("spot-nearby") + "?lng=-99.12&lat=19.12&radius=50000&page_size=3"
+        response = self.client.get(url, format="json")
+        ids = [f["properties"]["spot_id"] for f in response.data["features"]]
+        response = self.client.get(response.data["next"], format="json")
+        ids += [f["properties"]["spot_id"] for f in response.data["features"]]
+        self.assertEqual(ids, [101, 103, 102, 104])
+        self.assertIsNone(response.data["next"])
+
+        url = reverse("spot-nearby") + "?lng=-99.12&lat=19.12&k=3&page_size=2"
+        response = self.client.get(url, format="json")
+        self.assertEqual(len(response.data["features"]), 2)
+        response = self.client.get(response.data["next"], format="json")
+        self.assertEqual(
+            [f["properties"]["spot_id"] for f in response.data["features"]], [102]
+        )
+        self.assertIsNone(response.data["next"])
+
+    def test_nearby_invalid_k(self):
+        url = reverse("spot-nearby")
+        for k in ("0", "-1", "abc", "100000"):
+            response = self.client.get(url + f"?lng=-99.12&lat=19.12&k={k}", format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn("error", response.data)
+
     def test_within_polygon(self):
         """Verifica la búsqueda de spots dentro de un polígono."""
         url = reverse("spot-within")
@@ -215,6 +400,231 @@ class SpotAPITests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data["features"]), 0)
 
+    def test_within_multipolygon(self):
+        """Verifica within con un MultiPolygon (spot1 y spot4 en partes distintas)."""
+        url = reverse("spot-within")
+        data = {
+            "polygon": {
+                "type": "MultiPolygon",
+                "coordinates": [
+                    [[[-99.11, 19.09], [-99.09, 19.09], [-99.09, 19.11], [-99.11, 19.11], [-99.11, 19.09]]],
+                    [[[-99.31, 19.29], [-99.29, 19.29], [-99.29, 19.31], [-99.31, 19.31], [-99.31, 19.29]]],
+                ],
+            }
+        }
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [f["properties"]["spot_id"] for f in response.data["features"]], [101, 104]
+        )
+
+    def test_within_bbox(self):
+        """Verifica el parámetro bbox, en el cuerpo o en la URL, solo o con polígono."""
+        url = reverse("spot-within")
+        response = self.client.post(url, {"bbox": [-99.21, 19.09, -99.09, 19.21]}, format="json")
+        self.assertEqual(
+            [f["properties"]["spot_id"] for f in response.data["features"]], [101, 102, 103]
+        )
+        response = self.client.post(url + "?bbox=-99.16,19.14,-99.14,19.16", {}, format="json")
+        self.assertEqual(
+            [f["properties"]["spot_id"] for f in response.data["features"]], [103]
+        )
+        polygon = {
+            "type": "Polygon",
+            "coordinates": [[[-99.5, 19.0], [-99.0, 19.0], [-99.0, 19.5], [-99.5, 19.5], [-99.5, 19.0]]],
+        }
+        response = self.client.post(
+            url, {"polygon": polygon, "bbox": "-99.21,19.09,-99.12,19.21"}, format="json"
+        )
+        self.assertEqual(
+            [f["properties"]["spot_id"] for f in response.data["features"]], [102, 103]
+        )
+
+    def test_within_pagination(self):
+        """Verifica que within pagine por spot_id con un cursor."""
+        url = reverse("spot-within")
+        data = {"bbox": [-100, 19, -99, 20]}
+        spot_ids = []
+        next_url = url + "?page_size=3"
+        while next_url:
+            response = self.client.post(next_url, data, format="json")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            spot_ids += [f["properties"]["spot_id"] for f in response.data["features"]]
+            next_url = response.data["next"]
+        self.assertEqual(spot_ids, [101, 102, 103, 104])
+
+    def test_within_invalid_input(self):
+        url = reverse("spot-within")
+        point = {"type": "Point", "coordinates": [-99.1, 19.1]}
+        for data in ({}, {"polygon": point}, {"bbox": [1, 2, 3]}, {"bbox": [3, 2, 1, 4]}):
+            response = self.client.post(url, data, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(
+            url + "?cursor=not-a-cursor", {"bbox": [-100, 19, -99, 20]}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_fast_path_same_bytes(self):
+        """Verifica que el listado sobre values() responda lo mismo que el serializer."""
+        response = self.client.get(reverse("spot-list"), format="json")
+        data = SpotSerializer(Spot.objects.order_by("spot_id"), many=True).data
+        data["next"] = None
+        self.assertEqual(response.content, JSONRenderer().render(data))
+
+    def test_sparse_fieldsets(self):
+        """Verifica ?fields= y ?omit= en el listado, el detalle y top-rent."""
+        response = self.client.get(
+            reverse("spot-list") + "?fields=location,spot_price_total_mxn_rent",
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        feature = response.data["features"][0]
+        self.assertEqual(feature["id"], 101)
+        self.assertEqual(feature["geometry"]["coordinates"], [-99.1, 19.1])
+        self.assertEqual(feature["properties"], {"spot_price_total_mxn_rent": 15000.0})
+
+        url = reverse("spot-detail", kwargs={"spot_id": 102})
+        response = self.client.get(url + "?omit=location,spot_description", format="json")
+        self.assertIsNone(response.data["geometry"])
+        self.assertNotIn("spot_description", response.data["properties"])
+        self.assertEqual(response.data["properties"]["spot_municipality"], "Test B")
+
+        # El orden de top-rent sigue funcionando aunque se omita la renta
+        url = reverse("spot-top-rent") + "?omit=spot_price_total_mxn_rent&page_size=1"
+        response = self.client.get(url, format="json")
+        response = self.client.get(response.data["next"], format="json")
+        self.assertEqual(response.data["features"][0]["id"], 101)
+
+        response = self.client.get(reverse("spot-list") + "?fields=nope", format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_stream(self):
+        """Verifica que ?stream=1 emita la misma FeatureCollection completa."""
+        url = reverse("spot-list") + "?sector=9"
+        expected = self.client.get(url, format="json")
+        response = self.client.get(url + "&stream=1", format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        data = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(data["type"], "FeatureCollection")
+        self.assertEqual(data["features"], json.loads(expected.content)["features"])
+
+    def test_within_stream(self):
+        """Verifica el modo streaming de within, sin paginar."""
+        url = reverse("spot-within") + "?stream=1&page_size=1"
+        response = self.client.post(url, {"bbox": [-100, 19, -99, 20]}, format="json")
+        self.assertTrue(response.streaming)
+        data = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(
+            [f["properties"]["spot_id"] for f in data["features"]], [101, 102, 103, 104]
+        )
+
+    def test_database_assembly_same_bytes(self):
+        """Verifica que ?assemble=db arme en PostgreSQL los mismos bytes que Python."""
+        Spot.objects.filter(spot_id=102).update(
+            spot_title='Local "Ñandú"\n ', spot_area_in_sqm=1e16 + 2
+        )
+        Spot.objects.filter(spot_id=103).update(
+            location=Point(-99.15000000000001, 19.15, srid=4326)
+        )
+        Spot.objects.filter(spot_id=104).update(location=None)
+        for url in (
+            reverse("spot-list") + "?sector=11",
+            reverse("spot-list") + "?fields=location,spot_created_date",
+            reverse("spot-list") + "?omit=location",
+            reverse("spot-list") + "?fields=spot_id",
+        ):
+            expected = b"".join(self.client.get(url + "&stream=1").streaming_content)
+            response = self.client.get(url + "&assemble=db")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response["Content-Type"], "application/json")
+            self.assertEqual(response.content, expected)
+
+        # Las funciones fijan extra_float_digits: no dependen de la sesión
+        url = reverse("spot-list") + "?sector=11"
+        expected = b"".join(self.client.get(url + "&stream=1").streaming_content)
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL extra_float_digits = 0")
+        response = self.client.get(url + "&assemble=db")
+        self.assertEqual(response.content, expected)
+
+        url = reverse("spot-within")
+        body = {"bbox": [-100, 19, -99, 20]}
+        expected = self.client.post(url + "?stream=1", body, format="json")
+        response = self.client.post(url + "?assemble=db", body, format="json")
+        self.assertEqual(response.content, b"".join(expected.streaming_content))
+
+        url = reverse("spot-nearby") + "?lat=19.1&lng=-99.1&k=2"
+        expected = self.client.get(url, format="json").data
+        response = self.client.get(url + "&assemble=db")
+        self.assertEqual(json.loads(response.content)["features"], expected["features"])
+
+        response = self.client.get(reverse("spot-nearby") + "?assemble=db")
+        self.assertEqual(json.loads(response.content)["features"], [])
+
+    def test_vector_tiles(self):
+        """Verifica los tiles MVT, sus atributos y la caché por versión de datos."""
+        caches["default"].clear()
+        # z=10: 101 cae en el tile 230/456, 102-104 en 229/456
+        url = reverse("spot-tile", kwargs={"z": 10, "x": 229, "y": 456})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/vnd.mapbox-vector-tile")
+        self.assertIn(b"spots", response.content)
+        self.assertIn(b"spot_price_total_mxn_rent", response.content)
+        self.assertNotIn(b"spot_municipality", response.content)
+
+        response = self.client.get(url + "?attributes=spot_sector_id&sector=11")
+        self.assertIn(b"spot_sector_id", response.content)
+        self.assertNotIn(b"spot_price_total_mxn_rent", response.content)
+
+        empty = reverse("spot-tile", kwargs={"z": 10, "x": 0, "y": 0})
+        self.assertEqual(self.client.get(empty).content, b"")
+
+        # En caché sólo se consulta la versión; una carga nueva invalida el tile
+        with self.assertNumQueries(1):
+            self.client.get(url)
+        bump_data_version()
+        with self.assertNumQueries(2):
+            self.client.get(url)
+
+        for query in ("?attributes=spot_title", "?sector=x"):
+            response = self.client.get(url + query)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse("spot-tile", kwargs={"z": 3, "x": 8, "y": 0}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_clusters(self):
+        """Verifica los clusters por celda de malla según el zoom."""
+        url = reverse("spot-clusters")
+        response = self.client.get(url + "?bbox=-100,19,-99,20&zoom=0")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        (cluster,) = response.data["features"]
+        self.assertEqual(cluster["properties"]["count"], 4)
+        self.assertEqual(cluster["properties"]["rent_min"], 10000.0)
+        self.assertEqual(cluster["properties"]["rent_max"], 25000.0)
+        self.assertAlmostEqual(cluster["properties"]["rent_avg"], 50000.0 / 3)
+        self.assertAlmostEqual(cluster["geometry"]["coordinates"][0], -99.1875)
+
+        # zoom 8: celdas de 0.3515625°; 101 queda sola en su celda
+        response = self.client.get(url + "?bbox=-100,19,-99,20&zoom=8")
+        counts = {
+            tuple(f["properties"]["cell"]): f["properties"]["count"]
+            for f in response.data["features"]
+        }
+        self.assertEqual(counts, {(-283, 54): 3, (-282, 54): 1})
+        response = self.client.get(url + "?bbox=-100,19,-99,20&zoom=8&sector=9")
+        self.assertEqual(len(response.data["features"]), 2)
+
+        for query in (
+            "",
+            "?bbox=-100,19,-99,20",
+            "?bbox=-180,-90,180,90&zoom=22",
+            "?bbox=1,2&zoom=3",
+        ):
+            response = self.client.get(url + query)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_average_price_by_sector(self):
         """Verifica el cálculo del precio promedio por sector."""
         url = reverse("spot-avg-price")
@@ -233,6 +643,122 @@ class SpotAPITests(APITestCase):
         self.assertAlmostEqual(results[9], expected_avg_sector_9, places=2)
         self.assertAlmostEqual(results[11], expected_avg_sector_11, places=2)
 
+    @override_settings(SPOTS_DATA_VERSION_CHECK_INTERVAL=0)
+    def test_response_cache(self):
+        """Verifica la caché de respuestas, el ETag y el 304 por versión de datos."""
+        url = reverse("spot-list") + "?sector=9&type=1"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response["ETag"]
+
+        # Mismos parámetros en otro orden: sólo se consulta la versión
+        with self.assertNumQueries(1):
+            cached = self.client.get(reverse("spot-list") + "?type=1&sector=9")
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(cached["ETag"], etag)
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+
+        # Una carga nueva cambia la llave: se vuelve a consultar la base
+        Spot.objects.filter(spot_id=101).update(spot_type_id=2)
+        bump_data_version()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.data["features"], [])
+
+        # Entre revisiones de la versión, el 304 no llega a PostgreSQL
+        with override_settings(SPOTS_DATA_VERSION_CHECK_INTERVAL=60):
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Los errores no se guardan ni llevan ETag
+        response = self.client.get(reverse("spot-detail", kwargs={"spot_id": 9999}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn("ETag", response)
+
+    def test_price_stats(self):
+        """Verifica las estadísticas precalculadas por dimensión."""
+        url = reverse("spot-price-stats")
+        response = self.client.get(url + "?group_by=sector", format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item["sector"] for item in response.data], [9, 11])
+        sector_9 = response.data[0]
+        self.assertEqual(sector_9["spot_count"], 2)
+        self.assertEqual(sector_9["rent"]["count"], 2)
+        self.assertAlmostEqual(sector_9["rent"]["mean"], 12500.0)
+        self.assertEqual(sector_9["rent"]["min"], 10000.0)
+        self.assertEqual(sector_9["rent"]["max"], 15000.0)
+        self.assertAlmostEqual(sector_9["rent"]["p50"], 12500.0)
+        self.assertAlmostEqual(sector_9["rent"]["p90"], 14500.0)
+        self.assertEqual(sector_9["sale"]["count"], 0)
+        self.assertIsNone(sector_9["sale"]["mean"])
+        self.assertEqual(response.data[1]["rent"]["count"], 1)  # 104 sin renta
+
+        # Sin agrupar: un solo grupo con todos los spots
+        response = self.client.get(url, format="json")
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]["spot_count"], 4)
+        self.assertNotIn("sector", response.data[0])
+
+        # Filtrar por una dimensión también agrupa por ella
+        response = self.client.get(url + "?group_by=type&municipality=Test A", format="json")
+        self.assertEqual(
+            [(item["type"], item["municipality"]) for item in response.data],
+            [(1, "Test A"), (2, "Test A")],
+        )
+        self.assertEqual(response.data[1]["rent"]["max"], 10000.0)
+
+        for query in ("?group_by=region", "?sector=nine"):
+            response = self.client.get(url + query, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(
+        SPOTS_DATA_VERSION_CHECK_INTERVAL=0,
+        SPOTS_PRICE_AGGREGATES_IN_BACKGROUND=False,
+    )
+    def test_admin_edit_refreshes_price_stats(self):
+        """Verifica que editar o borrar en el admin recalcula las estadísticas después del commit."""
+        url = reverse("spot-price-stats") + "?group_by=sector"
+        spot_admin = SpotAdmin(Spot, admin.site)
+        self.spot3.spot_price_total_mxn_rent = 20000.0
+        with self.captureOnCommitCallbacks() as callbacks:
+            spot_admin.save_model(None, self.spot3, None, True)
+        # En la transacción sólo se actualiza el vector; las estadísticas quedan desfasadas
+        self.assertTrue(
+            Spot.objects.filter(pk=103, search_vector__isnull=False).exists()
+        )
+        self.assertTrue(price_aggregates_stale())
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertFalse(price_aggregates_stale())
+        response = self.client.get(url, format="json")
+        self.assertAlmostEqual(response.data[0]["rent"]["mean"], 17500.0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            spot_admin.delete_queryset(None, Spot.objects.filter(spot_sector_id=11))
+        response = self.client.get(url, format="json")
+        self.assertEqual([item["sector"] for item in response.data], [9])
+
+    def test_stale_price_aggregates_rebuilt_until_current(self):
+        """Verifica que un cambio durante el recálculo provoca otra pasada."""
+        bump_data_version()
+        calls = []
+
+        def rebuild():
+            calls.append(len(calls))
+            if len(calls) == 1:
+                bump_data_version()  # Edición que llega durante el recálculo
+            refresh_price_aggregates()
+
+        with patch("spots.loading.refresh_price_aggregates", side_effect=rebuild):
+            self.assertEqual(refresh_stale_price_aggregates(), 2)
+        self.assertFalse(price_aggregates_stale())
+        self.assertEqual(refresh_stale_price_aggregates(), 0)
+
     def test_top_rent(self):
         """Verifica el ranking por precio de renta con límite."""
         url = reverse("spot-top-rent") + "?limit=2"
@@ -246,3 +772,302 @@ class SpotAPITests(APITestCase):
         self.assertEqual(
             response.data["features"][1]["properties"]["spot_id"], 101
         )  # 15k
+
+    def test_top_rent_group_by(self):
+        """Verifica los líderes de renta de cada grupo en una sola respuesta."""
+        url = reverse("spot-top-rent")
+        response = self.client.get(url + "?limit=1&group_by=sector", format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        spot_ids = [f["properties"]["spot_id"] for f in response.data["features"]]
+        self.assertEqual(spot_ids, [101, 102])  # Sector 9 y sector 11
+        self.assertIsNone(response.data["next"])
+
+        # Por tipo: los dos primeros del tipo 1 y el único con renta del tipo 2
+        response = self.client.get(
+            url + "?limit=2&group_by=type&fields=location", format="json"
+        )
+        self.assertEqual([f["id"] for f in response.data["features"]], [102, 101, 103])
+        self.assertEqual(response.data["features"][0]["properties"], {})
+
+        for query in ("?group_by=region", "?group_by=sector&limit=1000"):
+            response = self.client.get(url + query, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_top_rent_pages(self):
+        """Verifica las páginas del ranking con empates resueltos por spot_id."""
+        Spot.objects.filter(spot_id=103).update(spot_price_total_mxn_rent=15000.0)
+        url = reverse("spot-top-rent") + "?limit=3&page_size=2"
+        response = self.client.get(url, format="json")
+        ids = [f["properties"]["spot_id"] for f in response.data["features"]]
+        response = self.client.get(response.data["next"], format="json")
+        ids += [f["properties"]["spot_id"] for f in response.data["features"]]
+        self.assertEqual(ids, [102, 101, 103])
+        self.assertIsNone(response.data["next"])
+
+
+def random_spots(count, seed=7):
+    """Spots aleatorios alrededor de la CDMX: (spot_id, lng, lat, sector, type, municipio)."""
+    rng = random.Random(seed)
+    return [
+        (
+            1000 + i,
+            round(rng.uniform(-99.4, -98.9), 6),
+            round(rng.uniform(19.2, 19.6), 6),
+            rng.choice([9, 11, None]),
+            rng.choice([1, 2]),
+            rng.choice(["Álvaro Obregón", "Benito Juárez", "Coyoacán", None]),
+        )
+        for i in range(count)
+    ]
+
+
+class SpotSnapshotTest(SimpleTestCase):
+    def setUp(self):
+        self.spots = random_spots(2000)
+        self.snapshot = SpotSnapshot(1, *zip(*self.spots), cell_size=0.02)
+
+    def brute_force(self, lng, lat, filters=None):
+        ranked = []
+        for spot_id, x, y, sector, type_id, municipality in self.spots:
+            if filters and filters.get("sector") is not None and sector != filters["sector"]:
+                continue
+            if filters and filters.get("municipality") and not (
+                municipality
+                and search_text(filters["municipality"]) in search_text(municipality)
+            ):
+                continue
+            ranked.append((sphere_distance(lng, lat, x, y), spot_id))
+        return sorted(ranked)
+
+    def test_sphere_distance_matches_postgis_sphere(self):
+        self.assertAlmostEqual(sphere_distance(-99.12, 19.12, -99.1, 19.1), 3059.64, places=2)
+
+    def test_radius_matches_brute_force(self):
+        expected = [s for d, s in self.brute_force(-99.15, 19.4) if d <= 5000]
+        result = self.snapshot.radius(-99.15, 19.4, 5000)
+        self.assertEqual([spot_id for spot_id, _ in result], expected)
+        distances = [d for _, d in result]
+        self.assertEqual(distances, sorted(distances))
+        self.assertTrue(all(d <= 5000 for d in distances))
+
+    def test_nearest_with_filters_and_cap(self):
+        filters = {"sector": 9, "municipality": "juárez"}
+        expected = self.brute_force(-99.15, 19.4, filters)
+        result = self.snapshot.nearest(-99.15, 19.4, 15, filters=filters)
+        self.assertEqual([s for s, _ in result], [s for _, s in expected[:15]])
+        capped = self.snapshot.nearest(-99.15, 19.4, 15, max_distance=2000, filters=filters)
+        self.assertEqual([s for s, _ in capped], [s for d, s in expected[:15] if d <= 2000])
+
+    def test_nearest_far_from_all_points(self):
+        result = self.snapshot.nearest(0.0, 0.0, 3)
+        self.assertEqual([s for s, _ in result], [s for _, s in self.brute_force(0.0, 0.0)[:3]])
+
+    def test_within_matches_geos(self):
+        outer = [(-99.3, 19.25), (-99.0, 19.3), (-99.05, 19.55), (-99.35, 19.5), (-99.3, 19.25)]
+        hole = [(-99.2, 19.35), (-99.1, 19.35), (-99.1, 19.45), (-99.2, 19.45), (-99.2, 19.35)]
+        polygon = Polygon(outer, hole, srid=4326)
+        other = Polygon.from_bbox((-99.4, 19.55, -99.36, 19.6))
+        multipolygon = MultiPolygon(polygon, other, srid=4326)
+        for geometry in (polygon, multipolygon):
+            expected = sorted(
+                spot_id
+                for spot_id, x, y, *_ in self.spots
+                if geometry.contains(Point(x, y, srid=4326))
+            )
+            self.assertEqual(self.snapshot.within(geometry), expected)
+
+    def test_within_bbox_uses_float4_boxes(self):
+        # El punto queda 1e-9 grados fuera de la caja, pero @ compara cajas float4
+        snapshot = SpotSnapshot(1, [1, 2], [-99.1 - 1e-9, -98.0], [19.1, 19.1])
+        self.assertEqual(snapshot.within(bbox=(-99.1, 19.0, -99.0, 19.2)), [1])
+        self.assertEqual(snapshot.within(bbox=(-99.2, 19.0, -98.5, 19.2)), [1])
+
+    def test_within_excludes_boundary(self):
+        snapshot = SpotSnapshot(1, [1, 2, 3, 4], [0.0, 1.0, 0.5, 2.0], [0.0, 0.5, 0.5, 2.0])
+        square = Polygon.from_bbox((0.0, 0.0, 1.0, 1.0))
+        # Vértice y arista no cuentan, como ST_Within
+        self.assertEqual(snapshot.within(square), [3])
+
+
+class GeoJSONFastPathTest(SimpleTestCase):
+    """El camino rápido sobre values() debe producir los mismos bytes."""
+
+    def setUp(self):
+        self.spots = synthetic_spots(300)
+        self.features = ValuesFeatureSerializer(SpotSerializer)
+        self.rows = values_rows(self.features, self.spots)
+        self.expected = JSONRenderer().render(SpotSerializer(self.spots, many=True).data)
+
+    def test_values_feature_serializer_same_bytes(self):
+        self.assertEqual(
+            render_json(self.features.feature_collection(self.rows)), self.expected
+        )
+
+    def test_fields_and_omit(self):
+        features = ValuesFeatureSerializer(
+            SpotSerializer, fields=["location", "spot_price_total_mxn_rent", "spot_title"],
+            omit=["spot_title"], extra=["spot_id", "spot_area_in_sqm"],
+        )
+        self.assertEqual(
+            features.columns,
+            ["spot_id", "spot_price_total_mxn_rent", "spot_area_in_sqm", "geometry_x", "geometry_y"],
+        )
+        row = values_rows(ValuesFeatureSerializer(SpotSerializer), self.spots[:1])[0]
+        feature = features.to_representation(
+            (row.spot_id, row.spot_price_total_mxn_rent, row.spot_area_in_sqm, row.geometry_x, row.geometry_y)
+        )
+        expected = SpotSerializer(self.spots[0]).data
+        self.assertEqual(feature["geometry"], expected["geometry"])
+        self.assertEqual(
+            feature["properties"],
+            {"spot_price_total_mxn_rent": expected["properties"]["spot_price_total_mxn_rent"]},
+        )
+
+        features = ValuesFeatureSerializer(SpotSerializer, omit=["location"])
+        self.assertNotIn("geometry_x", features.columns)
+        with self.assertRaisesMessage(ValueError, "Unknown fields: nope."):
+            ValuesFeatureSerializer(SpotSerializer, fields=["spot_id", "nope"])
+
+    def test_gdal_coordinate_matches_geojson(self):
+        # Valores con colas 00000x / 99999x que GDAL redondea al escribir
+        values = [17.457086853999996, 27.83053066399999, -99.1, 19.0, 12345.000000011]
+        rng = random.Random(3)
+        for _ in range(2000):
+            base = round(rng.uniform(-180, 180), rng.randint(0, 9))
+            values.append(base + rng.choice([-1, 1]) * rng.randint(1, 50) * 1e-14)
+            values.append(rng.uniform(-180, 180))
+        for value in values:
+            expected = json.loads(Point(value, 0.0).geojson)["coordinates"][0]
+            self.assertEqual(gdal_coordinate(value), expected, repr(value))
+
+    def test_streamed_chunks_same_bytes(self):
+        for buffer_size in (1, 1000, 10**6):
+            chunks = feature_collection_chunks(
+                map(self.features.to_representation, self.rows), buffer_size
+            )
+            self.assertEqual(b"".join(chunks), self.expected)
+        self.assertEqual(
+            b"".join(feature_collection_chunks([])),
+            JSONRenderer().render(SpotSerializer([], many=True).data),
+        )
+
+
+class ResponseDigestTest(SimpleTestCase):
+    @override_settings(ALLOWED_HOSTS=["a.example", "b.example"])
+    def test_depends_on_origin(self):
+        def digest(query, host="a.example", **extra):
+            request = RequestFactory().get("/api/spots/" + query, HTTP_HOST=host, **extra)
+            return response_digest(request, 1)
+
+        self.assertEqual(digest("?sector=9&type=1"), digest("?type=1&sector=9"))
+        # Los links de paginación son absolutos: otro host u otro esquema es otra llave
+        self.assertNotEqual(digest("?sector=9", host="b.example"), digest("?sector=9"))
+        self.assertNotEqual(digest("?sector=9", secure=True), digest("?sector=9"))
+
+
+class LRUFileBasedCacheTest(SimpleTestCase):
+    def test_culls_least_recently_used(self):
+        with tempfile.TemporaryDirectory() as location:
+            cache = LRUFileBasedCache(
+                location, {"OPTIONS": {"MAX_ENTRIES": 3, "CULL_FREQUENCY": 3}}
+            )
+            for key in ("a", "b", "c"):
+                cache.set(key, key)
+                time.sleep(0.01)
+            self.assertEqual(cache.get("a"), "a")  # "b" queda como el más viejo
+            time.sleep(0.01)
+            cache.set("d", "d")
+            self.assertIsNone(cache.get("b"))
+            self.assertEqual([cache.get(key) for key in "acd"], ["a", "c", "d"])
+            self.assertEqual(cache.get("b", "missing"), "missing")
+
+
+@override_settings(SPOTS_SPATIAL_SNAPSHOT=True, SPOTS_SNAPSHOT_CHECK_INTERVAL=0)
+class SpotSnapshotAPITests(APITestCase):
+    """El snapshot en memoria debe responder lo mismo que PostGIS."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Spot.objects.bulk_create(
+            Spot(
+                spot_id=spot_id,
+                location=Point(x, y, srid=4326),
+                spot_sector_id=sector,
+                spot_type_id=type_id,
+                spot_municipality=municipality,
+            )
+            for spot_id, x, y, sector, type_id, municipality in random_spots(300)
+        )
+
+    def setUp(self):
+        clear_snapshot()
+
+    def tearDown(self):
+        clear_snapshot()
+
+    def assertSameAsPostgis(self, method, url, data=None):
+        with override_settings(SPOTS_SPATIAL_SNAPSHOT=False):
+            expected = getattr(self.client, method)(url, data, format="json")
+        # Espía las consultas al snapshot: la segunda respuesta debe salir de él
+        used = []
+
+        def spy(name):
+            method = getattr(SpotSnapshot, name)
+
+            def wrapper(snapshot, *args, **kwargs):
+                used.append(name)
+                return method(snapshot, *args, **kwargs)
+
+            return wrapper
+
+        with patch.multiple(
+            SpotSnapshot, nearest=spy("nearest"), radius=spy("radius"), within=spy("within")
+        ):
+            response = getattr(self.client, method)(url, data, format="json")
+        self.assertTrue(used, "the snapshot was not used")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, expected.content)
+        return response
+
+    def test_nearby_radius(self):
+        response = self.assertSameAsPostgis(
+            "get", reverse("spot-nearby") + "?lng=-99.15&lat=19.4&radius=4000"
+        )
+        self.assertGreater(len(response.data["features"]), 0)
+
+    def test_nearby_k_with_filters(self):
+        url = reverse("spot-nearby")
+        self.assertSameAsPostgis("get", url + "?lng=-99.15&lat=19.4&k=25&sector=9")
+        self.assertSameAsPostgis(
+            "get", url + "?lng=-99.15&lat=19.4&k=25&radius=3000&municipality=juárez"
+        )
+
+    def test_nearby_pages(self):
+        url = reverse("spot-nearby") + "?lng=-99.15&lat=19.4&k=70&page_size=25"
+        while url:
+            response = self.assertSameAsPostgis("get", url)
+            url = response.data["next"]
+
+    def test_within_multipolygon_bbox_and_pages(self):
+        multipolygon = {
+            "type": "MultiPolygon",
+            "coordinates": [
+                [[[-99.3, 19.25], [-99.0, 19.3], [-99.05, 19.55], [-99.3, 19.25]]],
+                [[[-99.4, 19.2], [-99.3, 19.2], [-99.3, 19.3], [-99.4, 19.3], [-99.4, 19.2]]],
+            ],
+        }
+        url = reverse("spot-within") + "?page_size=20"
+        data = {"polygon": multipolygon, "bbox": [-99.35, 19.2, -99.05, 19.5]}
+        while url:
+            response = self.assertSameAsPostgis("post", url, data)
+            url = response.data["next"]
+
+    def test_within(self):
+        polygon = {
+            "type": "Polygon",
+            "coordinates": [[[-99.3, 19.25], [-99.0, 19.3], [-99.05, 19.55], [-99.3, 19.25]]],
+        }
+        response = self.assertSameAsPostgis(
+            "post", reverse("spot-within"), {"polygon": polygon}
+        )
+        self.assertGreater(len(response.data["features"]), 0)
@@ -0,0 +1,82 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.contrib.gis.db.models.functions import Transform
+from django.core.cache import caches
+from django.db import connections
+
+from .loading import data_version
+from .spatial import AsMVTGeom, BBoxOverlaps, TileEnvelope
+
+LAYER_NAME = "spots"
+EXTENT = 4096
+BUFFER = 64
+MAX_ZOOM = 22
+
+
+def valid_tile(z, x, y):
+    """True for an existing tile of the XYZ scheme (y = 0 at the north)"""
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2**z and 0 <= y < 2**z
+
+
+def tile_attributes(value=None):
+    """
+    Attributes of each point: the SPOTS_TILE_ATTRIBUTES setting, or the subset
+    of it named in value (comma separated). Raises ValueError for others.
+    """
+    allowed = list(settings.SPOTS_TILE_ATTRIBUTES)
+    if value is None:
+        return allowed
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = set(names) - set(allowed)
+    if unknown:
+        raise ValueError(f"Unknown tile attributes: {', '.join(sorted(unknown))}.")
+    # Same order as the setting: the same subset shares a cache entry
+    return [name for name in allowed if name in names]
+
+
+def render_tile(queryset, z, x, y, attributes):
+    """
+    The Mapbox Vector Tile of the spots of queryset in tile z/x/y: one "spots"
+    layer with a point per spot, spot_id as feature id and the attributes as
+    properties. Built by PostGIS (ST_AsMVT); empty bytes when no spot is there.
+    """
+    area = Transform(TileEnvelope(z, x, y, margin=BUFFER / EXTENT), 4326)
+    rows = (
+        queryset.filter(BBoxOverlaps("location", area))
+        .annotate(
+            geom=AsMVTGeom(
+                Transform("location", 3857), TileEnvelope(z, x, y), EXTENT, BUFFER
+            )
+        )
+        .order_by()
+        .values("spot_id", *attributes, "geom")
+    )
+    inner, params = rows.query.get_compiler(rows.db).as_sql()
+    sql = (
+        "SELECT COALESCE(ST_AsMVT(tile.*, %s, %s, 'geom', 'spot_id'), ''::bytea) "
+        f"FROM ({inner}) AS tile"
+    )
+    with connections[rows.db].cursor() as cursor:
+        cursor.execute(sql, (LAYER_NAME, EXTENT, *params))
+        return bytes(cursor.fetchone()[0])
+
+
+def cached_tile(queryset, z, x, y, attributes, filters):
+    """
+    render_tile() through the SPOTS_TILE_CACHE cache. The key includes the data
+    version, so tiles rendered before a load are never served after it (they
+    expire with SPOTS_TILE_CACHE_TIMEOUT).
+    """
+    key = json.dumps(
+        [data_version(), z, x, y, attributes, sorted(filters.items())],
+        default=str,
+    )
+    key = "spots:tile:" + hashlib.sha256(key.encode()).hexdigest()
+    cache = caches[settings.SPOTS_TILE_CACHE]
+    tile = cache.get(key)
+    if tile is None:
+        tile = render_tile(queryset, z, x, y, attributes)
+        cache.set(key, tile, settings.SPOTS_TILE_CACHE_TIMEOUT)
+    return tile
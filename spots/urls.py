@@ -16,9 +16,22 @@ urlpatterns = [
         views.SpotAveragePriceBySectorView.as_view(),
         name="spot-avg-price",
     ),  # Avg price [cite: 33]
+    path(
+        "spots/price-stats/",
+        views.SpotPriceStatsView.as_view(),
+        name="spot-price-stats",
+    ),  # Price statistics by sector/type/municipality/state
     path(
         "spots/top-rent/", views.SpotTopRentView.as_view(), name="spot-top-rent"
     ),  # Top rent [cite: 37]
+    path(
+        "spots/clusters/", views.SpotClusterView.as_view(), name="spot-clusters"
+    ),  # Grid clusters by zoom
+    path(
+        "spots/tiles/<int:z>/<int:x>/<int:y>.pbf",
+        views.SpotTileView.as_view(),
+        name="spot-tile",
+    ),  # Mapbox Vector Tiles
     path(
         "spots/<int:spot_id>/", views.SpotDetailView.as_view(), name="spot-detail"
     ),  # Detail view [cite: 35]
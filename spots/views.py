@@ -1,10 +1,25 @@
-import json
-from django.contrib.gis.geos import Point, GEOSGeometry
-from django.contrib.gis.measure import D  # Distance object
-from django.db.models import Avg, F
-from django.db.models.functions import Cast
-from django.db.models import FloatField
+import math
+from django.conf import settings
+from django.contrib.gis.geos import Point, Polygon
+from django.db.models import (
+    Avg,
+    BooleanField,
+    Count,
+    ExpressionWrapper,
+    F,
+    FloatField,
+    Max,
+    Min,
+    Q,
+    Value,
+    Window,
+)
+from django.db.models.functions import Floor, RowNumber
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views import View
 from rest_framework import generics, views, status
+from rest_framework.exceptions import ParseError, ValidationError
 from rest_framework.response import Response
 from rest_framework_gis.filters import DistanceToPointFilter
 from django_filters.rest_framework import (
@@ -13,133 +28,603 @@ from django_filters.rest_framework import (
     CharFilter,
     NumberFilter,
 )
+from django_filters.constants import EMPTY_VALUES
+
+from .aggregates import DIMENSIONS, grouping_set, price_statistics
+from .cache import CachedResponseMixin
+from .models import PriceAggregate, Spot
+from .geojson import ValuesFeatureSerializer
+from .serializers import (
+    AvgPriceSerializer,
+    SpotDistanceSerializer,
+    SpotSearchSerializer,
+    SpotSerializer,
+)
+from .snapshot import SUPPORTED_FILTERS, fetch_spots, get_snapshot
+from .pagination import WithinPagination
+from .search import SearchText, spot_search_query, spot_search_rank
+from .streaming import (
+    assembled_response,
+    snapshot_rows,
+    streaming_response,
+    wants_database_assembly,
+    wants_stream,
+)
+from .tiles import cached_tile, tile_attributes, valid_tile
+from .spatial import (
+    DWithin,
+    KNNDistance,
+    OverlapsSubdivided,
+    PointX,
+    PointY,
+    SphereDistance,
+    UnsupportedGeometry,
+    geography,
+    geography_value,
+    geometry_from_geojson,
+    parse_bbox,
+)
 
-from .models import Spot
-from .serializers import SpotSerializer, AvgPriceSerializer
+
+class SearchTextFilter(CharFilter):
+    """
+    Accent- and case-insensitive match on SearchText(field_name), the
+    expression of its trigram GIN index: substring (LIKE '%value%') or, with
+    fuzzy, trigram word similarity (%>, pg_trgm.word_similarity_threshold).
+    """
+
+    def __init__(self, *args, fuzzy=False, **kwargs):
+        self.fuzzy = fuzzy
+        super().__init__(*args, **kwargs)
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        alias = f"{self.field_name}_search"
+        lookup = "trigram_word_similar" if self.fuzzy else "contains"
+        return qs.alias(**{alias: SearchText(self.field_name)}).filter(
+            **{f"{alias}__{lookup}": SearchText(Value(value))}
+        )
+
+
+class FullTextSearchFilter(CharFilter):
+    """Spots whose search_vector matches the websearch_to_tsquery of the value"""
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        return qs.filter(**{self.field_name: spot_search_query(value)})
 
 
 class SpotFilter(FilterSet):
-    """Custom filterset for Spot attributes"""
+    """
+    Custom filterset for Spot attributes. municipality, settlement, state and
+    corridor match substrings without regard to case or accents
+    (?municipality=alvaro obregon); their *_fuzzy variants tolerate typos.
+    q is a full-text search over title, description and address.
+    """
 
+    q = FullTextSearchFilter(field_name="search_vector")
     sector = NumberFilter(field_name="spot_sector_id")
     type = NumberFilter(field_name="spot_type_id")
-    municipality = CharFilter(
-        field_name="spot_municipality", lookup_expr="icontains"
-    ) 
+    municipality = SearchTextFilter(field_name="spot_municipality")
+    settlement = SearchTextFilter(field_name="spot_settlement")
+    state = SearchTextFilter(field_name="spot_state")
+    corridor = SearchTextFilter(field_name="spot_corridor")
+    municipality_fuzzy = SearchTextFilter(field_name="spot_municipality", fuzzy=True)
+    settlement_fuzzy = SearchTextFilter(field_name="spot_settlement", fuzzy=True)
+    state_fuzzy = SearchTextFilter(field_name="spot_state", fuzzy=True)
+    corridor_fuzzy = SearchTextFilter(field_name="spot_corridor", fuzzy=True)
 
     class Meta:
         model = Spot
-        fields = ["sector", "type", "municipality"]
+        fields = [
+            "q",
+            "sector",
+            "type",
+            "municipality",
+            "settlement",
+            "state",
+            "corridor",
+            "municipality_fuzzy",
+            "settlement_fuzzy",
+            "state_fuzzy",
+            "corridor_fuzzy",
+        ]
+
+
+def snapshot_filters(request):
+    """
+    SpotFilter values from the query string for the in-memory snapshot, or None
+    when they are invalid (the SQL path reports the error) or not supported.
+    """
+    filterset = SpotFilter(request.query_params, queryset=Spot.objects.none())
+    if not filterset.is_valid():
+        return None
+    filters = {
+        name: value
+        for name, value in filterset.form.cleaned_data.items()
+        if value not in (None, "")
+    }
+    if not set(filters) <= SUPPORTED_FILTERS:
+        return None
+    return filters
 
 
-class SpotListCreateView(generics.ListAPIView):
+def feature_serializer(request, serializer_class, extra=()):
+    """
+    ValuesFeatureSerializer for serializer_class trimmed to the ?fields= /
+    ?omit= lists (comma separated), so only those columns are read.
+    """
+    names = {}
+    for param in ("fields", "omit"):
+        value = request.query_params.get(param)
+        if value is not None:
+            names[param] = [name.strip() for name in value.split(",") if name.strip()]
+    try:
+        return ValuesFeatureSerializer(serializer_class, extra=extra, **names)
+    except ValueError as e:
+        raise ParseError(str(e))
+
+
+class ValuesFeatureListMixin:
+    """
+    list() over values_list() rows with ValuesFeatureSerializer instead of
+    model instances and the GeoFeatureModelSerializer; same response bytes.
+    Accepts ?fields= / ?omit=.
+    """
+
+    keyset = []
+
+    def get_feature_serializer(self):
+        return feature_serializer(
+            self.request,
+            self.get_serializer_class(),
+            extra=[attribute for attribute, _ in self.keyset],
+        )
+
+    def list(self, request, *args, **kwargs):
+        features = self.get_feature_serializer()
+        rows = features.rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        return self.get_paginated_response(features.feature_collection(page))
+
+
+class SpotListCreateView(
+    CachedResponseMixin, ValuesFeatureListMixin, generics.ListAPIView
+):
     """
     API view to list all spots or filter by attributes.
     GET /api/spots/
     GET /api/spots/?sector=9&type=1&municipality=Álvaro Obregón [cite: 24]
+    GET /api/spots/?fields=location,spot_price_total_mxn_rent (or ?omit=spot_description)
+
+    GET /api/spots/?q=oficina reforma&sector=9
+
+    GET /api/spots/?ordering=-spot_price_total_mxn_rent
+
+    Ordered by spot_id, paginated with ?page_size= and the cursor in "next".
+    With ?q=, only the matching spots, best ranked first (ts_rank, in the
+    search_rank property) and then by spot_id. ?ordering= sorts by one of
+    ordering_fields instead ("-" for descending), spots without a value last
+    and then by spot_id. With ?stream=1, streams every matching spot in a
+    single FeatureCollection; with ?assemble=db, PostgreSQL builds that
+    FeatureCollection instead.
     """
 
-    queryset = Spot.objects.all()
+    queryset = Spot.objects.order_by("spot_id")
     serializer_class = SpotSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_class = SpotFilter
+    keyset = [("spot_id", False)]
+    search_keyset = [("search_rank", True), ("spot_id", False)]
+    ordering_fields = [
+        "spot_id",
+        "spot_area_in_sqm",
+        "spot_price_total_mxn_rent",
+        "spot_price_total_mxn_sale",
+        "spot_price_sqm_mxn_rent",
+        "spot_price_sqm_mxn_sale",
+    ]
+
+    def get_search(self):
+        return self.request.query_params.get("q", "").strip()
+
+    def get_ordering(self):
+        """(field, descending) of ?ordering=, or None"""
+        ordering = self.request.query_params.get("ordering", "").strip()
+        if not ordering:
+            return None
+        field = ordering.removeprefix("-")
+        if field not in self.ordering_fields:
+            raise ParseError(
+                f"ordering must be one of: {', '.join(self.ordering_fields)} "
+                f"(prefixed with - for descending)."
+            )
+        return field, ordering.startswith("-")
+
+    def get_ordering_keyset(self):
+        field, descending = self.get_ordering()
+        if field == "spot_id":
+            return [("spot_id", descending)]
+        # NULLs go last in both directions: the flag is sorted first
+        return [("ordering_null", False), (field, descending), ("spot_id", False)]
+
+    def get_serializer_class(self):
+        return SpotSearchSerializer if self.get_search() else SpotSerializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        search = self.get_search()
+        if search:
+            # SpotFilter.q filters with the GIN index; here it only orders
+            queryset = queryset.annotate(search_rank=spot_search_rank(search)).order_by(
+                "-search_rank", "spot_id"
+            )
+        ordering = self.get_ordering()
+        if ordering:
+            field, _ = ordering
+            keyset = self.get_ordering_keyset()
+            if keyset[0][0] == "ordering_null":
+                queryset = queryset.annotate(
+                    ordering_null=ExpressionWrapper(
+                        Q(**{f"{field}__isnull": True}), output_field=BooleanField()
+                    )
+                )
+            queryset = queryset.order_by(
+                *(
+                    F(attribute).desc() if descending else F(attribute).asc()
+                    for attribute, descending in keyset
+                )
+            )
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        if self.get_ordering():
+            self.keyset = self.get_ordering_keyset()
+        elif self.get_search():
+            self.keyset = self.search_keyset
+        assemble = wants_database_assembly(request)
+        if not (assemble or wants_stream(request)):
+            return super().list(request, *args, **kwargs)
+        features = self.get_feature_serializer()
+        rows = features.rows(self.filter_queryset(self.get_queryset()))
+        if assemble:
+            return assembled_response(features, rows, self.keyset)
+        return streaming_response(
+            map(
+                features.to_representation,
+                rows.iterator(chunk_size=settings.SPOTS_STREAM_CHUNK_SIZE),
+            )
+        )
 
 
-class SpotNearbyView(generics.ListAPIView):
+class SpotNearbyView(ValuesFeatureListMixin, generics.ListAPIView):
     """
     API view to find spots near a given point (lat, lng) within a radius (in meters).
     GET /api/spots/nearby/?lat=19.4326&lng=-99.1332&radius=2000 [cite: 22]
+
+    With k, returns the k nearest spots instead; radius becomes an optional cap.
+    GET /api/spots/nearby/?lat=19.4326&lng=-99.1332&k=20[&radius=5000]
+
+    Each feature carries its distance in meters and results come nearest first.
+    The SpotFilter attribute filters apply in both modes. Pages continue after
+    the (distance, spot_id) of the last spot; with k, pages split the k nearest.
+    With ?assemble=db, PostgreSQL builds one FeatureCollection with all of them.
     """
 
     queryset = Spot.objects.all()
-    serializer_class = SpotSerializer
+    serializer_class = SpotDistanceSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = SpotFilter
+    keyset = [("distance", False), ("spot_id", False)]
+    max_k = 1000
+
+    def get_k(self):
+        """k from the query string: None if absent, ValueError if out of range."""
+        k = self.request.query_params.get("k")
+        if not k:
+            return None
+        k = int(k)
+        if not 0 < k <= self.max_k:
+            raise ValueError(k)
+        return k
+
+    def get_search(self):
+        """Parses (lng, lat, radius, k) from the query string; None if invalid."""
+        params = self.request.query_params
+        lat, lng, radius = (params.get(name) for name in ("lat", "lng", "radius"))
+        try:
+            k = self.get_k()
+            if not (lat and lng and (radius or k)):
+                return None
+            lng, lat = float(lng), float(lat)
+            radius = float(radius) if radius else None
+        except (ValueError, TypeError):
+            return None
+        return lng, lat, radius, k
 
     def get_queryset(self):
         queryset = super().get_queryset()
-        lat = self.request.query_params.get("lat")
-        lng = self.request.query_params.get("lng")
-        radius = self.request.query_params.get("radius") 
-
-        if lat and lng and radius:
-            try:
-                ref_point = Point(
-                    float(lng), float(lat), srid=4326
-                )  
-                radius_m = float(radius)
-                queryset = (
-                    queryset.filter(location__distance_lte=(ref_point, D(m=radius_m)))
-                    .annotate(
-                        distance=Cast(
-                            0.0, FloatField()
-                        ) 
-                    )
-                    .order_by("distance")
-                ) 
-            except (ValueError, TypeError):
-                return Spot.objects.none() 
-        else:
+        search = self.get_search()
+        self.max_results = None
+        if search is None:
             return Spot.objects.none()
 
-        return queryset
+        lng, lat, radius, self.max_results = search
+        ref_point = geography_value(Point(lng, lat, srid=4326))
+        if radius is not None:
+            queryset = queryset.filter(DWithin(geography(), ref_point, radius))
+        # ST_DWithin and <-> over the GiST index on geography(location)
+        return (
+            queryset.filter(location__isnull=False)
+            .annotate(distance=SphereDistance(geography(), ref_point))
+            .order_by(KNNDistance(geography(), ref_point), "spot_id")
+        )
+
+    def list(self, request, *args, **kwargs):
+        try:
+            self.get_k()
+        except ValueError:
+            return Response(
+                {"error": f"k must be an integer between 1 and {self.max_k}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if wants_database_assembly(request):
+            features = self.get_feature_serializer()
+            rows = features.rows(self.filter_queryset(self.get_queryset()))
+            if self.max_results:
+                rows = rows[: self.max_results]
+            return assembled_response(features, rows, self.keyset)
+
+        snapshot = get_snapshot()
+        search = self.get_search()
+        filters = snapshot_filters(request) if snapshot is not None else None
+        if search is None or filters is None or not all(
+            map(math.isfinite, filter(None, search[:3]))
+        ):
+            return super().list(request, *args, **kwargs)
+
+        lng, lat, radius, self.max_results = search
+        if self.max_results:
+            ranked = snapshot.nearest(lng, lat, self.max_results, radius, filters)
+        else:
+            ranked = snapshot.radius(lng, lat, radius, filters)
+        page = self.paginator.paginate_sorted(
+            [(distance, spot_id) for spot_id, distance in ranked], request, self
+        )
+        ranked = ranked[page.start : page.stop]
+        features = self.get_feature_serializer()
+        rows = features.rows(
+            Spot.objects.annotate(distance=Value(None, output_field=FloatField()))
+        )
+        rows = fetch_spots(rows, *zip(*ranked)) if ranked else []
+        return self.get_paginated_response(features.feature_collection(rows))
 
 
 class SpotWithinView(views.APIView):
     """
     API view to find spots within a given polygon.
     POST /api/spots/within/ [cite: 26]
-    Requires a JSON body with a GeoJSON Polygon:
+    Requires a JSON body with a GeoJSON Polygon or MultiPolygon, a bbox
+    ([min_lng, min_lat, max_lng, max_lat], also accepted as ?bbox=), or both:
     {
       "polygon": {
         "type": "Polygon",
         "coordinates": [[[lng1, lat1], [lng2, lat2], ...]]
-      }
+      },
+      "bbox": [-99.2, 19.3, -99.1, 19.5]
     }
+
+    Results are ordered by spot_id and paginated with ?page_size= (default
+    1000). "next" holds the URL of the following page, to be POSTed with the
+    same body, and is null on the last page. With ?stream=1, streams all the
+    results in a single FeatureCollection instead (?assemble=db: built by
+    PostgreSQL). ?fields= / ?omit= trim the properties as in the list endpoints.
     """
 
+    keyset = [("spot_id", False)]
+
     def post(self, request, *args, **kwargs):
         polygon_data = request.data.get("polygon")
+        bbox_data = request.data.get("bbox") or request.query_params.get("bbox")
 
-        if not polygon_data:
+        if not polygon_data and not bbox_data:
             return Response(
-                {"error": "Missing 'polygon' in request body."},
+                {"error": "Missing 'polygon' or 'bbox' in request body."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        try:
-            if isinstance(polygon_data, str):
-                polygon_data = json.loads(polygon_data)
-
-            polygon = GEOSGeometry(json.dumps(polygon_data), srid=4326)
-
-            if not polygon.geom_type == "Polygon":
+        polygon = None
+        if polygon_data:
+            try:
+                polygon = geometry_from_geojson(polygon_data)
+            except UnsupportedGeometry:
+                return Response(
+                    {"error": "Geometry type must be 'Polygon' or 'MultiPolygon'."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            except Exception as e:
                 return Response(
-                    {"error": "Geometry type must be 'Polygon'."},
+                    {"error": f"Invalid polygon data provided. {e}"},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-        except (json.JSONDecodeError, TypeError, ValueError, Exception) as e:
-            return Response(
-                {"error": f"Invalid polygon data provided. {e}"},
-                status=status.HTTP_400_BAD_REQUEST,
+        bbox = None
+        if bbox_data:
+            try:
+                bbox = parse_bbox(bbox_data)
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = WithinPagination()
+        stream = wants_stream(request)
+        assemble = wants_database_assembly(request)
+        chunk_size = settings.SPOTS_STREAM_CHUNK_SIZE
+        features = feature_serializer(request, SpotSerializer)
+        snapshot = None if assemble else get_snapshot()
+        if snapshot is not None:
+            spot_ids = snapshot.within(polygon, bbox)
+            rows = features.rows(Spot.objects.order_by("spot_id"))
+            if stream:
+                return streaming_response(
+                    map(features.to_representation, snapshot_rows(rows, spot_ids, chunk_size))
+                )
+            page = paginator.paginate_sorted(
+                [(spot_id,) for spot_id in spot_ids], request, self
             )
+            spots = rows.filter(spot_id__in=spot_ids[page.start : page.stop])
+        else:
+            queryset = Spot.objects.all()
+            if bbox is not None:
+                envelope = Polygon.from_bbox(bbox)
+                envelope.srid = 4326
+                queryset = queryset.filter(location__contained=envelope)
+            if polygon is not None:
+                queryset = queryset.filter(location__within=polygon)
+                # Very detailed polygons: the index is queried piece by piece
+                if polygon.num_points > settings.SPOTS_SUBDIVIDE_MAX_VERTICES:
+                    queryset = queryset.filter(
+                        OverlapsSubdivided(
+                            "location", polygon, settings.SPOTS_SUBDIVIDE_MAX_VERTICES
+                        )
+                    )
+            rows = features.rows(queryset.order_by("spot_id"))
+            if assemble:
+                return assembled_response(features, rows, self.keyset)
+            if stream:
+                return streaming_response(
+                    map(features.to_representation, rows.iterator(chunk_size=chunk_size))
+                )
+            spots = paginator.paginate_queryset(rows, request, self)
 
-        queryset = Spot.objects.filter(location__within=polygon)
-        serializer = SpotSerializer(queryset, many=True, context={"request": request})
-        return Response(serializer.data)
+        return paginator.get_paginated_response(features.feature_collection(spots))
+
+
+class SpotTileView(View):
+    """
+    Mapbox Vector Tile with the spots of a tile, built by PostGIS.
+    GET /api/spots/tiles/{z}/{x}/{y}.pbf
+    GET /api/spots/tiles/10/230/456.pbf?attributes=spot_price_total_mxn_rent&sector=9
+
+    Each point carries spot_id as feature id and the SPOTS_TILE_ATTRIBUTES (or
+    the ?attributes= subset of them); the SpotFilter filters apply. Tiles are
+    cached per data version, so a load invalidates them.
+    """
+
+    def get(self, request, z, x, y):
+        if not valid_tile(z, x, y):
+            raise Http404("Tile out of range.")
+        try:
+            attributes = tile_attributes(request.GET.get("attributes"))
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        filterset = SpotFilter(request.GET, queryset=Spot.objects.all())
+        if not filterset.is_valid():
+            return JsonResponse(filterset.errors, status=400)
+        filters = {
+            name: value
+            for name, value in filterset.form.cleaned_data.items()
+            if value not in (None, "")
+        }
+        tile = cached_tile(filterset.qs, z, x, y, attributes, filters)
+        return HttpResponse(tile, content_type="application/vnd.mapbox-vector-tile")
+
+
+class SpotClusterView(views.APIView):
+    """
+    Grid clusters of the spots in a bbox for a map zoom level.
+    GET /api/spots/clusters/?bbox=-99.3,19.2,-99.0,19.6&zoom=11[&sector=9]
+
+    Spots are grouped in square cells of 360 / (2^zoom * SPOTS_CLUSTER_CELLS_PER_TILE)
+    degrees. Each cell is a Point feature at the mean position of its spots,
+    with their count and the mean/min/max rent and sale prices. The bbox is
+    widened to whole cells, so edge cells are complete, and may cover at most
+    SPOTS_CLUSTER_MAX_CELLS cells: the response grows with the visible cells,
+    not with the spots. The SpotFilter filters apply.
+    """
 
+    max_zoom = 22
 
-class SpotAveragePriceBySectorView(views.APIView):
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        if not params.get("bbox") or not params.get("zoom"):
+            raise ParseError("bbox and zoom are required.")
+        try:
+            min_lng, min_lat, max_lng, max_lat = parse_bbox(params["bbox"])
+            zoom = int(params["zoom"])
+        except ValueError as e:
+            raise ParseError(str(e))
+        if not 0 <= zoom <= self.max_zoom:
+            raise ParseError(f"zoom must be between 0 and {self.max_zoom}.")
+
+        size = 360 / (2**zoom * settings.SPOTS_CLUSTER_CELLS_PER_TILE)
+        min_x, max_x = math.floor(min_lng / size), math.floor(max_lng / size)
+        min_y, max_y = math.floor(min_lat / size), math.floor(max_lat / size)
+        if (max_x - min_x + 1) * (max_y - min_y + 1) > settings.SPOTS_CLUSTER_MAX_CELLS:
+            raise ParseError("Too many cells: use a smaller bbox or a lower zoom.")
+        envelope = Polygon.from_bbox(
+            (min_x * size, min_y * size, (max_x + 1) * size, (max_y + 1) * size)
+        )
+        envelope.srid = 4326
+
+        filterset = SpotFilter(params, queryset=Spot.objects.all())
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        lng, lat = PointX("location"), PointY("location")
+        cells = (
+            filterset.qs.filter(location__contained=envelope)
+            .annotate(cell_x=Floor(lng / size), cell_y=Floor(lat / size))
+            .filter(cell_x__range=(min_x, max_x), cell_y__range=(min_y, max_y))
+            .values("cell_x", "cell_y")
+            .annotate(
+                count=Count("spot_id"),
+                lng=Avg(lng),
+                lat=Avg(lat),
+                rent_avg=Avg("spot_price_total_mxn_rent"),
+                rent_min=Min("spot_price_total_mxn_rent"),
+                rent_max=Max("spot_price_total_mxn_rent"),
+                sale_avg=Avg("spot_price_total_mxn_sale"),
+                sale_min=Min("spot_price_total_mxn_sale"),
+                sale_max=Max("spot_price_total_mxn_sale"),
+            )
+            .order_by("cell_y", "cell_x")
+        )
+        features = []
+        for cell in cells:
+            coordinates = [cell.pop("lng"), cell.pop("lat")]
+            index = [int(cell.pop("cell_x")), int(cell.pop("cell_y"))]
+            features.append(
+                {
+                    "type": "Feature",
+                    "geometry": {"type": "Point", "coordinates": coordinates},
+                    "properties": {"cell": index, **cell},
+                }
+            )
+        return Response(
+            {
+                "type": "FeatureCollection",
+                "zoom": zoom,
+                "cell_size": size,
+                "features": features,
+            }
+        )
+
+
+class SpotAveragePriceBySectorView(CachedResponseMixin, views.APIView):
     """
     API view to calculate the average total rent price per sector.
     GET /api/spots/average-price-by-sector/ [cite: 33]
     """
 
     def get(self, request, *args, **kwargs):
+        # Read from PriceAggregate, rebuilt by the loaders and after admin edits
         avg_prices = (
-            Spot.objects.filter(spot_price_total_mxn_rent__isnull=False)
+            PriceAggregate.objects.filter(
+                grouping_set=grouping_set(["sector"]), rent_count__gt=0
+            )
             .values("spot_sector_id")
-            .annotate(average_price=Avg("spot_price_total_mxn_rent"))
+            .annotate(average_price=F("rent_mean"))
             .order_by("spot_sector_id")
         )
 
@@ -147,26 +632,84 @@ class SpotAveragePriceBySectorView(views.APIView):
         return Response(serializer.data)
 
 
-class SpotDetailView(generics.RetrieveAPIView):
+class SpotPriceStatsView(CachedResponseMixin, views.APIView):
+    """
+    Price statistics of the spots grouped by any of sector, type,
+    municipality and state, read from PriceAggregate.
+    GET /api/spots/price-stats/?group_by=sector,type[&state=Jalisco]
+
+    Each group has its spot_count and the count, mean, min, max, p50 and p90
+    of rent, sale, rent_sqm and sale_sqm (count excludes spots without that
+    price). Filtering by a dimension also groups by it. Without group_by nor
+    filters the response is the single group of all spots.
+    """
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        group_by = [name for name in params.get("group_by", "").split(",") if name]
+        unknown = set(group_by) - set(DIMENSIONS)
+        if unknown:
+            raise ParseError(f"Unknown group_by: {', '.join(sorted(unknown))}.")
+        filters = {}
+        for name, column in DIMENSIONS.items():
+            if name in params:
+                value = params[name]
+                if column.endswith("_id"):
+                    try:
+                        value = int(value)
+                    except ValueError:
+                        raise ParseError(f"{name} must be an integer.")
+                filters[column] = value
+        dimensions = set(group_by) | {
+            name for name, column in DIMENSIONS.items() if column in filters
+        }
+        aggregates = (
+            PriceAggregate.objects.filter(grouping_set=grouping_set(dimensions), **filters)
+            .order_by(*(DIMENSIONS[name] for name in DIMENSIONS if name in dimensions))
+            .values()
+        )
+        return Response([price_statistics(aggregate) for aggregate in aggregates])
+
+
+class SpotDetailView(CachedResponseMixin, generics.RetrieveAPIView):
     """
     API view to retrieve details of a specific spot by its ID.
     GET /api/spots/{spot_id}/ [cite: 35]
+    GET /api/spots/{spot_id}/?fields=location,spot_price_total_mxn_rent
     """
 
     queryset = Spot.objects.all()
     serializer_class = SpotSerializer
     lookup_field = "spot_id"  
 
+    def retrieve(self, request, *args, **kwargs):
+        features = feature_serializer(request, self.get_serializer_class())
+        row = get_object_or_404(
+            features.rows(self.get_queryset()), spot_id=kwargs[self.lookup_field]
+        )
+        return Response(features.to_representation(row))
+
 
-class SpotTopRentView(generics.ListAPIView):
+class SpotTopRentView(
+    CachedResponseMixin, ValuesFeatureListMixin, generics.ListAPIView
+):
     """
     API view to rank spots by total rent price.
     GET /api/spots/top-rent/?limit=10 [cite: 37]
+    GET /api/spots/top-rent/?limit=3&group_by=sector
+
+    The limit caps the whole ranking; pages continue after (rent, spot_id).
+    With group_by (sector, type, municipality, state; comma separated), the
+    limit applies per group and one query (ROW_NUMBER() OVER each group)
+    returns the leaders of every group, ordered by group and then by rent.
+    That response is not paginated.
     """
 
     serializer_class = SpotSerializer
+    keyset = [("spot_price_total_mxn_rent", True), ("spot_id", False)]
+    max_group_limit = 100
 
-    def get_queryset(self):
+    def get_limit(self):
         limit_param = self.request.query_params.get("limit", "10") 
         try:
             limit = int(limit_param)
@@ -174,9 +717,51 @@ class SpotTopRentView(generics.ListAPIView):
                 limit = 10  
         except ValueError:
             limit = 10 
+        return limit
 
+    def get_group_by(self):
+        """Columns of the ?group_by= dimensions, in DIMENSIONS order"""
+        names = self.request.query_params.get("group_by", "").split(",")
+        names = {name.strip() for name in names if name.strip()}
+        unknown = names - set(DIMENSIONS)
+        if unknown:
+            raise ParseError(f"Unknown group_by: {', '.join(sorted(unknown))}.")
+        return [column for name, column in DIMENSIONS.items() if name in names]
+
+    def get_queryset(self):
+        self.max_results = self.get_limit()
+        # Partial index spots_top_rent: the order and the page come from the index
         queryset = Spot.objects.filter(
             spot_price_total_mxn_rent__isnull=False
-        ).order_by("-spot_price_total_mxn_rent")[:limit] 
+        ).order_by("-spot_price_total_mxn_rent", "spot_id")
 
         return queryset
+
+    def list(self, request, *args, **kwargs):
+        group_by = self.get_group_by()
+        if not group_by:
+            return super().list(request, *args, **kwargs)
+        limit = self.get_limit()
+        if limit > self.max_group_limit:
+            raise ParseError(f"limit must be at most {self.max_group_limit} with group_by.")
+        ranking = [F("spot_price_total_mxn_rent").desc(), F("spot_id").asc()]
+        leaders = (
+            self.get_queryset()
+            .annotate(
+                rank=Window(
+                    RowNumber(),
+                    partition_by=[F(column) for column in group_by],
+                    order_by=ranking,
+                )
+            )
+            .filter(rank__lte=limit)
+            .order_by(*group_by, *ranking)
+        )
+        features = feature_serializer(
+            request,
+            self.get_serializer_class(),
+            extra=[*group_by, *(attribute for attribute, _ in self.keyset)],
+        )
+        data = features.feature_collection(features.rows(leaders))
+        data["next"] = None
+        return Response(data)